@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tick analytics for the SmartAPI worker.
+
+Streams tick data into NumPy arrays chunk by chunk and reports:
+  - ticks/s per token
+  - inter-tick gap distribution per token stream
+  - backend forward-latency percentiles (FORWARD_SUCCESS ResponseTime records)
+  - the SESSION_SUMMARY figures (ticks, tokens, volume, forwards, TPS, price range)
+
+Sources are the tick_analysis_*.log files (TICK_DATA lines) or the binary
+tick journal. Memory stays bounded regardless of input size: per-chunk
+arrays are discarded after aggregation, and distributions are kept as
+fixed log-spaced histograms.
+
+Usage:
+    python analyze_ticks.py                          # logs/tick_analysis_*.log
+    python analyze_ticks.py logs/tick_analysis_20250101.log
+    python analyze_ticks.py --journal logs/journal   # binary journal
+    python analyze_ticks.py --json report.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from itertools import islice
+
+import numpy as np
+
+DEFAULT_CHUNK = 200_000
+
+# Fields are pulled from TICK_DATA JSON with one regex instead of json.loads per line
+TICK_RE = re.compile(
+    r'TICK_DATA: \{.*?"timestamp": "([^"]+)", "token": "([^"]*)", "ltp_paise": (-?[\d.]+), '
+    r'"ltp_rupees": [^,]+, "volume": (\d+), "exchange_timestamp": (\d+)'
+)
+FORWARD_OK_RE = re.compile(r'FORWARD_SUCCESS: (?:Batch=(\d+)|Token=[^,]*)?.*?ResponseTime=([\d.]+)ms')
+FORWARD_FAIL_RE = re.compile(r'FORWARD_(?:FAILED|ERROR): (?:Batch=(\d+))?')
+
+# Log-spaced histogram bins: 1µs .. ~1h for gaps, 10µs .. 100s for latency (in ms)
+GAP_BINS_MS = np.logspace(-3, 6.6, 481)
+LATENCY_BINS_MS = np.logspace(-2, 5, 351)
+
+
+class Histogram:
+    """Fixed-bin histogram with percentile lookup"""
+
+    def __init__(self, bins):
+        self.bins = bins
+        self.counts = np.zeros(len(bins) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, values):
+        if values.size == 0:
+            return
+        self.counts += np.bincount(np.searchsorted(self.bins, values, side="right"),
+                                   minlength=len(self.counts))
+        self.total += values.size
+        self.sum += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def percentiles(self, qs=(50, 90, 99, 99.9)):
+        if self.total == 0:
+            return {}
+        cumulative = np.cumsum(self.counts)
+        result = {}
+        for q in qs:
+            index = int(np.searchsorted(cumulative, self.total * q / 100.0))
+            # Upper edge of the bucket (overflow bucket reports the observed max)
+            value = self.bins[index] if index < len(self.bins) else self.max
+            result[f"p{q:g}"] = round(float(min(value, self.max)), 3)
+        return result
+
+    def summary(self):
+        return {
+            "count": int(self.total),
+            "mean": round(self.sum / self.total, 3) if self.total else None,
+            "max": round(self.max, 3) if self.total else None,
+            **self.percentiles()
+        }
+
+
+class TickAnalyzer:
+    """Streaming aggregation over chunks of (token, time_ns, ltp_paise, volume) arrays"""
+
+    def __init__(self):
+        self.token_counts = {}
+        self.token_first_ns = {}
+        self.token_last_ns = {}
+        self.gaps = Histogram(GAP_BINS_MS)
+        self.latency = Histogram(LATENCY_BINS_MS)
+        self.total_ticks = 0
+        self.total_volume = 0
+        self.price_min = np.inf
+        self.price_max = 0.0
+        self.first_ns = None
+        self.last_ns = None
+        self.successful_forwards = 0
+        self.failed_forwards = 0
+
+    def add_ticks(self, tokens, times_ns, ltp_paise, volumes):
+        if tokens.size == 0:
+            return
+        self.total_ticks += int(tokens.size)
+        self.total_volume += int(volumes.sum())
+        ltp = ltp_paise / 100.0
+        positive = ltp[ltp > 0]
+        if positive.size:
+            self.price_min = min(self.price_min, float(positive.min()))
+            self.price_max = max(self.price_max, float(positive.max()))
+
+        chunk_first, chunk_last = int(times_ns.min()), int(times_ns.max())
+        self.first_ns = chunk_first if self.first_ns is None else min(self.first_ns, chunk_first)
+        self.last_ns = chunk_last if self.last_ns is None else max(self.last_ns, chunk_last)
+
+        # Group by token, time-ordered within each token
+        order = np.lexsort((times_ns, tokens))
+        tokens = tokens[order]
+        times_ns = times_ns[order]
+        unique, starts, counts = np.unique(tokens, return_index=True, return_counts=True)
+        ends = starts + counts - 1
+
+        # Gaps inside the chunk, excluding the boundaries between tokens
+        gaps_ns = np.diff(times_ns)
+        same_token = tokens[1:] == tokens[:-1]
+        gap_values = gaps_ns[same_token]
+
+        # Gaps that straddle the previous chunk, from the carried last time per token
+        carried = []
+        for token, start, end, count in zip(unique.tolist(), starts.tolist(), ends.tolist(), counts.tolist()):
+            previous = self.token_last_ns.get(token)
+            if previous is not None:
+                carried.append(times_ns[start] - previous)
+            else:
+                self.token_first_ns[token] = int(times_ns[start])
+            self.token_last_ns[token] = int(times_ns[end])
+            self.token_counts[token] = self.token_counts.get(token, 0) + count
+
+        if carried:
+            gap_values = np.concatenate([gap_values, np.asarray(carried, dtype=np.int64)])
+        self.gaps.add(gap_values[gap_values >= 0] / 1e6)
+
+    def add_latencies(self, latencies_ms):
+        self.latency.add(latencies_ms)
+
+    def report(self, top=20):
+        duration = (self.last_ns - self.first_ns) / 1e9 if self.first_ns is not None else 0.0
+        per_token = []
+        for token, count in self.token_counts.items():
+            span = (self.token_last_ns[token] - self.token_first_ns[token]) / 1e9
+            per_token.append({
+                "token": token,
+                "ticks": count,
+                "ticks_per_second": round(count / max(span, duration, 1e-9), 3)
+            })
+        per_token.sort(key=lambda row: row["ticks"], reverse=True)
+
+        return {
+            "session_summary": {
+                "duration_seconds": round(duration, 3),
+                "total_ticks": self.total_ticks,
+                "unique_tokens": len(self.token_counts),
+                "total_volume": self.total_volume,
+                "successful_forwards": self.successful_forwards,
+                "failed_forwards": self.failed_forwards,
+                "success_rate": round(self.successful_forwards / max(1, self.total_ticks) * 100, 2),
+                "ticks_per_second": round(self.total_ticks / max(1, duration), 2),
+                "price_range": ({"min": self.price_min, "max": self.price_max}
+                                if self.price_min != np.inf else None)
+            },
+            "ticks_per_token": per_token[:top] if top else per_token,
+            "inter_tick_gap_ms": self.gaps.summary(),
+            "forward_latency_ms": self.latency.summary()
+        }
+
+
+def _token_ids(raw_tokens):
+    """Numeric token strings to int64; anything else maps to -1"""
+    try:
+        return np.asarray(raw_tokens, dtype=np.int64)
+    except ValueError:
+        return np.asarray([int(t) if t.isdigit() else -1 for t in raw_tokens], dtype=np.int64)
+
+
+def analyze_logs(paths, analyzer, chunk_size=DEFAULT_CHUNK, include_ticks=True):
+    """Stream tick_analysis log files through the analyzer in chunks of lines"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                lines = list(islice(f, chunk_size))
+                if not lines:
+                    break
+                timestamps, tokens, ltps, volumes, latencies = [], [], [], [], []
+                for line in lines:
+                    if include_ticks and "TICK_DATA" in line:
+                        match = TICK_RE.search(line)
+                        if match:
+                            timestamps.append(match.group(1))
+                            tokens.append(match.group(2))
+                            ltps.append(match.group(3))
+                            volumes.append(match.group(4))
+                    elif "FORWARD_SUCCESS" in line:
+                        match = FORWARD_OK_RE.search(line)
+                        if match:
+                            analyzer.successful_forwards += int(match.group(1) or 1)
+                            latencies.append(match.group(2))
+                    elif "FORWARD_FAILED" in line or "FORWARD_ERROR" in line:
+                        match = FORWARD_FAIL_RE.search(line)
+                        analyzer.failed_forwards += int(match.group(1) or 1) if match else 1
+
+                if timestamps:
+                    # Vectorized ISO-8601 parsing straight to datetime64
+                    times_ns = np.asarray(timestamps, dtype="datetime64[ns]").astype(np.int64)
+                    analyzer.add_ticks(_token_ids(tokens), times_ns,
+                                       np.asarray(ltps, dtype=np.float64),
+                                       np.asarray(volumes, dtype=np.int64))
+                if latencies:
+                    analyzer.add_latencies(np.asarray(latencies, dtype=np.float64))
+
+
+def analyze_journal(journal_dir, analyzer, chunk_size=DEFAULT_CHUNK, start_ns=None, end_ns=None):
+    """Stream binary journal segments through the analyzer without copying them"""
+    from app.services.tick_journal import RECORD_FIELDS, RECORD_SIZE, TickJournalReader
+
+    dtype = np.dtype(RECORD_FIELDS)
+    assert dtype.itemsize == RECORD_SIZE
+    reader = TickJournalReader(journal_dir)
+    for _, view in reader.iter_views(start_ns, end_ns):
+        records = np.frombuffer(view, dtype=dtype)
+        for offset in range(0, len(records), chunk_size):
+            chunk = records[offset:offset + chunk_size]
+            analyzer.add_ticks(chunk["token"], chunk["receive_ns"],
+                               chunk["ltp_paise"].astype(np.float64), chunk["volume"])
+        del records
+        view.release()
+
+
+def print_report(report):
+    summary = report["session_summary"]
+    print("📈 SESSION SUMMARY")
+    for key, value in summary.items():
+        print(f"   {key:<22} {value}")
+
+    print(f"\n📊 TICKS PER TOKEN (top {len(report['ticks_per_token'])})")
+    for row in report["ticks_per_token"]:
+        print(f"   Token: {row['token']:>8} | Ticks: {row['ticks']:>10} | TPS: {row['ticks_per_second']:>10.3f}")
+
+    for title, key in (("⏱️  INTER-TICK GAP (ms)", "inter_tick_gap_ms"),
+                       ("🚚 FORWARD LATENCY (ms)", "forward_latency_ms")):
+        print(f"\n{title}")
+        stats = report[key]
+        if not stats.get("count"):
+            print("   no data")
+            continue
+        print("   " + " | ".join(f"{k}: {v}" for k, v in stats.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized tick analytics for SmartAPI worker logs and journals")
+    parser.add_argument("logs", nargs="*", help="tick_analysis log files (default: logs/tick_analysis_*.log)")
+    parser.add_argument("--journal", help="binary tick journal directory (ticks are read from here)")
+    parser.add_argument("--from-ns", type=int, help="journal: first receive_ns to include")
+    parser.add_argument("--to-ns", type=int, help="journal: last receive_ns to include")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK, help="lines/records per chunk")
+    parser.add_argument("--top", type=int, default=20, help="tokens to list (0 = all)")
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    log_paths = args.logs or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           "logs", "tick_analysis_*.log")))
+    analyzer = TickAnalyzer()
+
+    if args.journal:
+        analyze_journal(args.journal, analyzer, args.chunk_size, args.from_ns, args.to_ns)
+        # Logs still carry the forward outcomes and latencies
+        analyze_logs(log_paths, analyzer, args.chunk_size, include_ticks=False)
+    elif log_paths:
+        analyze_logs(log_paths, analyzer, args.chunk_size)
+    else:
+        print("❌ No tick_analysis logs found and no --journal given")
+        return 1
+
+    report = analyzer.report(top=args.top)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\n💾 Report written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
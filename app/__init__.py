@@ -14,4 +14,11 @@ def create_app():
     app.register_blueprint(api, url_prefix="/api")
 
     init_socketio(app)
+
+    # Sharded mode: announce this process so other shards can proxy to it
+    from .config import config
+    from .services.shard_registry import get_registry
+    registry = get_registry()
+    if registry:
+        registry.register_shard(f"http://{config.SHARD_ADVERTISE_HOST}:{config.WORKER_PORT}")
     return app
@@ -0,0 +1,9 @@
+"""
+Asyncio runtime
+Alternative to the eventlet/Flask worker: aiohttp feed and forwarder
+clients and an ASGI app (Starlette + python-socketio) with the same
+/api/* contract. Started with run_async.py.
+"""
+from app.aio.server import create_app
+
+__all__ = ["create_app"]
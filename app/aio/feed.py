@@ -0,0 +1,226 @@
+"""
+Async SmartAPI feed connection
+aiohttp websocket client speaking the SmartWebSocketV2 protocol: JSON
+subscribe/unsubscribe requests, protocol-level heartbeat and binary tick
+frames decoded by the lean tick decoder (or the library's parser).
+Reconnects with the same full-jitter backoff and incident records as
+FeedConnection.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
+import aiohttp
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+from app.config import config
+from app.logger import get_logger
+from app.services.feed_connection import INCIDENT_HISTORY, FeedIncident
+from app.services.tick_decoder import decode_tick
+from app.services.tick_record import as_tick
+from app.services.token_specs import group_by_mode
+from app.aio.transport import get_async_transport
+
+logger = get_logger(os.getenv("ENV", "development"))
+tick_analysis_logger = get_logger("tick_analysis")
+
+# Parser only: _parse_binary_data needs no connection state
+_PARSER = SmartWebSocketV2.__new__(SmartWebSocketV2)
+
+
+def _decoder():
+    return decode_tick if config.LEAN_DECODER_ENABLED else _PARSER._parse_binary_data
+
+
+class AsyncFeedConnection:
+    """One SmartAPI websocket on the event loop that reconnects and resubscribes by itself"""
+
+    def __init__(self, name, auth_provider, specs_provider, on_tick, correlation_id=None, on_state=None):
+        self.name = name
+        self.correlation_id = correlation_id or name
+        self.auth_provider = auth_provider    # coroutine function(refresh=False) -> auth dict or None
+        self.specs_provider = specs_provider  # callable() -> {token: (exchange_type, mode)}
+        self.on_tick = on_tick                # callable(Tick)
+        self.on_state = on_state              # optional callable("connected" | "reconnecting")
+        self.base_delay = config.RECONNECT_BASE_DELAY_MS / 1000.0
+        self.max_delay = config.RECONNECT_MAX_DELAY_SECONDS
+
+        self._ws = None
+        self._task = None
+        self._running = False
+        self._attempt = 0
+        self.last_tick_at = None
+        self.incident = None
+        self.incidents = deque(maxlen=INCIDENT_HISTORY)
+        self.reconnects = 0
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def start(self):
+        """Log in and start the connection task; returns False if the first login fails"""
+        auth = await self.auth_provider()
+        if not auth:
+            return False
+        self._running = True
+        self._task = asyncio.get_running_loop().create_task(self._run(auth))
+        return True
+
+    async def aclose(self):
+        self._running = False
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def close(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+
+    close_connection = close
+
+    @property
+    def connected(self):
+        return self._ws is not None and not self._ws.closed
+
+    # -- subscriptions -------------------------------------------------------
+
+    def subscribe(self, correlation_id, mode, token_list):
+        # Not yet open: the replay on connect picks the tokens up from specs_provider
+        if self.connected:
+            asyncio.ensure_future(self._send(SmartWebSocketV2.SUBSCRIBE_ACTION, correlation_id, mode, token_list))
+
+    def unsubscribe(self, correlation_id, mode, token_list):
+        if self.connected:
+            asyncio.ensure_future(self._send(SmartWebSocketV2.UNSUBSCRIBE_ACTION, correlation_id, mode, token_list))
+
+    async def _send(self, action, correlation_id, mode, token_list):
+        request = {"correlationID": correlation_id, "action": action,
+                   "params": {"mode": mode, "tokenList": token_list}}
+        try:
+            await self._ws.send_str(json.dumps(request))
+        except Exception as e:
+            logger.error(f"WebSocket {self.name} {'subscribe' if action else 'unsubscribe'} failed: {e}")
+
+    async def _replay(self):
+        for mode, token_list in group_by_mode(self.specs_provider()).items():
+            await self._send(SmartWebSocketV2.SUBSCRIBE_ACTION, self.correlation_id, mode, token_list)
+
+    # -- socket --------------------------------------------------------------
+
+    async def _run(self, auth):
+        while self._running:
+            was_open = await self._connect(auth)
+            if not self._running:
+                return
+            if self.incident is not None and self.incident.recovered_at is not None:
+                self._finish_incident()  # recovered earlier but no tick arrived before this drop
+            if self.incident is None:
+                self.incident = FeedIncident("closed" if was_open else "connect_failed", self.last_tick_at)
+                logger.warning(f"⚠️ WebSocket {self.name} dropped, recovering")
+            self._state("reconnecting")
+            # Never opened: the cached session may be stale, so log in afresh
+            auth = await self._reauthenticate(refresh=not was_open)
+            self.reconnects += 1
+
+    async def _connect(self, auth):
+        """Run one socket until it closes; returns True if it ever opened"""
+        headers = {
+            "Authorization": auth["jwt_token"],
+            "x-api-key": auth["api_key"],
+            "x-client-code": auth["client_code"],
+            "x-feed-token": auth["feed_token"]
+        }
+        session = get_async_transport().session
+        was_open = False
+        try:
+            async with session.ws_connect(SmartWebSocketV2.ROOT_URI, headers=headers,
+                                          heartbeat=SmartWebSocketV2.HEART_BEAT_INTERVAL) as ws:
+                self._ws = ws
+                was_open = True
+                self._attempt = 0
+                logger.info(f"WebSocket connected for {self.name}")
+                await self._replay()
+                self._recovered("reconnect")
+                self._state("connected")
+                decode = _decoder()
+                async for message in ws:
+                    if message.type == aiohttp.WSMsgType.BINARY:
+                        self._on_data(decode(message.data))
+                    elif message.type == aiohttp.WSMsgType.ERROR:
+                        logger.error(f"WebSocket error on {self.name}: {ws.exception()}")
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket {self.name} connect failed: {e}")
+        finally:
+            self._ws = None
+        return was_open
+
+    async def _reauthenticate(self, refresh):
+        while True:
+            await asyncio.sleep(self._backoff(self._attempt))
+            self._attempt += 1
+            if not self._running:
+                return None
+            if self.incident is not None:
+                self.incident.attempts += 1
+            auth = await self.auth_provider(refresh=refresh)
+            if auth:
+                return auth
+
+    def _state(self, state):
+        if self.on_state:
+            try:
+                self.on_state(state)
+            except Exception as e:
+                logger.error(f"Error in feed state callback for {self.name}: {e}")
+
+    def _backoff(self, attempt):
+        # Full-jitter exponential backoff; the first retry is almost immediate
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_data(self, message):
+        now = time.time()
+        incident = self.incident
+        if incident is not None and incident.recovered_at is not None:
+            incident.first_tick_at = now
+            self._finish_incident()
+        self.last_tick_at = now
+        self.on_tick(as_tick(message))
+
+    # -- incidents -----------------------------------------------------------
+
+    def _recovered(self, via):
+        incident = self.incident
+        if incident is None or incident.recovered_at is not None:
+            return
+        incident.recovered_at = time.time()
+        incident.via = via
+        logger.info(f"✅ WebSocket {self.name} recovered via {via} in {incident.time_to_recover_ms}ms")
+
+    def _finish_incident(self):
+        incident, self.incident = self.incident, None
+        self.incidents.append(incident)
+        record = incident.to_dict()
+        logger.info(f"📉 Feed gap for {self.name}: {record['gap_ms']}ms (recovered in {record['time_to_recover_ms']}ms)")
+        tick_analysis_logger.info(f"FEED_INCIDENT: {json.dumps(dict(record, connection=self.name))}")
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "standby_ready": False,
+            "reconnects": self.reconnects,
+            "failovers": 0,
+            "recovering": self.incident is not None and self.incident.recovered_at is None,
+            "incidents": [incident.to_dict() for incident in self.incidents]
+        }
@@ -0,0 +1,115 @@
+"""
+Async tick forwarder
+Same bounded queue and batching as TickForwarder, but the flusher is a
+task on the event loop posting through the aiohttp transport. enqueue()
+stays thread-safe because the conflator calls it from its own thread.
+"""
+import asyncio
+import json
+import os
+import time
+
+from app.logger import get_logger
+from app.services.backend_transport import CircuitOpenError
+from app.services.tick_forwarder import JSON_HEADERS, TickForwarder
+from app.services.tick_record import json_default
+from app.aio.transport import get_async_transport
+
+logger = get_logger(os.getenv("ENV", "development"))
+tick_analysis_logger = get_logger("tick_analysis")
+
+
+class _LoopWakeup:
+    """threading.Event-like set() that wakes an asyncio.Event from any thread"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def set(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+class AsyncTickForwarder(TickForwarder):
+    """TickForwarder whose flusher runs on the event loop; create it from a coroutine"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = _LoopWakeup(self._loop)
+        self._task = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._loop.call_soon_threadsafe(self._create_task)
+
+    def _create_task(self):
+        self._task = self._loop.create_task(self._run_async())
+
+    async def _run_async(self):
+        event = self._wakeup.event
+        while self._running:
+            try:
+                await asyncio.wait_for(event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            if self.pull:
+                self._pull()
+            await self.aflush()
+
+    async def aflush(self):
+        batch = self._take_batch()
+        while batch:
+            await self._apost(batch)
+            batch = self._take_batch()
+
+    async def _apost(self, batch):
+        response_time = None
+        body = b""
+        try:
+            body = json.dumps(batch, default=json_default, separators=(",", ":")).encode()
+            start_time = time.perf_counter()
+            status, text = await get_async_transport().post(self.url, data=body, headers=JSON_HEADERS)
+            response_time = (time.perf_counter() - start_time) * 1000  # ms
+            self.batches_sent += 1
+
+            if status not in [200, 201]:
+                logger.warning(f"❌ Backend candle processing failed | Status: {status} | Batch: {len(batch)} | Response: {text}")
+                tick_analysis_logger.warning(f"FORWARD_FAILED: Batch={len(batch)}, Status={status}, Response={text}")
+                self._report(False, batch, response_time, len(body))
+            else:
+                logger.debug(f"✅ Batch forwarded successfully | Ticks: {len(batch)} | Response time: {response_time:.1f}ms")
+                tick_analysis_logger.debug(f"FORWARD_SUCCESS: Batch={len(batch)}, ResponseTime={response_time:.1f}ms")
+                self._report(True, batch, response_time, len(body))
+
+        except CircuitOpenError as e:
+            logger.debug(f"⛔ Batch not forwarded | Ticks: {len(batch)} | {e}")
+            tick_analysis_logger.debug(f"FORWARD_ERROR: Batch={len(batch)}, Error={str(e)}")
+            self._report(False, batch)
+
+        except Exception as e:
+            logger.error(f"❌ Failed to forward batch to backend | Ticks: {len(batch)} | Error: {e}")
+            tick_analysis_logger.error(f"FORWARD_ERROR: Batch={len(batch)}, Error={str(e)}")
+            self._report(False, batch)
+
+    async def aclose(self):
+        """Stop the flusher task and send whatever is still queued"""
+        self._running = False
+        self._wakeup.event.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, self.flush_interval + get_async_transport().timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+        await self.aflush()
+
+    def stop(self):
+        # The blocking stop() of the threaded forwarder must not run on the loop
+        self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self.aclose()))
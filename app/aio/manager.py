@@ -0,0 +1,91 @@
+"""
+Async websocket manager
+SmartApiWebSocketManager with the feed and the forwarder moved onto the
+event loop. The per-tick pipeline (journal, metrics, conflation, candle
+engine) is shared unchanged with the eventlet runtime.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+from app.config import config
+from app.logger import get_logger
+from app.services.metrics import metrics_registry
+from app.services.status_feed import status_feed
+from app.services.tick_record import as_tick
+from app.services.websocket_manager import SmartApiWebSocketManager
+from app.aio.feed import AsyncFeedConnection
+from app.aio.forwarder import AsyncTickForwarder
+
+logger = get_logger(os.getenv("ENV", "development"))
+tick_analysis_logger = get_logger("tick_analysis")
+
+# websocket_uuid -> AsyncWebSocketManager for the asyncio runtime
+running_managers = {}
+
+# Socket.IO fan-out, callable(Tick); installed by the ASGI app for its event loop
+_client_sink = None
+
+
+def set_client_sink(sink):
+    global _client_sink
+    _client_sink = sink
+
+
+class AsyncWebSocketManager(SmartApiWebSocketManager):
+    """Manager for the asyncio runtime; construct and drive it from the event loop"""
+
+    forwarder_class = AsyncTickForwarder
+
+    async def start(self):
+        self._set_state("connecting", tokens=list(self.tokens), tokens_count=len(self.tokens),
+                        backend_url=self.backend_url)
+        if config.BROKER_ENABLED:
+            logger.warning(f"⚠️ Subscription broker is not available in the asyncio runtime; "
+                           f"{self.websocket_id} gets its own feed")
+
+        feed = AsyncFeedConnection(self.websocket_id, self._aauth, lambda: self.token_specs,
+                                   self.handle_tick, correlation_id=self.correlation_id,
+                                   on_state=self._set_state)
+        self.ws = feed
+        if not await feed.start():
+            self.ws = None
+            return None
+
+        logger.info(f"Starting SmartAPI websocket for {self.websocket_id} with {len(self.tokens)} tokens")
+        tick_analysis_logger.info(f"🚀 SESSION START - WebSocket {self.websocket_id} | Tokens: {len(self.tokens)} | Asyncio | Time: {datetime.now().isoformat()}")
+
+    def handle_tick(self, message, forward=True):
+        tick = as_tick(message)
+        super().handle_tick(tick, forward)
+        if _client_sink is not None:
+            _client_sink(tick)
+
+    async def _aauth(self, refresh=False):
+        # Logins go through the blocking session pool, so keep them off the loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._auth, refresh)
+
+    def feed_status(self):
+        return self.ws.status() if isinstance(self.ws, AsyncFeedConnection) else None
+
+    async def aclose(self):
+        self._should_run = False
+        if self.conflator:
+            self.conflator.stop()
+        if self.candle_engine:
+            for event in self.candle_engine.flush():
+                self.forwarder.enqueue(event)
+        await self.forwarder.aclose()
+        if self.ws:
+            await self.ws.aclose()
+            self.ws = None
+        self._ws_closed = True
+        metrics_registry.remove(self.websocket_id)
+        status_feed.remove(self.websocket_id)
+        logger.info(f"Stopped SmartAPI websocket for {self.websocket_id}")
+
+
+async def stop_manager(websocket_id):
+    manager = running_managers.pop(websocket_id, None)
+    if manager:
+        await manager.aclose()
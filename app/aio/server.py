@@ -0,0 +1,401 @@
+"""
+ASGI application for the asyncio runtime
+Starlette serves the same /api/* contract as the Flask blueprint and a
+python-socketio AsyncServer serves the token rooms. Both share the event
+loop with the feeds and forwarders.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import socketio
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.config import config
+from app.logger import get_logger
+from app.services.client_batching import to_client
+from app.services.market_simulator import get_market_simulator, start_market_simulator, stop_market_simulator
+from app.services.metrics import metrics_registry
+from app.services.session_manager import session_pool
+from app.services.status_feed import status_feed
+from app.services.tick_record import Tick
+from app.services.tick_store import get_tick_store
+from app.services.token_specs import parse_token_specs
+from app.aio.manager import AsyncWebSocketManager, running_managers, set_client_sink, stop_manager
+from app.aio.transport import get_async_transport
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+
+# Maps: sid => set(symboltokens)
+subscriptions = {}
+
+# Inverted index: symboltoken => set(sids); each token also has a Socket.IO room
+token_watchers = {}
+
+
+STATUS_ROOM = "status"
+
+
+def _token_room(symboltoken):
+    return f"token:{symboltoken}"
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return {}
+
+
+# -- REST --------------------------------------------------------------------
+
+async def connect(request: Request):
+    try:
+        data = await _json_body(request)
+        websocket_uuid = data.get("websocket_uuid")
+        server_credentials = data.get("server_credentials")
+        tokens = data.get("tokens", [])
+        backend_url = data.get("backend_url", "http://localhost:5001")
+
+        if not server_credentials or not websocket_uuid or not tokens:
+            return JSONResponse({"success": False, "error": "server_credentials, websocket_uuid, and tokens required"}, 400)
+
+        try:
+            parse_token_specs(tokens)
+        except ValueError as e:
+            return JSONResponse({"success": False, "error": f"Invalid token spec: {e}"}, 400)
+
+        if websocket_uuid in running_managers:
+            return JSONResponse({"success": False, "error": "WebSocket already connected"}, 400)
+
+        manager = AsyncWebSocketManager(websocket_uuid, server_credentials, tokens, backend_url)
+        running_managers[websocket_uuid] = manager
+        # Login and connect in the background - don't wait for it
+        request.app.state.tasks.add_task(manager.start())
+
+        return JSONResponse({
+            "success": True,
+            "message": f"WebSocket {websocket_uuid} connection initiated",
+            "tokens_count": len(tokens),
+            "status": "connecting"
+        }, 202)
+
+    except Exception as e:
+        return JSONResponse({"success": False, "error": f"Connection failed: {str(e)}"}, 500)
+
+
+async def disconnect_all(request: Request):
+    try:
+        disconnected_count = 0
+        for websocket_uuid in list(running_managers):
+            await stop_manager(websocket_uuid)
+            disconnected_count += 1
+        return JSONResponse({
+            "success": True,
+            "message": f"Disconnected {disconnected_count} websocket(s)",
+            "disconnected_count": disconnected_count
+        })
+    except Exception as e:
+        return JSONResponse({"success": False, "error": f"Disconnect failed: {str(e)}"}, 500)
+
+
+async def disconnect(request: Request):
+    data = await _json_body(request)
+    websocket_id = data.get("websocket_id")
+    if not websocket_id:
+        return JSONResponse({"error": "websocket_id required"}, 400)
+    await stop_manager(websocket_id)
+    return JSONResponse({"message": "WebSocket stopped"})
+
+
+async def subscribe(request: Request):
+    data = await _json_body(request)
+    websocket_id = data.get("websocket_id")
+    tokens = data.get("tokens", [])
+    client_code = data.get("client_code")
+    if not websocket_id or not tokens or not all(data.get(field) for field in ("jwt_token", "feed_token", "api_key", "client_code")):
+        return JSONResponse({"error": "websocket_id, tokens, jwt_token, feed_token, api_key, client_code required"}, 400)
+    manager = running_managers.get(websocket_id)
+    if not manager:
+        return JSONResponse({"error": "WebSocket not found"}, 404)
+    if client_code != manager.credentials.get("client_code"):
+        return JSONResponse({"error": "client_code does not match this websocket"}, 403)
+    try:
+        if manager.ws is None:
+            return JSONResponse({"error": "WebSocket not connected"}, 400)
+        diff = manager.update_subscriptions(tokens)
+        return JSONResponse({"message": "Subscribed to tokens", **diff})
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid token spec: {e}"}, 400)
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to subscribe: {e}"}, 500)
+
+
+async def status(request: Request):
+    if any(arg in request.query_params for arg in ("since", "limit", "cursor")):
+        return _versioned_status(request)
+    return JSONResponse({
+        "version": status_feed.version,
+        "total_websockets": len(running_managers),
+        "websockets": {ws_id: manager.describe() for ws_id, manager in running_managers.items()},
+        "backend_circuits": get_async_transport().status(),
+        "broker": None,
+        "session_pool": session_pool.status(),
+        "runtime": "asyncio"
+    })
+
+
+def _int_param(request, name):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _versioned_status(request):
+    since = _int_param(request, "since")
+    limit = _int_param(request, "limit")
+    cursor = request.query_params.get("cursor") or None
+    etag = status_feed.etag(since, cursor, limit)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(status_feed.delta(since, cursor, limit), headers={"ETag": etag})
+
+
+def _requested_tokens(request):
+    tokens = request.query_params.get("tokens")
+    return [t.strip() for t in tokens.split(",") if t.strip()] if tokens else None
+
+
+async def ltp(request: Request):
+    if not config.TICK_STORE_ENABLED:
+        return JSONResponse({"success": False, "error": "Tick store disabled"}, 404)
+    ticks = get_tick_store().snapshot(_requested_tokens(request))
+    return JSONResponse({"success": True, "count": sum(1 for t in ticks.values() if t), "ticks": ticks})
+
+
+async def recent_ticks(request: Request):
+    if not config.TICK_STORE_ENABLED:
+        return JSONResponse({"success": False, "error": "Tick store disabled"}, 404)
+    token = request.path_params["token"]
+    n = request.query_params.get("n")
+    ticks = get_tick_store().history(token, int(n) if n and n.isdigit() else None)
+    return JSONResponse({"success": True, "token": token, "count": len(ticks), "ticks": ticks})
+
+
+async def simulate_start(request: Request):
+    data = await _json_body(request)
+    tokens = data.get("tokens")
+    if not tokens:
+        return JSONResponse({"error": "tokens required (a count or a list of tokens)"}, 400)
+    options = {key: data[key] for key in ("tick_rate", "volatility_bps", "profile", "step_ms", "seed", "duration", "prices")
+               if data.get(key) is not None}
+    loop = asyncio.get_running_loop()
+    try:
+        # Stopping a previous run joins its thread and drains its forwarder; keep that off the loop
+        simulator = await loop.run_in_executor(None, lambda: start_market_simulator(
+            tokens, sinks=data.get("sinks") or ["socketio"], client_sink=client_tick_sink(loop), **options))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+    return JSONResponse({"message": "Simulator started", "simulator": simulator.stats()})
+
+
+async def simulate_stop(request: Request):
+    stats = await asyncio.get_running_loop().run_in_executor(None, stop_market_simulator)
+    if stats is None:
+        return JSONResponse({"error": "Simulator not running"}, 404)
+    return JSONResponse({"message": "Simulator stopped", "simulator": stats})
+
+
+async def simulate_status(request: Request):
+    simulator = get_market_simulator()
+    return JSONResponse({"simulator": simulator.stats() if simulator else None})
+
+
+async def metrics(request: Request):
+    return Response(metrics_registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def health_check(request: Request):
+    return JSONResponse({
+        "status": "healthy",
+        "service": "smartapi-worker",
+        "timestamp": datetime.now().isoformat(),
+        "active_websockets": len(running_managers)
+    })
+
+
+async def connection_status(request: Request):
+    websocket_uuid = request.path_params["websocket_uuid"]
+    try:
+        manager = running_managers.get(websocket_uuid)
+        if not manager:
+            return JSONResponse({
+                "success": False,
+                "websocket_uuid": websocket_uuid,
+                "status": "not_found",
+                "message": "WebSocket not found"
+            }, 404)
+
+        auth = manager.get_last_auth()
+        details = manager.describe()
+        return JSONResponse({
+            "success": True,
+            "websocket_uuid": websocket_uuid,
+            "status": details["status"],
+            "authenticated": details["authenticated"],
+            "active": details["active"],
+            "tokens_count": details["tokens_count"],
+            "token_specs": details["token_specs"],
+            "conflation": details["conflation"],
+            "forwarding": details["forwarding"],
+            "feed": details["feed"],
+            "metrics": manager.metrics.snapshot(),
+            "auth_data": auth if auth else None
+        })
+
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "websocket_uuid": websocket_uuid,
+            "status": "error",
+            "error": str(e)
+        }, 500)
+
+
+# -- Socket.IO -----------------------------------------------------------------
+
+@sio.on("connect")
+async def on_connect(sid, environ):
+    subscriptions[sid] = set()
+
+
+@sio.on("disconnect")
+async def on_disconnect(sid, *args):
+    # Rooms are left automatically on disconnect; only the index needs cleaning
+    for symboltoken in subscriptions.pop(sid, ()):
+        _remove_watcher(sid, symboltoken)
+
+
+@sio.on("subscribe")
+async def on_subscribe(sid, data):
+    symboltoken = str((data or {}).get("symboltoken"))
+    tokens = subscriptions.setdefault(sid, set())
+    if symboltoken in tokens:
+        return
+    tokens.add(symboltoken)
+    token_watchers.setdefault(symboltoken, set()).add(sid)
+    await sio.enter_room(sid, _token_room(symboltoken))
+    # Snapshot: the latest known tick right away instead of waiting for the next one
+    latest = get_tick_store().latest(symboltoken) if config.TICK_STORE_ENABLED else None
+    if latest is not None:
+        await sio.emit("tick", to_client(latest), to=sid)
+
+
+@sio.on("unsubscribe")
+async def on_unsubscribe(sid, data):
+    symboltoken = str((data or {}).get("symboltoken"))
+    tokens = subscriptions.get(sid)
+    if tokens and symboltoken in tokens:
+        tokens.discard(symboltoken)
+        _remove_watcher(sid, symboltoken)
+        await sio.leave_room(sid, _token_room(symboltoken))
+
+
+def _remove_watcher(sid, symboltoken):
+    watchers = token_watchers.get(symboltoken)
+    if watchers is not None:
+        watchers.discard(sid)
+        if not watchers:
+            token_watchers.pop(symboltoken, None)
+
+
+@sio.on("status_subscribe")
+async def on_status_subscribe(sid, data):
+    # Current records (or the delta since the client's version), then every change as it happens
+    await sio.enter_room(sid, STATUS_ROOM)
+    since = status_feed.parse_since((data or {}).get("since"))  # anything else: full resync
+    await sio.emit("status", status_feed.delta(since), to=sid)
+
+
+@sio.on("status_unsubscribe")
+async def on_status_unsubscribe(sid, data=None):
+    await sio.leave_room(sid, STATUS_ROOM)
+
+
+async def emit_tick_to_clients(tick):
+    # One emit per token room, as in the eventlet runtime
+    symboltoken = tick.token if type(tick) is Tick else tick.get("symboltoken")
+    await sio.emit("tick", to_client(tick), room=_token_room(symboltoken))
+
+
+def client_tick_sink(loop):
+    """callable(tick) running emit_tick_to_clients on loop; safe from the loop and from other threads"""
+    def sink(tick):
+        symboltoken = tick.token if type(tick) is Tick else tick.get("symboltoken")
+        if token_watchers.get(symboltoken):
+            asyncio.run_coroutine_threadsafe(emit_tick_to_clients(tick), loop)
+    return sink
+
+
+# -- app -----------------------------------------------------------------------
+
+class _BackgroundTasks:
+    """Keeps references to fire-and-forget tasks until they finish"""
+
+    def __init__(self):
+        self._tasks = set()
+
+    def add_task(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+
+    def emit_status(delta):
+        # Managers publish from the loop and from login executor threads
+        asyncio.run_coroutine_threadsafe(sio.emit("status", delta, room=STATUS_ROOM), loop)
+
+    status_feed.add_listener(emit_status)
+    set_client_sink(client_tick_sink(loop))
+    logger.info("🚀 Asyncio runtime started")
+    yield
+    set_client_sink(None)
+    status_feed.remove_listener(emit_status)
+    await loop.run_in_executor(None, stop_market_simulator)
+    for websocket_uuid in list(running_managers):
+        await stop_manager(websocket_uuid)
+    await get_async_transport().close()
+    logger.info("🛑 Asyncio runtime stopped")
+
+
+def create_app():
+    """Starlette /api/* routes wrapped by the Socket.IO ASGI app"""
+    api = Starlette(routes=[
+        Route("/api/connect", connect, methods=["POST"]),
+        Route("/api/disconnect-all", disconnect_all, methods=["POST"]),
+        Route("/api/disconnect", disconnect, methods=["POST"]),
+        Route("/api/subscribe", subscribe, methods=["POST"]),
+        Route("/api/status", status, methods=["GET"]),
+        Route("/api/ltp", ltp, methods=["GET"]),
+        Route("/api/ticks/{token}", recent_ticks, methods=["GET"]),
+        Route("/api/simulate/start", simulate_start, methods=["POST"]),
+        Route("/api/simulate/stop", simulate_stop, methods=["POST"]),
+        Route("/api/simulate/status", simulate_status, methods=["GET"]),
+        Route("/api/metrics", metrics, methods=["GET"]),
+        Route("/api/health", health_check, methods=["GET"]),
+        Route("/api/connection-status/{websocket_uuid}", connection_status, methods=["GET"]),
+    ], lifespan=lifespan)
+    api.state.tasks = _BackgroundTasks()
+    return socketio.ASGIApp(sio, other_asgi_app=api)
@@ -0,0 +1,77 @@
+"""
+Async backend transport
+aiohttp counterpart of BackendTransport: one pooled ClientSession for all
+backend origins, with the same per-origin circuit breakers.
+"""
+import os
+
+import aiohttp
+
+from app.config import config
+from app.logger import get_logger
+from app.services.backend_transport import BackendTransport, CircuitBreaker, CircuitOpenError
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+
+class AsyncBackendTransport:
+    """Keep-alive aiohttp session shared by every forwarder on the event loop"""
+
+    def __init__(self, pool_size=None, timeout=None):
+        self.pool_size = pool_size or config.BACKEND_POOL_SIZE
+        self.timeout = timeout or config.FORWARD_TIMEOUT
+        self._session = None
+        self._breakers = {}
+
+    @property
+    def session(self):
+        # Created lazily so it binds to the running loop
+        if self._session is None or self._session.closed:
+            # No session-wide timeout: the feed websockets share this session
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _breaker(self, url):
+        origin = BackendTransport._origin(url)
+        breaker = self._breakers.get(origin)
+        if breaker is None:
+            breaker = self._breakers[origin] = CircuitBreaker(origin)
+        return breaker
+
+    async def post(self, url, data=None, headers=None):
+        """POST and return (status, text); raises CircuitOpenError when the circuit is open"""
+        breaker = self._breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Backend circuit open for {breaker.name}")
+        try:
+            async with self.session.post(url, data=data, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                text = await response.text()
+        except Exception:
+            breaker.record_failure()
+            raise
+        if response.status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response.status, text
+
+    def status(self):
+        return {origin: breaker.snapshot() for origin, breaker in list(self._breakers.items())}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_transport = None
+
+
+def get_async_transport():
+    """Process-wide AsyncBackendTransport (event loop thread only)"""
+    global _transport
+    if _transport is None:
+        _transport = AsyncBackendTransport()
+    return _transport
@@ -30,6 +30,91 @@ class Config:
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'false').lower() == 'true'
+    
+    # Tick analysis logging (TICK_DATA records)
+    TICK_LOG_SAMPLE_EVERY = max(1, int(os.getenv('TICK_LOG_SAMPLE_EVERY', 1)))
+    TICK_LOG_TOKENS = {t.strip() for t in os.getenv('TICK_LOG_TOKENS', '').split(',') if t.strip()}
+    TICK_LOG_RAW = os.getenv('TICK_LOG_RAW', 'false').lower() == 'true'
+    
+    # Tick forwarding (batched, queue-based)
+    FORWARD_BATCH_SIZE = int(os.getenv('FORWARD_BATCH_SIZE', 100))
+    FORWARD_FLUSH_INTERVAL_MS = int(os.getenv('FORWARD_FLUSH_INTERVAL_MS', 200))
+    FORWARD_QUEUE_SIZE = int(os.getenv('FORWARD_QUEUE_SIZE', 10000))
+    FORWARD_OVERFLOW_POLICY = os.getenv('FORWARD_OVERFLOW_POLICY', 'drop_oldest')  # drop_oldest | drop_newest | conflate
+    FORWARD_TIMEOUT = float(os.getenv('FORWARD_TIMEOUT', 2))
+    
+    # Backend transport (keep-alive pool + circuit breaker)
+    BACKEND_POOL_SIZE = int(os.getenv('BACKEND_POOL_SIZE', 10))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', 10))
+    
+    # In-worker candle engine (forwards bar updates/closes instead of raw ticks)
+    CANDLE_ENGINE_ENABLED = os.getenv('CANDLE_ENGINE_ENABLED', 'false').lower() == 'true'
+    CANDLE_TIMEFRAMES = [int(tf) for tf in os.getenv('CANDLE_TIMEFRAMES', '1,5,15,60').split(',') if tf.strip()]
+    CANDLE_UPDATE_INTERVAL_MS = int(os.getenv('CANDLE_UPDATE_INTERVAL_MS', 1000))
+    CANDLE_SESSION_ANCHOR_MINUTES = int(os.getenv('CANDLE_SESSION_ANCHOR_MINUTES', 555))  # 09:15 IST
+    
+    # Tick conflation (latest-value-wins per token before forwarding)
+    CONFLATION_ENABLED = os.getenv('CONFLATION_ENABLED', 'false').lower() == 'true'
+    CONFLATION_WINDOW_MS = int(os.getenv('CONFLATION_WINDOW_MS', 100))
+    CONFLATION_EXEMPT_TOKENS = [t.strip() for t in os.getenv('CONFLATION_EXEMPT_TOKENS', '').split(',') if t.strip()]
+    
+    # SmartAPI session pool (per client_code, JWT valid 24h)
+    SESSION_MAX_AGE_HOURS = float(os.getenv('SESSION_MAX_AGE_HOURS', 20))
+    SESSION_REFRESH_AFTER_HOURS = float(os.getenv('SESSION_REFRESH_AFTER_HOURS', 18))
+    SESSION_REFRESH_CHECK_SECONDS = int(os.getenv('SESSION_REFRESH_CHECK_SECONDS', 300))
+    
+    # Feed reconnects (jittered exponential backoff) and hot standby
+    RECONNECT_BASE_DELAY_MS = int(os.getenv('RECONNECT_BASE_DELAY_MS', 500))
+    RECONNECT_MAX_DELAY_SECONDS = float(os.getenv('RECONNECT_MAX_DELAY_SECONDS', 30))
+    HOT_STANDBY_ENABLED = os.getenv('HOT_STANDBY_ENABLED', 'false').lower() == 'true'
+    
+    # Decode only the tick fields the pipeline uses (false: full SmartWebSocketV2 dicts)
+    LEAN_DECODER_ENABLED = os.getenv('LEAN_DECODER_ENABLED', 'true').lower() == 'true'
+    
+    # Sharded multi-process mode (SHARD_COUNT > 1; one process per SHARD_INDEX)
+    SHARD_COUNT = max(1, int(os.getenv('SHARD_COUNT', 1)))
+    SHARD_INDEX = int(os.getenv('SHARD_INDEX', 0))
+    SHARDING_ENABLED = SHARD_COUNT > 1
+    SHARD_REGISTRY_PATH = os.getenv('SHARD_REGISTRY_PATH', os.path.join(os.path.dirname(__file__), '..', 'logs', 'shards.sqlite3'))
+    SHARD_ADVERTISE_HOST = os.getenv('SHARD_ADVERTISE_HOST', '127.0.0.1')
+    SHARD_HEARTBEAT_SECONDS = int(os.getenv('SHARD_HEARTBEAT_SECONDS', 5))
+    SHARD_PROXY_TIMEOUT = float(os.getenv('SHARD_PROXY_TIMEOUT', 5))
+    
+    # Shared upstream subscription broker (dedupes tokens across websocket_uuids)
+    BROKER_ENABLED = os.getenv('BROKER_ENABLED', 'false').lower() == 'true'
+    BROKER_TOKENS_PER_CONNECTION = int(os.getenv('BROKER_TOKENS_PER_CONNECTION', 1000))
+    BROKER_MAX_CONNECTIONS = int(os.getenv('BROKER_MAX_CONNECTIONS', 3))
+    
+    # Socket.IO client batching (clients opt in with a `configure` event)
+    CLIENT_BATCH_INTERVAL_MS = int(os.getenv('CLIENT_BATCH_INTERVAL_MS', 100))
+    CLIENT_BATCH_MIN_INTERVAL_MS = int(os.getenv('CLIENT_BATCH_MIN_INTERVAL_MS', 20))
+    
+    # Latest tick + ring buffer of recent ticks per token (/api/ltp, /api/ticks/<token>)
+    TICK_STORE_ENABLED = os.getenv('TICK_STORE_ENABLED', 'true').lower() == 'true'
+    TICK_STORE_HISTORY = int(os.getenv('TICK_STORE_HISTORY', 100))
+    
+    # Historical candles (RealTimeCandleTracker): on-disk cache and getCandleData pacing
+    CANDLE_CACHE_DIR = os.getenv('CANDLE_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'logs', 'candles'))
+    HISTORICAL_REQUEST_GAP_MS = int(os.getenv('HISTORICAL_REQUEST_GAP_MS', 350))
+    
+    # Market simulator (app/services/market_simulator.py, /api/simulate, simulate_load.py)
+    SIM_TICK_RATE = float(os.getenv('SIM_TICK_RATE', 2))  # mean ticks per second per token
+    SIM_VOLATILITY_BPS = float(os.getenv('SIM_VOLATILITY_BPS', 2))  # stdev of one tick's move
+    SIM_PROFILE = os.getenv('SIM_PROFILE', 'flat')  # flat | market_open | bursts
+    SIM_STEP_MS = int(os.getenv('SIM_STEP_MS', 50))
+    SIM_BURST_MULTIPLIER = float(os.getenv('SIM_BURST_MULTIPLIER', 8))
+    SIM_OPEN_DECAY_SECONDS = float(os.getenv('SIM_OPEN_DECAY_SECONDS', 60))
+    SIM_BURST_PROBABILITY = float(os.getenv('SIM_BURST_PROBABILITY', 0.05))  # bursts per second
+    SIM_BURST_SECONDS = float(os.getenv('SIM_BURST_SECONDS', 5))
+    SIM_TRADE_SIZE = int(os.getenv('SIM_TRADE_SIZE', 50))  # mean volume per tick
+    SIM_FIRST_TOKEN = int(os.getenv('SIM_FIRST_TOKEN', 900000))  # generated tokens when a count is given
+    
+    # Binary tick journal
+    JOURNAL_ENABLED = os.getenv('JOURNAL_ENABLED', 'false').lower() == 'true'
+    JOURNAL_DIR = os.getenv('JOURNAL_DIR', os.path.join(os.path.dirname(__file__), '..', 'logs', 'journal'))
+    JOURNAL_SEGMENT_MB = float(os.getenv('JOURNAL_SEGMENT_MB', 64))
     
     @classmethod
     def get_backend_tick_url(cls, websocket_id):
@@ -41,6 +126,11 @@ class Config:
         """Get the backend webhook URL for candle data"""
         return f"{cls.BACKEND_BASE_URL}/api/in-memory-candles/process-tick"
     
+    @classmethod
+    def get_backend_bar_url(cls):
+        """Get the backend webhook URL for worker-built candle bars"""
+        return f"{cls.BACKEND_BASE_URL}/api/in-memory-candles/process-bars"
+    
     @classmethod
     def display_config(cls):
         """Display current configuration (without sensitive data)"""
@@ -52,7 +142,43 @@ class Config:
             'WORKER_PORT': cls.WORKER_PORT,
             'SMARTAPI_API_KEY': cls.SMARTAPI_API_KEY[:8] + '***' if cls.SMARTAPI_API_KEY else 'Will be provided via API',
             'SMARTAPI_CLIENT_CODE': cls.SMARTAPI_CLIENT_CODE[:4] + '***' if cls.SMARTAPI_CLIENT_CODE else 'Will be provided via API',
-            'LOG_LEVEL': cls.LOG_LEVEL
+            'LOG_LEVEL': cls.LOG_LEVEL,
+            'LOG_ASYNC': cls.LOG_ASYNC,
+            'TICK_LOG_SAMPLE_EVERY': cls.TICK_LOG_SAMPLE_EVERY,
+            'TICK_LOG_RAW': cls.TICK_LOG_RAW,
+            'FORWARD_BATCH_SIZE': cls.FORWARD_BATCH_SIZE,
+            'FORWARD_FLUSH_INTERVAL_MS': cls.FORWARD_FLUSH_INTERVAL_MS,
+            'FORWARD_QUEUE_SIZE': cls.FORWARD_QUEUE_SIZE,
+            'FORWARD_OVERFLOW_POLICY': cls.FORWARD_OVERFLOW_POLICY,
+            'BACKEND_POOL_SIZE': cls.BACKEND_POOL_SIZE,
+            'CIRCUIT_FAILURE_THRESHOLD': cls.CIRCUIT_FAILURE_THRESHOLD,
+            'CIRCUIT_RESET_SECONDS': cls.CIRCUIT_RESET_SECONDS,
+            'CANDLE_ENGINE_ENABLED': cls.CANDLE_ENGINE_ENABLED,
+            'CANDLE_TIMEFRAMES': cls.CANDLE_TIMEFRAMES,
+            'CONFLATION_ENABLED': cls.CONFLATION_ENABLED,
+            'CONFLATION_WINDOW_MS': cls.CONFLATION_WINDOW_MS,
+            'SESSION_MAX_AGE_HOURS': cls.SESSION_MAX_AGE_HOURS,
+            'SESSION_REFRESH_AFTER_HOURS': cls.SESSION_REFRESH_AFTER_HOURS,
+            'RECONNECT_BASE_DELAY_MS': cls.RECONNECT_BASE_DELAY_MS,
+            'RECONNECT_MAX_DELAY_SECONDS': cls.RECONNECT_MAX_DELAY_SECONDS,
+            'HOT_STANDBY_ENABLED': cls.HOT_STANDBY_ENABLED,
+            'LEAN_DECODER_ENABLED': cls.LEAN_DECODER_ENABLED,
+            'SHARD_COUNT': cls.SHARD_COUNT,
+            'SHARD_INDEX': cls.SHARD_INDEX,
+            'BROKER_ENABLED': cls.BROKER_ENABLED,
+            'BROKER_TOKENS_PER_CONNECTION': cls.BROKER_TOKENS_PER_CONNECTION,
+            'BROKER_MAX_CONNECTIONS': cls.BROKER_MAX_CONNECTIONS,
+            'CLIENT_BATCH_INTERVAL_MS': cls.CLIENT_BATCH_INTERVAL_MS,
+            'TICK_STORE_ENABLED': cls.TICK_STORE_ENABLED,
+            'TICK_STORE_HISTORY': cls.TICK_STORE_HISTORY,
+            'CANDLE_CACHE_DIR': cls.CANDLE_CACHE_DIR,
+            'HISTORICAL_REQUEST_GAP_MS': cls.HISTORICAL_REQUEST_GAP_MS,
+            'SIM_TICK_RATE': cls.SIM_TICK_RATE,
+            'SIM_VOLATILITY_BPS': cls.SIM_VOLATILITY_BPS,
+            'SIM_PROFILE': cls.SIM_PROFILE,
+            'SIM_STEP_MS': cls.SIM_STEP_MS,
+            'JOURNAL_ENABLED': cls.JOURNAL_ENABLED,
+            'JOURNAL_DIR': cls.JOURNAL_DIR
         }
 
 # Create a global config instance
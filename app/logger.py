@@ -1,7 +1,28 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 
+_listeners = []
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record):
+        # The stock handler formats here, in the caller's thread; skip that and
+        # hand the record over as-is. Callers must pass immutable or no-longer-
+        # mutated objects as %-args.
+        return record
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+
+
 def get_logger(env: str):
     log_dir = os.path.join(os.path.dirname(__file__), "..", "logs")
     os.makedirs(log_dir, exist_ok=True)
@@ -9,19 +30,30 @@ def get_logger(env: str):
     log_filename = os.path.join(log_dir, f"{env}_{datetime.now().strftime('%Y%m%d')}.log")
 
     logger = logging.getLogger(env)
-    logger.setLevel(logging.DEBUG)
+    # Per-logger override (e.g. TICK_ANALYSIS_LOG_LEVEL), else the global LOG_LEVEL
+    level = os.getenv(f"{env.upper()}_LOG_LEVEL") or os.getenv("LOG_LEVEL", "INFO")
+    logger.setLevel(level.upper())
 
     # Avoid duplicate handlers
     if not logger.handlers:
         file_handler = logging.FileHandler(log_filename)
-        file_handler.setLevel(logging.DEBUG)
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         file_handler.setFormatter(formatter)
 
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        if os.getenv("LOG_ASYNC", "false").lower() == "true":
+            # Formatting and I/O happen on a background listener fed by a queue
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+            listener.start()
+            if not _listeners:
+                atexit.register(_stop_listeners)
+            _listeners.append(listener)
+            logger.addHandler(DeferredQueueHandler(log_queue))
+        else:
+            logger.addHandler(file_handler)
+            logger.addHandler(console_handler)
 
     return logger
@@ -1,13 +1,52 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime
+import json
 from app.services.tracker import (
     start_tracking,
     stop_tracking
 )
 from app.services.websocket_manager import get_websocket_status, SmartApiWebSocketManager, _running_websockets
+from app.services.backend_transport import get_transport
+from app.services.metrics import metrics_registry
+from app.services.subscription_broker import get_broker
+from app.services.session_manager import session_pool
+from app.services.token_specs import parse_token_specs
+from app.services.shard_registry import SHARD_FORWARD_HEADER, get_registry
+from app.services.tick_store import get_tick_store
+from app.services.status_feed import status_feed
+from app.services.market_simulator import get_market_simulator, start_market_simulator, stop_market_simulator
+from app.config import config
 
 api = Blueprint("api", __name__)
 
+def _proxy_to_owner(websocket_uuid):
+    """In sharded mode, relay this request to the shard owning websocket_uuid (None if it is us)"""
+    registry = get_registry()
+    if registry is None or not websocket_uuid or request.headers.get(SHARD_FORWARD_HEADER):
+        return None
+    owner = registry.owner_of(websocket_uuid)
+    if owner == registry.shard_index:
+        return None
+    status_code, body, content_type = registry.proxy(owner, request.method, request.full_path.rstrip("?"),
+                                                     request.get_data(), request.content_type)
+    return Response(body, status=status_code, content_type=content_type)
+
+def _fan_out(path, method="GET"):
+    """Call every other live shard with the forward header; returns {shard_index: (status, json or None)}"""
+    registry = get_registry()
+    if registry is None or request.headers.get(SHARD_FORWARD_HEADER):
+        return {}
+    results = {}
+    for index, shard in registry.shards().items():
+        if index == registry.shard_index or not shard["alive"]:
+            continue
+        status_code, body, _ = registry.proxy(index, method, path, b"" if method == "POST" else None, "application/json")
+        try:
+            results[index] = (status_code, json.loads(body))
+        except ValueError:
+            results[index] = (status_code, None)
+    return results
+
 # New endpoint: connect a websocket with credentials and up to 50 tokens (updated for backend integration)
 @api.route("/connect", methods=["POST"])
 def connect():
@@ -20,6 +59,16 @@ def connect():
         
         if not server_credentials or not websocket_uuid or not tokens:
             return jsonify({"success": False, "error": "server_credentials, websocket_uuid, and tokens required"}), 400
+        
+        proxied = _proxy_to_owner(websocket_uuid)
+        if proxied is not None:
+            return proxied
+        
+        # Tokens are strings or {"token", "exchangeType", "mode"} dicts
+        try:
+            parse_token_specs(tokens)
+        except ValueError as e:
+            return jsonify({"success": False, "error": f"Invalid token spec: {e}"}), 400
             
         # Check if websocket is already connected
         if websocket_uuid in _running_websockets:
@@ -32,6 +81,9 @@ def connect():
         # Start connection in background - don't wait for it
         import eventlet
         eventlet.spawn_n(manager.start)
+        registry = get_registry()
+        if registry:
+            registry.record_connection(websocket_uuid, tokens)
         
         # Return immediately with accepted status
         return jsonify({
@@ -49,13 +101,19 @@ def connect():
 def disconnect_all():
     try:
         disconnected_count = 0
+        registry = get_registry()
         for websocket_uuid in list(_running_websockets.keys()):
             stop_tracking(websocket_uuid)
+            if registry:
+                registry.remove_connection(websocket_uuid)
             disconnected_count += 1
+        for _, (_, body) in _fan_out("/api/disconnect-all", "POST").items():
+            disconnected_count += (body or {}).get("disconnected_count", 0)
             
         return jsonify({
             "success": True, 
-            "message": f"Disconnected {disconnected_count} websocket(s)"
+            "message": f"Disconnected {disconnected_count} websocket(s)",
+            "disconnected_count": disconnected_count
         })
     except Exception as e:
         return jsonify({"success": False, "error": f"Disconnect failed: {str(e)}"}), 500
@@ -67,7 +125,13 @@ def disconnect():
     websocket_id = data.get("websocket_id")
     if not websocket_id:
         return jsonify({"error": "websocket_id required"}), 400
+    proxied = _proxy_to_owner(websocket_id)
+    if proxied is not None:
+        return proxied
     stop_tracking(websocket_id)
+    registry = get_registry()
+    if registry:
+        registry.remove_connection(websocket_id)
     return jsonify({"message": "WebSocket stopped"})
 
 # New endpoint: subscribe to tokens using auth/session info
@@ -82,46 +146,140 @@ def subscribe():
     client_code = data.get("client_code")
     if not websocket_id or not tokens or not jwt_token or not feed_token or not api_key or not client_code:
         return jsonify({"error": "websocket_id, tokens, jwt_token, feed_token, api_key, client_code required"}), 400
+    proxied = _proxy_to_owner(websocket_id)
+    if proxied is not None:
+        return proxied
     # Find the manager and subscribe to new tokens
     manager = _running_websockets.get(websocket_id)
     if not manager:
         return jsonify({"error": "WebSocket not found"}), 404
-    # Subscribe to new tokens
+    if client_code != manager.credentials.get("client_code"):
+        return jsonify({"error": "client_code does not match this websocket"}), 403
+    # tokens is the full desired set; only the difference is sent to SmartAPI
     try:
-        ws = manager.ws
-        if ws is None:
+        if manager.ws is None:
             return jsonify({"error": "WebSocket not connected"}), 400
-        token_list = [{"exchangeType": 1, "tokens": tokens}]
-        correlation_id = f"ws_{websocket_id}"
-        ws.subscribe(correlation_id, 1, token_list)
-        manager.tokens = tokens
-        return jsonify({"message": "Subscribed to tokens"})
+        diff = manager.update_subscriptions(tokens)
+        return jsonify({"message": "Subscribed to tokens", **diff})
+    except ValueError as e:
+        return jsonify({"error": f"Invalid token spec: {e}"}), 400
     except Exception as e:
         return jsonify({"error": f"Failed to subscribe: {e}"}), 500
 
 # Optional: status endpoint
 @api.route("/status", methods=["GET"])
 def status():
-    """Get status of all WebSocket connections"""
+    """Get status of all WebSocket connections
+
+    With ?since=<version> (0 for everything) and/or ?limit=&cursor=, only the
+    versioned state records of this process are returned, with an ETag.
+    """
+    if any(arg in request.args for arg in ("since", "limit", "cursor")):
+        return _versioned_status()
     websocket_statuses = {}
     
     for ws_id, manager in _running_websockets.items():
-        auth = manager.get_last_auth()
-        is_connected = manager.ws is not None and not manager._ws_closed
-        
-        websocket_statuses[ws_id] = {
-            "tokens": manager.tokens,
-            "tokens_count": len(manager.tokens) if manager.tokens else 0,
-            "active": is_connected,
-            "authenticated": bool(auth),
-            "status": "connected" if (auth and is_connected) else "connecting",
-            "backend_url": manager.backend_url
-        }
+        websocket_statuses[ws_id] = manager.describe()
     
-    return jsonify({
+    response = {
+        "version": status_feed.version,
         "total_websockets": len(_running_websockets),
-        "websockets": websocket_statuses
-    })
+        "websockets": websocket_statuses,
+        "backend_circuits": get_transport().status(),
+        "broker": get_broker().status() if config.BROKER_ENABLED else None,
+        "session_pool": session_pool.status()
+    }
+    
+    # Sharded mode: merge the other shards' websockets into one view
+    registry = get_registry()
+    if registry and not request.headers.get(SHARD_FORWARD_HEADER):
+        shards = {registry.shard_index: {"ok": True, "total_websockets": len(_running_websockets)}}
+        for index, (status_code, body) in _fan_out("/api/status").items():
+            ok = status_code == 200 and body is not None
+            shards[index] = {"ok": ok, "total_websockets": body.get("total_websockets", 0) if ok else None}
+            if ok:
+                response["websockets"].update(body.get("websockets", {}))
+                response["total_websockets"] += body.get("total_websockets", 0)
+        response["shards"] = shards
+    
+    return jsonify(response)
+
+def _versioned_status():
+    since = request.args.get("since", type=int)
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor") or None
+    etag = status_feed.etag(since, cursor, limit)
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+    response = jsonify(status_feed.delta(since, cursor, limit))
+    response.headers["ETag"] = etag
+    return response
+
+def _requested_tokens():
+    tokens = request.args.get("tokens")
+    return [t.strip() for t in tokens.split(",") if t.strip()] if tokens else None
+
+# Latest tick per token: /ltp?tokens=3045,2885 (all known tokens without ?tokens)
+@api.route("/ltp", methods=["GET"])
+def ltp():
+    if not config.TICK_STORE_ENABLED:
+        return jsonify({"success": False, "error": "Tick store disabled"}), 404
+    ticks = get_tick_store().snapshot(_requested_tokens())
+    # Sharded mode: each shard only sees its own feeds; keep the newest tick per token
+    for _, (status_code, body) in _fan_out(request.full_path.rstrip("?")).items():
+        if status_code != 200 or not body:
+            continue
+        for token, tick in body.get("ticks", {}).items():
+            current = ticks.get(token)
+            if tick and (current is None or tick["received_at"] > current["received_at"]):
+                ticks[token] = tick
+    return jsonify({"success": True, "count": sum(1 for t in ticks.values() if t), "ticks": ticks})
+
+# Recent ticks for one token, oldest first: /ticks/3045?n=50
+@api.route("/ticks/<token>", methods=["GET"])
+def recent_ticks(token):
+    if not config.TICK_STORE_ENABLED:
+        return jsonify({"success": False, "error": "Tick store disabled"}), 404
+    n = request.args.get("n", type=int)
+    ticks = get_tick_store().history(token, n)
+    if not ticks:
+        for _, (status_code, body) in _fan_out(request.full_path.rstrip("?")).items():
+            if status_code == 200 and body and body.get("ticks"):
+                ticks = body["ticks"]
+                break
+    return jsonify({"success": True, "token": token, "count": len(ticks), "ticks": ticks})
+
+# Load generation without a broker: simulated ticks into Socket.IO and/or the forwarding path
+@api.route("/simulate/start", methods=["POST"])
+def simulate_start():
+    data = request.get_json() or {}
+    tokens = data.get("tokens")
+    if not tokens:
+        return jsonify({"error": "tokens required (a count or a list of tokens)"}), 400
+    options = {key: data[key] for key in ("tick_rate", "volatility_bps", "profile", "step_ms", "seed", "duration", "prices")
+               if data.get(key) is not None}
+    try:
+        simulator = start_market_simulator(tokens, sinks=data.get("sinks") or ["socketio"], **options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Simulator started", "simulator": simulator.stats()})
+
+@api.route("/simulate/stop", methods=["POST"])
+def simulate_stop():
+    stats = stop_market_simulator()
+    if stats is None:
+        return jsonify({"error": "Simulator not running"}), 404
+    return jsonify({"message": "Simulator stopped", "simulator": stats})
+
+@api.route("/simulate/status", methods=["GET"])
+def simulate_status():
+    simulator = get_market_simulator()
+    return jsonify({"simulator": simulator.stats() if simulator else None})
+
+# Prometheus scrape endpoint: per-connection and per-token counters, latency histograms
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 # Health check endpoint for PM2 and load balancers
 @api.route("/health", methods=["GET"])
@@ -136,6 +294,9 @@ def health_check():
 # New endpoint: check connection status for a specific websocket
 @api.route("/connection-status/<websocket_uuid>", methods=["GET"])
 def connection_status(websocket_uuid):
+    proxied = _proxy_to_owner(websocket_uuid)
+    if proxied is not None:
+        return proxied
     try:
         manager = _running_websockets.get(websocket_uuid)
         if not manager:
@@ -148,15 +309,20 @@ def connection_status(websocket_uuid):
             
         # Check if authenticated
         auth = manager.get_last_auth()
-        is_connected = manager.ws is not None and not manager._ws_closed
+        details = manager.describe()
         
         return jsonify({
             "success": True,
             "websocket_uuid": websocket_uuid,
-            "status": "connected" if (auth and is_connected) else "connecting",
-            "authenticated": bool(auth),
-            "active": is_connected,
-            "tokens_count": len(manager.tokens) if manager.tokens else 0,
+            "status": details["status"],
+            "authenticated": details["authenticated"],
+            "active": details["active"],
+            "tokens_count": details["tokens_count"],
+            "token_specs": details["token_specs"],
+            "conflation": details["conflation"],
+            "forwarding": details["forwarding"],
+            "feed": details["feed"],
+            "metrics": manager.metrics.snapshot(),
             "auth_data": auth if auth else None
         })
         
@@ -0,0 +1,155 @@
+"""
+Shared backend transport
+One pooled keep-alive requests.Session per backend origin, guarded by a
+circuit breaker so a dead backend fails fast instead of costing a full
+timeout on every forward.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import config
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the backend circuit is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures, half-open probe after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or config.CIRCUIT_RESET_SECONDS
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: let exactly one probe through
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"🔌 Backend circuit closed for {self.name}")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(f"⛔ Backend circuit opened for {self.name} after {self.consecutive_failures} failure(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips
+        }
+
+
+class BackendTransport:
+    """Pooled keep-alive HTTP transport shared by all websocket managers"""
+
+    def __init__(self, pool_size=None, timeout=None):
+        self.pool_size = pool_size or config.BACKEND_POOL_SIZE
+        self.timeout = timeout or config.FORWARD_TIMEOUT
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _origin(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _get(self, url):
+        origin = self._origin(url)
+        session = self._sessions.get(origin)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(origin)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                          max_retries=0, pool_block=False)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._breakers[origin] = CircuitBreaker(origin)
+                    self._sessions[origin] = session
+        return session, self._breakers[origin]
+
+    def post(self, url, json=None, data=None, headers=None, timeout=None):
+        """POST through the pooled session for url's origin; raises CircuitOpenError when open"""
+        session, breaker = self._get(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Backend circuit open for {breaker.name}")
+        try:
+            response = session.post(url, json=json, data=data, headers=headers, timeout=timeout or self.timeout)
+        except Exception:
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def status(self):
+        return {origin: breaker.snapshot() for origin, breaker in list(self._breakers.items())}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._breakers.clear()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Process-wide BackendTransport shared by every manager"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = BackendTransport()
+    return _transport
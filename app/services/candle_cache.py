@@ -0,0 +1,152 @@
+"""
+On-disk historical candle cache
+One file per (exchange, token, interval) under CANDLE_CACHE_DIR holding
+the time ranges already fetched from SmartAPI and the candles as columns
+(timestamp, open, high, low, close, volume). Ranges are half-open epoch
+second intervals, kept sorted and merged, so a request only has to fetch
+the gaps it does not cover.
+"""
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"TXCC"
+VERSION = 1
+# magic, version, range count, candle count
+HEADER = struct.Struct("<4sHII")
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def cache_lock(path):
+    """Per-file lock shared by every tracker in the process"""
+    with _file_locks_lock:
+        return _file_locks.setdefault(path, threading.Lock())
+
+
+def merge_ranges(ranges):
+    """Sorted union of (start, end) ranges; touching ranges are joined"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def missing_ranges(covered, start, end):
+    """Parts of [start, end) not inside the sorted, merged covered ranges"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class CandleCache:
+    """Columnar candle file for one (exchange, token, interval)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.ranges = []
+        self.timestamps = array("q")
+        self.opens = array("d")
+        self.highs = array("d")
+        self.lows = array("d")
+        self.closes = array("d")
+        self.volumes = array("q")
+        self.load()
+
+    @property
+    def columns(self):
+        return (self.timestamps, self.opens, self.highs, self.lows, self.closes, self.volumes)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{self.path} is truncated")
+        magic, version, range_count, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a v{VERSION} candle cache file")
+        if len(data) != HEADER.size + 16 * range_count + 48 * count:
+            raise ValueError(f"{self.path} is truncated or corrupt")
+        offset = HEADER.size
+        bounds = array("q")
+        bounds.frombytes(data[offset:offset + 16 * range_count])
+        offset += 16 * range_count
+        self.ranges = [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2)]
+        for column in self.columns:
+            column.frombytes(data[offset:offset + 8 * count])
+            offset += 8 * count
+
+    def save(self):
+        """Rewrite the file atomically"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        bounds = array("q")
+        for start, end in self.ranges:
+            bounds.append(start)
+            bounds.append(end)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.ranges), len(self.timestamps)))
+            bounds.tofile(f)
+            for column in self.columns:
+                column.tofile(f)
+        os.replace(tmp_path, self.path)
+
+    def missing(self, start, end):
+        return missing_ranges(self.ranges, start, end)
+
+    def add(self, rows, covered=None):
+        """Merge (ts, o, h, l, c, v) rows (newer rows win on equal ts) and mark (start, end) as covered"""
+        if rows:
+            if (not self.timestamps or rows[0][0] > self.timestamps[-1]) and _ascending(rows):
+                merged = rows  # common case: newer data appended after the cached tail
+            else:
+                by_ts = {row[0]: row for row in self.rows(None, None)}
+                for row in rows:
+                    by_ts[row[0]] = row
+                merged = [by_ts[ts] for ts in sorted(by_ts)]
+                for column in self.columns:
+                    del column[:]
+            for ts, o, h, l, c, v in merged:
+                self.timestamps.append(ts)
+                self.opens.append(o)
+                self.highs.append(h)
+                self.lows.append(l)
+                self.closes.append(c)
+                self.volumes.append(int(v))
+        if covered:
+            self.ranges = merge_ranges(self.ranges + [covered])
+
+    def rows(self, start, end):
+        """(ts, o, h, l, c, v) tuples with start <= ts < end (None for open bounds)"""
+        lo = 0 if start is None else bisect_left(self.timestamps, start)
+        hi = len(self.timestamps) if end is None else bisect_left(self.timestamps, end)
+        return list(zip(self.timestamps[lo:hi], self.opens[lo:hi], self.highs[lo:hi],
+                        self.lows[lo:hi], self.closes[lo:hi], self.volumes[lo:hi]))
+
+
+def _ascending(rows):
+    return all(rows[i][0] < rows[i + 1][0] for i in range(len(rows) - 1))
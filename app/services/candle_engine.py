@@ -0,0 +1,218 @@
+"""
+In-worker OHLCV candle engine
+Builds 1-minute bars per token from Tick records and
+rolls closed minutes up into the higher timeframes (5m, 15m, 60m by
+default). Only bar updates (throttled) and bar closes leave the engine,
+instead of every raw tick.
+"""
+import math
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from app.config import config
+
+IST = timezone(timedelta(minutes=330))
+IST_OFFSET_MINUTES = 330
+
+# Per-timeframe slot layout inside a token's bar array
+START, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+SLOT_WIDTH = 6
+
+NAN = float("nan")
+
+
+class TokenCandles:
+    """Compact per-token bar state: one flat float array, one slot per timeframe"""
+
+    __slots__ = ("token", "name", "bars", "last_cum_volume", "last_update_emit", "dirty")
+
+    def __init__(self, token, name, timeframe_count):
+        self.token = token
+        self.name = name
+        # Slot 0 is the live 1m bar; slots 1.. accumulate closed minutes per higher timeframe
+        self.bars = array("d", [NAN] * (SLOT_WIDTH * timeframe_count))
+        self.last_cum_volume = None
+        self.last_update_emit = 0.0
+        self.dirty = False
+
+
+class CandleEngine:
+    """Multi-timeframe OHLCV aggregation fed with Tick records"""
+
+    def __init__(self, timeframes=None, update_interval_ms=None, anchor_minutes=None):
+        timeframes = sorted(set(timeframes or config.CANDLE_TIMEFRAMES))
+        if timeframes[0] != 1:
+            timeframes.insert(0, 1)
+        self.timeframes = timeframes
+        self.update_interval = (update_interval_ms if update_interval_ms is not None
+                                else config.CANDLE_UPDATE_INTERVAL_MS) / 1000.0
+        self.anchor = config.CANDLE_SESSION_ANCHOR_MINUTES if anchor_minutes is None else anchor_minutes
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, minute, timeframe):
+        return ((minute - self.anchor) // timeframe) * timeframe + self.anchor
+
+    def on_tick(self, tick):
+        """Apply one Tick; returns the list of bar events to forward"""
+        with self._lock:
+            return self._apply(tick.token, tick.ltp, tick.volume, tick.exchange_timestamp)
+
+    def _apply(self, token, ltp, cum_volume, ts_ms):
+        if not ltp:
+            return []
+
+        state = self._tokens.get(token)
+        if state is None:
+            state = TokenCandles(token, f"Token-{token}", len(self.timeframes))
+            self._tokens[token] = state
+
+        # Volume delta from the cumulative day volume; a drop means a new trading day
+        if state.last_cum_volume is None or cum_volume < state.last_cum_volume:
+            delta = 0
+        else:
+            delta = cum_volume - state.last_cum_volume
+        state.last_cum_volume = cum_volume
+
+        if not ts_ms:
+            ts_ms = time.time() * 1000
+        minute = int(ts_ms // 60000) + IST_OFFSET_MINUTES
+
+        events = []
+        bars = state.bars
+        current_start = bars[START]
+        if math.isnan(current_start):
+            self._roll_higher(state, minute, events)
+            self._open_minute(bars, minute, ltp, delta)
+        elif minute > current_start:
+            events.append(self._event(state, "close", 0))
+            self._fold_minute(state)
+            self._roll_higher(state, minute, events)
+            self._open_minute(bars, minute, ltp, delta)
+        else:
+            # Same minute (or a late tick): extend the live bar
+            if ltp > bars[HIGH]:
+                bars[HIGH] = ltp
+            if ltp < bars[LOW]:
+                bars[LOW] = ltp
+            bars[CLOSE] = ltp
+            bars[VOLUME] += delta
+        state.dirty = True
+
+        now = time.monotonic()
+        if events or now - state.last_update_emit >= self.update_interval:
+            events.extend(self._updates(state))
+            state.last_update_emit = now
+            state.dirty = False
+        return events
+
+    @staticmethod
+    def _open_minute(bars, minute, ltp, volume):
+        bars[START] = minute
+        bars[OPEN] = bars[HIGH] = bars[LOW] = bars[CLOSE] = ltp
+        bars[VOLUME] = volume
+
+    def _fold_minute(self, state):
+        """Roll the live 1m bar into every higher-timeframe accumulator"""
+        bars = state.bars
+        for index in range(1, len(self.timeframes)):
+            base = index * SLOT_WIDTH
+            if math.isnan(bars[base + START]):
+                bars[base + START] = self._bucket(int(bars[START]), self.timeframes[index])
+                bars[base + OPEN] = bars[OPEN]
+                bars[base + HIGH] = bars[HIGH]
+                bars[base + LOW] = bars[LOW]
+                bars[base + VOLUME] = 0.0
+            else:
+                bars[base + HIGH] = max(bars[base + HIGH], bars[HIGH])
+                bars[base + LOW] = min(bars[base + LOW], bars[LOW])
+            bars[base + CLOSE] = bars[CLOSE]
+            bars[base + VOLUME] += bars[VOLUME]
+
+    def _roll_higher(self, state, minute, events):
+        """Close higher-timeframe bars whose bucket ends before this minute"""
+        bars = state.bars
+        for index in range(1, len(self.timeframes)):
+            base = index * SLOT_WIDTH
+            start = bars[base + START]
+            if not math.isnan(start) and self._bucket(minute, self.timeframes[index]) != start:
+                events.append(self._event(state, "close", index))
+                for offset in range(SLOT_WIDTH):
+                    bars[base + offset] = NAN
+
+    def _merged(self, state, index):
+        """(start, open, high, low, close, volume) for a timeframe, including the live minute"""
+        bars = state.bars
+        live = (bars[START], bars[OPEN], bars[HIGH], bars[LOW], bars[CLOSE], bars[VOLUME])
+        if index == 0:
+            return live
+        base = index * SLOT_WIDTH
+        if math.isnan(bars[base + START]):
+            if math.isnan(live[START]):
+                return None
+            return (self._bucket(int(live[START]), self.timeframes[index]),) + live[1:]
+        if math.isnan(live[START]) or self._bucket(int(live[START]), self.timeframes[index]) != bars[base + START]:
+            return tuple(bars[base:base + SLOT_WIDTH])
+        return (bars[base + START], bars[base + OPEN], max(bars[base + HIGH], live[HIGH]),
+                min(bars[base + LOW], live[LOW]), live[CLOSE], bars[base + VOLUME] + live[VOLUME])
+
+    def _event(self, state, kind, index):
+        if kind == "close" and index > 0:
+            bar = tuple(state.bars[index * SLOT_WIDTH:(index + 1) * SLOT_WIDTH])
+        else:
+            bar = self._merged(state, index)
+        if bar is None:
+            return None
+        start_ms = (int(bar[START]) - IST_OFFSET_MINUTES) * 60000
+        return {
+            "type": kind,
+            "token": state.token,
+            "name": state.name,
+            "timeframe": f"{self.timeframes[index]}m",
+            "start": datetime.fromtimestamp(start_ms / 1000, tz=IST).isoformat(),
+            "open": bar[OPEN],
+            "high": bar[HIGH],
+            "low": bar[LOW],
+            "close": bar[CLOSE],
+            "volume": int(bar[VOLUME])
+        }
+
+    def _updates(self, state):
+        events = []
+        for index in range(len(self.timeframes)):
+            event = self._event(state, "update", index)
+            if event:
+                events.append(event)
+        return events
+
+    def flush(self):
+        """Close every open bar, e.g. when the connection stops"""
+        with self._lock:
+            return self._flush()
+
+    def _flush(self):
+        events = []
+        for state in self._tokens.values():
+            if math.isnan(state.bars[START]):
+                continue
+            events.append(self._event(state, "close", 0))
+            self._fold_minute(state)
+            for index in range(1, len(self.timeframes)):
+                events.append(self._event(state, "close", index))
+            for offset in range(len(state.bars)):
+                state.bars[offset] = NAN
+        return events
+
+    def pending_updates(self):
+        """Updates for tokens that changed since their last emitted update"""
+        events = []
+        now = time.monotonic()
+        with self._lock:
+            for state in self._tokens.values():
+                if state.dirty and now - state.last_update_emit >= self.update_interval:
+                    events.extend(self._updates(state))
+                    state.last_update_emit = now
+                    state.dirty = False
+        return events
@@ -0,0 +1,110 @@
+"""
+Per-client tick batching for Socket.IO
+Clients that opt in get one `ticks` event per interval instead of one
+`tick` event per tick. Only the latest tick per token is kept between
+flushes, so a slow browser receives conflated data rather than an
+ever-growing emit backlog. Batches are JSON lists or, optionally, packed
+binary records (ticks that cannot be packed follow as a `ticks_json` list).
+"""
+import struct
+import time
+
+from app.services.tick_record import Tick
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+
+# Binary batch: header (version, count) followed by count fixed-size records
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<BI")
+# token, ltp (rupees), volume, timestamp (epoch ms)
+BINARY_RECORD = struct.Struct("<Idqq")
+
+
+def to_client(tick):
+    """JSON body for a batched or streamed tick (Tick records are serialized here)"""
+    return tick.to_client() if type(tick) is Tick else tick
+
+
+def encode_binary(entries):
+    """Pack [(token, tick, ts_ms)] into bytes; returns (payload, ticks that could not be packed)"""
+    buffer = bytearray(BINARY_HEADER.size + BINARY_RECORD.size * len(entries))
+    offset = BINARY_HEADER.size
+    leftovers = []
+    count = 0
+    for token, tick, ts_ms in entries:
+        try:
+            if type(tick) is Tick:
+                ltp, volume = tick.ltp, tick.volume
+            else:
+                ltp, volume = tick.get("ltp", 0), tick.get("volume", 0)
+            BINARY_RECORD.pack_into(buffer, offset, int(token), float(ltp), int(volume or 0), ts_ms)
+        except (ValueError, TypeError, struct.error):
+            leftovers.append(tick)  # non-numeric token or odd values; sent as JSON instead
+            continue
+        offset += BINARY_RECORD.size
+        count += 1
+    BINARY_HEADER.pack_into(buffer, 0, BINARY_VERSION, count)
+    return bytes(buffer[:offset]), leftovers
+
+
+def decode_binary(payload):
+    """Inverse of encode_binary, for tests and Python clients"""
+    version, count = BINARY_HEADER.unpack_from(payload, 0)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary batch version {version}")
+    return [
+        {"symboltoken": str(token), "ltp": ltp, "volume": volume, "timestamp_ms": ts_ms}
+        for token, ltp, volume, ts_ms in BINARY_RECORD.iter_unpack(
+            payload[BINARY_HEADER.size:BINARY_HEADER.size + count * BINARY_RECORD.size])
+    ]
+
+
+class ClientTickBuffer:
+    """Latest tick per token for one sid, flushed every interval"""
+
+    __slots__ = ("sid", "interval", "encoding", "pending", "next_flush",
+                 "received", "coalesced", "batches_sent")
+
+    def __init__(self, sid, interval_ms, encoding=ENCODING_JSON):
+        self.sid = sid
+        self.interval = interval_ms / 1000.0
+        self.encoding = encoding
+        self.pending = {}  # token -> (tick, receive_ms)
+        self.next_flush = time.monotonic() + self.interval
+        self.received = 0
+        self.coalesced = 0
+        self.batches_sent = 0
+
+    def reconfigure(self, interval_ms, encoding):
+        """New interval/encoding for the ticks still pending and everything after them"""
+        self.interval = interval_ms / 1000.0
+        self.encoding = encoding
+        self.next_flush = min(self.next_flush, time.monotonic() + self.interval)
+
+    def put(self, token, tick):
+        self.received += 1
+        if token in self.pending:
+            self.coalesced += 1
+        self.pending[token] = (tick, int(time.time() * 1000))
+
+    def take(self, now):
+        """Swap out the pending ticks if the interval has elapsed; returns [(token, tick, ts_ms)] or None"""
+        if now < self.next_flush:
+            return None
+        self.next_flush = now + self.interval
+        if not self.pending:
+            return None
+        pending, self.pending = self.pending, {}
+        self.batches_sent += 1
+        return [(token, tick, ts_ms) for token, (tick, ts_ms) in pending.items()]
+
+    def stats(self):
+        return {
+            "interval_ms": int(self.interval * 1000),
+            "encoding": self.encoding,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "batches_sent": self.batches_sent,
+            "pending": len(self.pending)
+        }
@@ -0,0 +1,130 @@
+"""
+Per-token tick conflation
+Sits between on_data and forward_tick_to_backend. The first tick for a
+quiet token passes straight through; further ticks inside the window
+replace each other and only the latest is released when the window
+ends. Ticks whose LTP and volume match the last forwarded tick are
+dropped.
+"""
+import os
+import threading
+import time
+
+from app.config import config
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+
+class TickConflator:
+    """Latest-value-wins conflation per token with duplicate suppression"""
+
+    def __init__(self, sink, window_ms=None, exempt_tokens=None, name="conflator"):
+        self.sink = sink  # callable(Tick)
+        self.window = (window_ms if window_ms is not None else config.CONFLATION_WINDOW_MS) / 1000.0
+        self.exempt_tokens = set(exempt_tokens if exempt_tokens is not None else config.CONFLATION_EXEMPT_TOKENS)
+        self.name = name
+
+        self._pending = {}    # token -> [deadline, tick]
+        self._last_sent = {}  # token -> (ltp, volume, sent_at)
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+        self.received = 0
+        self.forwarded = 0
+        self.coalesced = 0
+        self.duplicates = 0
+
+    @staticmethod
+    def _key(tick):
+        return tick.ltp_paise, tick.volume
+
+    def offer(self, tick):
+        """Accept a tick; it is either forwarded now, held for the window, or dropped"""
+        self.received += 1
+        token = tick.token
+        if token in self.exempt_tokens or self.window <= 0:
+            self._deliver(tick)
+            return
+
+        now = time.monotonic()
+        ltp, volume = self._key(tick)
+        with self._lock:
+            pending = self._pending.get(token)
+            if pending is not None:
+                pending[1] = tick
+                self.coalesced += 1
+                return
+
+            last = self._last_sent.get(token)
+            if last is not None and last[0] == ltp and last[1] == volume:
+                self.duplicates += 1
+                return
+
+            if last is not None and now - last[2] < self.window:
+                # Token is inside its window: hold the latest until the window ends
+                self._pending[token] = [last[2] + self.window, tick]
+                if not self._running:
+                    self._start()
+                return
+
+            self._last_sent[token] = (ltp, volume, now)
+        self._deliver(tick)
+
+    def _deliver(self, tick):
+        self.forwarded += 1
+        try:
+            self.sink(tick)
+        except Exception as e:
+            logger.error(f"Error delivering conflated tick for {self.name}: {e}")
+
+    def _start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+        self._thread.start()
+
+    def _run(self):
+        interval = max(self.window / 4, 0.005)
+        while self._running:
+            time.sleep(interval)
+            self._release(time.monotonic())
+
+    def _release(self, now, force=False):
+        ready = []
+        with self._lock:
+            for token, (deadline, tick) in list(self._pending.items()):
+                if not force and deadline > now:
+                    continue
+                del self._pending[token]
+                ltp, volume = self._key(tick)
+                last = self._last_sent.get(token)
+                if last is not None and last[0] == ltp and last[1] == volume:
+                    self.duplicates += 1
+                    continue
+                self._last_sent[token] = (ltp, volume, now)
+                ready.append(tick)
+        for tick in ready:
+            self._deliver(tick)
+
+    def forget(self, tokens):
+        """Drop state for tokens that are no longer subscribed"""
+        with self._lock:
+            for token in tokens:
+                self._pending.pop(str(token), None)
+                self._last_sent.pop(str(token), None)
+
+    def stats(self):
+        return {
+            "window_ms": int(self.window * 1000),
+            "received": self.received,
+            "forwarded": self.forwarded,
+            "coalesced": self.coalesced,
+            "duplicates_dropped": self.duplicates,
+            "pending": len(self._pending)
+        }
+
+    def stop(self):
+        """Stop the release loop and deliver anything still held"""
+        self._running = False
+        self._release(time.monotonic(), force=True)
@@ -0,0 +1,283 @@
+"""
+Self-healing SmartAPI feed connection
+Wraps SmartWebSocketV2 with automatic reconnect (exponential backoff with
+jitter), replay of the current subscription set on every new socket and
+an optional hot standby: a second pre-authenticated socket that is kept
+open without subscriptions and promoted as soon as the primary drops.
+Every drop is recorded as an incident with time-to-recover and tick gap.
+"""
+import json
+import os
+import random
+import time
+from collections import deque
+
+import eventlet
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+from app.config import config
+from app.logger import get_logger
+from app.services.tick_decoder import LeanSmartWebSocketV2
+from app.services.tick_record import as_tick
+from app.services.token_specs import group_by_mode
+
+logger = get_logger(os.getenv("ENV", "development"))
+tick_analysis_logger = get_logger("tick_analysis")
+
+INCIDENT_HISTORY = 50
+
+
+class FeedIncident:
+    """One primary-connection drop, from disconnect to the first tick afterwards"""
+
+    __slots__ = ("started_at", "reason", "last_tick_at", "attempts", "via",
+                 "recovered_at", "first_tick_at")
+
+    def __init__(self, reason, last_tick_at):
+        self.started_at = time.time()
+        self.reason = reason
+        self.last_tick_at = last_tick_at
+        self.attempts = 0
+        self.via = None
+        self.recovered_at = None
+        self.first_tick_at = None
+
+    @property
+    def time_to_recover_ms(self):
+        if self.recovered_at is None:
+            return None
+        return round((self.recovered_at - self.started_at) * 1000, 1)
+
+    @property
+    def gap_ms(self):
+        # Time without ticks: last tick before the drop to first tick after recovery
+        if self.first_tick_at is None or self.last_tick_at is None:
+            return None
+        return round((self.first_tick_at - self.last_tick_at) * 1000, 1)
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "reason": self.reason,
+            "attempts": self.attempts,
+            "via": self.via,
+            "time_to_recover_ms": self.time_to_recover_ms,
+            "gap_ms": self.gap_ms
+        }
+
+
+class FeedConnection:
+    """Primary (and optional standby) SmartWebSocketV2 that reconnects and resubscribes by itself"""
+
+    def __init__(self, name, auth_provider, specs_provider, on_tick, hot_standby=None, correlation_id=None,
+                 on_state=None):
+        self.name = name
+        self.correlation_id = correlation_id or name
+        self.auth_provider = auth_provider    # callable(refresh=False) -> auth dict or None
+        self.specs_provider = specs_provider  # callable() -> {token: (exchange_type, mode)}
+        self.on_tick = on_tick                # callable(Tick)
+        self.on_state = on_state              # optional callable("connected" | "reconnecting")
+        self.hot_standby = config.HOT_STANDBY_ENABLED if hot_standby is None else hot_standby
+        self.base_delay = config.RECONNECT_BASE_DELAY_MS / 1000.0
+        self.max_delay = config.RECONNECT_MAX_DELAY_SECONDS
+
+        self.primary = None
+        self.standby = None
+        self._open = set()  # sockets whose on_open has fired
+        self._running = False
+        self._attempt = 0
+        self._standby_attempt = 0
+        self._force_login = False
+        self.last_tick_at = None
+        self.incident = None
+        self.incidents = deque(maxlen=INCIDENT_HISTORY)
+        self.reconnects = 0
+        self.failovers = 0
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        """Open the primary (and standby) socket; returns False if the first login fails"""
+        auth = self.auth_provider()
+        if not auth:
+            return False
+        self._running = True
+        self.primary = self._spawn(auth)
+        if self.hot_standby:
+            self.standby = self._spawn(auth)
+        return True
+
+    def close(self):
+        self._running = False
+        for ws in (self.primary, self.standby):
+            if ws is not None:
+                try:
+                    ws.close_connection()
+                except Exception:
+                    pass
+        self.primary = self.standby = None
+        self._open.clear()
+
+    close_connection = close
+
+    @property
+    def connected(self):
+        return self.primary is not None and self.primary in self._open
+
+    # -- subscriptions -------------------------------------------------------
+
+    def subscribe(self, correlation_id, mode, token_list):
+        # Not yet open: the on_open replay picks the tokens up from specs_provider
+        if self.connected:
+            self.primary.subscribe(correlation_id, mode, token_list)
+
+    def unsubscribe(self, correlation_id, mode, token_list):
+        if self.connected:
+            self.primary.unsubscribe(correlation_id, mode, token_list)
+
+    def _replay(self, ws):
+        for mode, token_list in group_by_mode(self.specs_provider()).items():
+            ws.subscribe(self.correlation_id, mode, token_list)
+
+    # -- sockets -------------------------------------------------------------
+
+    def _spawn(self, auth):
+        # max_retry_attempt=0: the library's blocking in-callback retry is replaced by ours
+        socket_class = LeanSmartWebSocketV2 if config.LEAN_DECODER_ENABLED else SmartWebSocketV2
+        ws = socket_class(auth["jwt_token"], auth["api_key"], auth["client_code"],
+                          auth["feed_token"], max_retry_attempt=0)
+        # The library keeps the resubscribe table on the class; keep it per socket
+        ws.input_request_dict = {}
+        ws.on_open = lambda wsapp: self._on_open(ws)
+        ws.on_data = lambda wsapp, message: self._on_data(ws, message)
+        ws.on_error = lambda *args: logger.error(f"WebSocket error on {self.name}: {args[-1] if args else ''}")
+        ws.on_close = lambda wsapp: None  # handled when run_forever returns
+        eventlet.spawn_n(self._run, ws)
+        return ws
+
+    def _run(self, ws):
+        try:
+            ws.connect()
+        except Exception as e:
+            logger.error(f"WebSocket {self.name} connect failed: {e}")
+        self._on_closed(ws)
+
+    def _on_open(self, ws):
+        self._open.add(ws)
+        if ws is self.primary:
+            logger.info(f"WebSocket connected for {self.name}")
+            self._attempt = 0
+            self._replay(ws)
+            self._recovered("reconnect")
+            self._state("connected")
+        elif ws is self.standby:
+            self._standby_attempt = 0
+            logger.info(f"🛟 Hot standby ready for {self.name}")
+
+    def _on_data(self, ws, message):
+        if ws is not self.primary:
+            return
+        now = time.time()
+        incident = self.incident
+        if incident is not None and incident.recovered_at is not None:
+            incident.first_tick_at = now
+            self._finish_incident()
+        self.last_tick_at = now
+        self.on_tick(as_tick(message))
+
+    def _on_closed(self, ws):
+        was_open = ws in self._open
+        self._open.discard(ws)
+        if not self._running:
+            return
+        if ws is self.standby:
+            self.standby = None
+            self._standby_attempt += 1
+            eventlet.spawn_after(self._backoff(self._standby_attempt), self._respawn_standby)
+            return
+        if ws is not self.primary:
+            return
+
+        if self.incident is not None and self.incident.recovered_at is not None:
+            self._finish_incident()  # recovered earlier but no tick arrived before this drop
+        if self.incident is None:
+            self.incident = FeedIncident("closed" if was_open else "connect_failed", self.last_tick_at)
+            logger.warning(f"⚠️ WebSocket {self.name} dropped, recovering")
+        # Never opened: the cached session may be stale, so log in afresh next time
+        self._force_login = not was_open
+
+        standby = self.standby
+        if standby is not None and standby in self._open:
+            # Failover: the standby is already authenticated and connected
+            self.primary, self.standby = standby, None
+            self.failovers += 1
+            self._replay(standby)
+            self._recovered("standby")
+            self._state("connected")
+            eventlet.spawn_n(self._respawn_standby)
+            return
+
+        self.primary = None
+        self._state("reconnecting")
+        delay = self._backoff(self._attempt)
+        self._attempt += 1
+        eventlet.spawn_after(delay, self._reconnect)
+
+    def _state(self, state):
+        if self.on_state:
+            try:
+                self.on_state(state)
+            except Exception as e:
+                logger.error(f"Error in feed state callback for {self.name}: {e}")
+
+    def _backoff(self, attempt):
+        # Full-jitter exponential backoff; the first retry is almost immediate
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _reconnect(self):
+        if not self._running:
+            return
+        if self.incident is not None:
+            self.incident.attempts += 1
+        auth = self.auth_provider(refresh=self._force_login)
+        if not auth:
+            delay = self._backoff(self._attempt)
+            self._attempt += 1
+            eventlet.spawn_after(delay, self._reconnect)
+            return
+        self.reconnects += 1
+        self.primary = self._spawn(auth)
+
+    def _respawn_standby(self):
+        if not self._running or not self.hot_standby or self.standby is not None:
+            return
+        auth = self.auth_provider()
+        if auth:
+            self.standby = self._spawn(auth)
+
+    # -- incidents -----------------------------------------------------------
+
+    def _recovered(self, via):
+        incident = self.incident
+        if incident is None or incident.recovered_at is not None:
+            return
+        incident.recovered_at = time.time()
+        incident.via = via
+        logger.info(f"✅ WebSocket {self.name} recovered via {via} in {incident.time_to_recover_ms}ms")
+
+    def _finish_incident(self):
+        incident, self.incident = self.incident, None
+        self.incidents.append(incident)
+        record = incident.to_dict()
+        logger.info(f"📉 Feed gap for {self.name}: {record['gap_ms']}ms (recovered in {record['time_to_recover_ms']}ms)")
+        tick_analysis_logger.info(f"FEED_INCIDENT: {json.dumps(dict(record, connection=self.name))}")
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "standby_ready": self.standby is not None and self.standby in self._open,
+            "reconnects": self.reconnects,
+            "failovers": self.failovers,
+            "recovering": self.incident is not None and self.incident.recovered_at is None,
+            "incidents": [incident.to_dict() for incident in self.incidents]
+        }
@@ -0,0 +1,296 @@
+"""
+Vectorized market simulator
+Advances every simulated token in one NumPy step: per-token Poisson tick
+counts from the configured tick rate, a log-normal random walk per tick
+and cumulative volume, all scaled by a burst profile (flat, market_open
+spike, random bursts). One scheduler loop runs the steps and hands the
+resulting Tick records to sinks: the Socket.IO fan-out and/or a manager's
+handle_tick (the backend forwarding path). No SmartAPI connection is used.
+"""
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.config import config
+from app.logger import get_logger
+from app.services.tick_record import Tick
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+PROFILES = ("flat", "market_open", "bursts")
+QUOTE_MODE = 2
+TICK_SIZE_PAISE = 5
+
+
+class BurstProfile:
+    """Rate/volatility multiplier over time for one of PROFILES"""
+
+    def __init__(self, name=None, rng=None):
+        self.name = name or config.SIM_PROFILE
+        if self.name not in PROFILES:
+            raise ValueError(f"Unknown simulator profile {self.name!r}, expected one of {PROFILES}")
+        self.rng = rng or np.random.default_rng()
+        self._burst_until = 0.0
+
+    def multiplier(self, elapsed, dt):
+        if self.name == "market_open":
+            # Opening spike decaying back to the base rate
+            return 1.0 + (config.SIM_BURST_MULTIPLIER - 1.0) * math.exp(-elapsed / config.SIM_OPEN_DECAY_SECONDS)
+        if self.name == "bursts":
+            if elapsed >= self._burst_until and self.rng.random() < config.SIM_BURST_PROBABILITY * dt:
+                self._burst_until = elapsed + config.SIM_BURST_SECONDS
+            return config.SIM_BURST_MULTIPLIER if elapsed < self._burst_until else 1.0
+        return 1.0
+
+
+class MarketSimulator:
+    """Random-walk ticks for many tokens, stepped together"""
+
+    def __init__(self, tick_rate=None, volatility_bps=None, profile=None, step_ms=None,
+                 exchange_type=1, seed=None, sinks=None):
+        self.tick_rate = config.SIM_TICK_RATE if tick_rate is None else float(tick_rate)  # mean ticks/s per token
+        self.volatility_bps = config.SIM_VOLATILITY_BPS if volatility_bps is None else float(volatility_bps)  # per tick
+        self.step_ms = step_ms or config.SIM_STEP_MS
+        self.exchange_type = exchange_type
+        self.rng = np.random.default_rng(seed)
+        self.profile = BurstProfile(profile, self.rng)
+        self.sinks = list(sinks or [])
+
+        self.tokens = []
+        self._index = {}
+        self.prices = np.empty(0)                     # paise, float
+        self.volumes = np.empty(0, dtype=np.int64)    # cumulative
+        self.rate_weights = np.empty(0)               # per-token share of tick_rate (mean 1)
+        self._lock = threading.Lock()
+
+        self._running = False
+        self._thread = None
+        self.started_at = None
+        self.steps = 0
+        self.ticks = 0
+        self.late_steps = 0
+        self.max_step_ms = 0.0
+        self.last_multiplier = 1.0
+
+    def add_tokens(self, tokens, prices=None):
+        """Add tokens at prices (rupees; default 100-2000); existing tokens are left as they are"""
+        new = [str(t) for t in tokens if str(t) not in self._index]
+        if not new:
+            return 0
+        if prices is None:
+            start = self.rng.uniform(100.0, 2000.0, len(new)) * 100
+        else:
+            start = np.broadcast_to(np.asarray(prices, dtype=float) * 100, (len(new),)).copy()
+        # Heavy-tailed activity: a few tokens tick far more than the rest
+        weights = self.rng.lognormal(0.0, 0.75, len(new))
+        weights /= weights.mean()
+        with self._lock:
+            for token in new:
+                self._index[token] = len(self.tokens)
+                self.tokens.append(token)
+            self.prices = np.concatenate([self.prices, start])
+            self.volumes = np.concatenate([self.volumes, np.zeros(len(new), dtype=np.int64)])
+            self.rate_weights = np.concatenate([self.rate_weights, weights])
+        return len(new)
+
+    def remove_tokens(self, tokens):
+        with self._lock:
+            drop = {self._index[str(t)] for t in tokens if str(t) in self._index}
+            if not drop:
+                return 0
+            keep = np.array([i for i in range(len(self.tokens)) if i not in drop], dtype=np.int64)
+            self.tokens = [self.tokens[i] for i in keep.tolist()]
+            self._index = {token: i for i, token in enumerate(self.tokens)}
+            self.prices = self.prices[keep]
+            self.volumes = self.volumes[keep]
+            self.rate_weights = self.rate_weights[keep]
+        return len(drop)
+
+    def step(self, dt, elapsed=0.0, now=None):
+        """Advance all tokens by dt seconds; returns the Ticks produced, grouped by token"""
+        now = now or time.time()
+        multiplier = self.profile.multiplier(elapsed, dt)
+        self.last_multiplier = multiplier
+        with self._lock:
+            n = len(self.tokens)
+            if n == 0:
+                return []
+            counts = self.rng.poisson(self.tick_rate * multiplier * dt * self.rate_weights)
+            active = np.flatnonzero(counts)
+            if active.size == 0:
+                return []
+            counts = counts[active]
+            total = int(counts.sum())
+            owner = np.repeat(active, counts)
+
+            # Per-tick log returns, accumulated within each token's run of ticks
+            sigma = self.volatility_bps / 1e4 * math.sqrt(multiplier)
+            steps = np.cumsum(self.rng.standard_normal(total) * sigma)
+            sizes = np.cumsum(self.rng.geometric(1.0 / config.SIM_TRADE_SIZE, total))
+            ends = np.cumsum(counts)
+            firsts = ends - counts
+            step_base = np.repeat(np.concatenate(([0.0], steps))[firsts], counts)
+            size_base = np.repeat(np.concatenate(([0], sizes))[firsts], counts)
+            prices = self.prices[owner] * np.exp(steps - step_base)
+            volumes = self.volumes[owner] + (sizes - size_base)
+
+            last = ends - 1
+            self.prices[active] = prices[last]
+            self.volumes[active] = volumes[last]
+
+            ltps = np.maximum(TICK_SIZE_PAISE, np.rint(prices / TICK_SIZE_PAISE) * TICK_SIZE_PAISE).astype(np.int64)
+            tokens = self.tokens
+
+        exchange_ts = int(now * 1000)
+        exchange_type = self.exchange_type
+        ticks = [Tick(tokens[i], ltp, volume, exchange_ts, QUOTE_MODE, exchange_type, now)
+                 for i, ltp, volume in zip(owner.tolist(), ltps.tolist(), volumes.tolist())]
+        self.ticks += len(ticks)
+        return ticks
+
+    def _deliver(self, ticks):
+        for sink in self.sinks:
+            for tick in ticks:
+                try:
+                    sink(tick)
+                except Exception as e:
+                    logger.error(f"❌ Simulator sink failed for token {tick.token}: {e}")
+                    break
+
+    def run(self, duration=None):
+        """Scheduler loop: one step every step_ms until stop() (or duration seconds)"""
+        interval = self.step_ms / 1000.0
+        self._running = True
+        self.started_at = time.time()
+        start = time.perf_counter()
+        previous = start
+        deadline = start
+        logger.info(f"🎲 Simulator started | Tokens: {len(self.tokens)} | Rate: {self.tick_rate}/s per token | "
+                    f"Volatility: {self.volatility_bps}bps | Profile: {self.profile.name} | Step: {self.step_ms}ms")
+        while self._running:
+            now = time.perf_counter()
+            elapsed = now - start
+            if duration is not None and elapsed >= duration:
+                break
+            # Catch up on at most one second after a stall instead of flooding the sinks
+            dt = min(now - previous, 1.0)
+            previous = now
+            if dt > 0:
+                self._deliver(self.step(dt, elapsed))
+            self.steps += 1
+            step_ms = (time.perf_counter() - now) * 1000
+            self.max_step_ms = max(self.max_step_ms, step_ms)
+
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late_steps += 1
+                deadline = time.perf_counter()
+                time.sleep(0)  # let other (green) threads run
+        self._running = False
+        logger.info(f"🛑 Simulator stopped | {self.stats()}")
+
+    def start(self, duration=None):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self.run, args=(duration,), name="market-simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(1.0, self.step_ms / 1000.0 * 2))
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def stats(self):
+        uptime = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "running": self._running,
+            "tokens": len(self.tokens),
+            "tick_rate": self.tick_rate,
+            "volatility_bps": self.volatility_bps,
+            "profile": self.profile.name,
+            "step_ms": self.step_ms,
+            "multiplier": round(self.last_multiplier, 3),
+            "steps": self.steps,
+            "ticks": self.ticks,
+            "ticks_per_second": round(self.ticks / uptime, 1) if uptime else 0.0,
+            "late_steps": self.late_steps,
+            "max_step_ms": round(self.max_step_ms, 3)
+        }
+
+
+def socketio_sink():
+    """Ticks -> the eventlet runtime's Socket.IO token rooms (and batched clients)"""
+    from socket_server import emit_tick_to_clients
+    return emit_tick_to_clients
+
+
+def forward_sink(websocket_id="simulator"):
+    """Ticks -> a login-free manager's handle_tick (tick store, metrics, conflation, forwarder); returns (sink, manager)"""
+    from app.services.websocket_manager import SmartApiWebSocketManager
+    manager = SmartApiWebSocketManager(websocket_id, credentials={}, tokens=[])
+    return manager.handle_tick, manager
+
+
+_simulator = None
+_manager = None
+_simulator_lock = threading.Lock()
+
+
+def get_market_simulator():
+    """Process-wide simulator (None until start_market_simulator)"""
+    return _simulator
+
+
+def start_market_simulator(tokens, sinks=("socketio",), client_sink=None, **options):
+    """(Re)start the process-wide simulator on tokens (list or count); sinks: "socketio", "forward"
+
+    client_sink replaces socketio_sink() for the "socketio" sink (the asyncio
+    runtime passes its loop-safe emitter).
+    """
+    global _simulator, _manager
+    with _simulator_lock:
+        stop_market_simulator()
+        for name in sinks:
+            if name not in ("socketio", "forward"):
+                raise ValueError(f"Unknown simulator sink {name!r}, expected 'socketio' or 'forward'")
+        duration = options.pop("duration", None)
+        prices = options.pop("prices", None)
+        simulator = MarketSimulator(**options)
+        for name in sinks:
+            if name == "socketio":
+                simulator.sinks.append(client_sink or socketio_sink())
+            else:
+                sink, _manager = forward_sink()
+                simulator.sinks.append(sink)
+        if isinstance(tokens, int):
+            tokens = [str(config.SIM_FIRST_TOKEN + i) for i in range(tokens)]
+        simulator.add_tokens(tokens, prices)
+        simulator.start(duration)
+        _simulator = simulator
+        return simulator
+
+
+def stop_market_simulator():
+    """Stop the process-wide simulator and drain its forwarding manager; returns its final stats"""
+    global _simulator, _manager
+    stats = None
+    if _simulator is not None:
+        _simulator.stop()
+        stats = _simulator.stats()
+        _simulator = None
+    if _manager is not None:
+        _manager.stop()
+        _manager = None
+    return stats
@@ -0,0 +1,259 @@
+"""
+Metrics registry
+Per-connection (websocket_uuid) and per-token counters plus fixed-memory
+latency histograms, rendered in Prometheus text format for /api/metrics.
+Recording is a handful of attribute increments and one bisect, cheap
+enough to run on every tick.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from app.services.tick_record import Tick
+
+# Bucket upper bounds in milliseconds
+FORWARD_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+EXCHANGE_DELAY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram; memory does not grow with observations"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = array("q", [0] * (len(bounds) + 1))  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None when empty)"""
+        if not self.count:
+            return None
+        target = self.count * q
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 3) if self.count else None,
+            "p50_le": self.quantile(0.5),
+            "p99_le": self.quantile(0.99)
+        }
+
+
+class TokenMetrics:
+    __slots__ = ("ticks_in", "forwards_ok", "forwards_failed")
+
+    def __init__(self):
+        self.ticks_in = 0
+        self.forwards_ok = 0
+        self.forwards_failed = 0
+
+
+class ConnectionMetrics:
+    """Counters and histograms for one websocket_uuid"""
+
+    def __init__(self, websocket_id):
+        self.websocket_id = websocket_id
+        self.start_time = time.time()
+        self.ticks_in = 0
+        self.forwards_ok = 0
+        self.forwards_failed = 0
+        self.forward_batches = 0
+        self.bytes_forwarded = 0
+        self.total_volume = 0
+        self.price_min = float("inf")
+        self.price_max = 0.0
+        self.tokens = {}
+        self.forward_latency = LatencyHistogram(FORWARD_LATENCY_BUCKETS_MS)
+        self.exchange_delay = LatencyHistogram(EXCHANGE_DELAY_BUCKETS_MS)
+        self.gauges = {}    # name -> callable() for values owned elsewhere (queue depth, ...)
+        self.counters = {}  # name -> callable() for monotonic totals owned elsewhere; exported as <name>_total
+
+    def record_tick(self, token, ltp_rupees, volume, exchange_timestamp):
+        self.ticks_in += 1
+        token_metrics = self.tokens.get(token)
+        if token_metrics is None:
+            token_metrics = self.tokens[token] = TokenMetrics()
+        token_metrics.ticks_in += 1
+        self.total_volume += volume
+        if ltp_rupees > 0:
+            if ltp_rupees < self.price_min:
+                self.price_min = ltp_rupees
+            if ltp_rupees > self.price_max:
+                self.price_max = ltp_rupees
+        if exchange_timestamp:
+            self.exchange_delay.observe(time.time() * 1000 - exchange_timestamp)
+
+    def record_forward(self, ok, batch, response_time_ms=None, nbytes=0):
+        count = len(batch)
+        self.forward_batches += 1
+        if ok:
+            self.forwards_ok += count
+            self.bytes_forwarded += nbytes
+        else:
+            self.forwards_failed += count
+        if response_time_ms is not None:
+            self.forward_latency.observe(response_time_ms)
+        tokens = self.tokens
+        for payload in batch:
+            # Raw ticks are queued as Tick records, candle events as dicts
+            token = payload.token if type(payload) is Tick else payload.get("token")
+            token_metrics = tokens.get(token)
+            if token_metrics is None:
+                continue
+            if ok:
+                token_metrics.forwards_ok += 1
+            else:
+                token_metrics.forwards_failed += 1
+
+    def forget_tokens(self, tokens):
+        for token in tokens:
+            self.tokens.pop(str(token), None)
+
+    def summary(self):
+        duration = time.time() - self.start_time
+        return {
+            'session_id': self.websocket_id,
+            'duration_seconds': duration,
+            'total_ticks': self.ticks_in,
+            'unique_tokens': len(self.tokens),
+            'total_volume': self.total_volume,
+            'successful_forwards': self.forwards_ok,
+            'failed_forwards': self.forwards_failed,
+            'success_rate': round((self.forwards_ok / max(1, self.ticks_in)) * 100, 2),
+            'ticks_per_second': round(self.ticks_in / max(1, duration), 2),
+            'price_range': {'min': self.price_min, 'max': self.price_max} if self.price_min != float('inf') else None
+        }
+
+    def snapshot(self):
+        return {
+            "ticks_in": self.ticks_in,
+            "forwards_ok": self.forwards_ok,
+            "forwards_failed": self.forwards_failed,
+            "bytes_forwarded": self.bytes_forwarded,
+            "tokens": len(self.tokens),
+            "forward_latency_ms": self.forward_latency.snapshot(),
+            "exchange_delay_ms": self.exchange_delay.snapshot()
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+class MetricsRegistry:
+    """Process-wide registry of ConnectionMetrics keyed by websocket_uuid"""
+
+    def __init__(self):
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def connection(self, websocket_id):
+        metrics = self._connections.get(websocket_id)
+        if metrics is None:
+            with self._lock:
+                metrics = self._connections.get(websocket_id)
+                if metrics is None:
+                    metrics = self._connections[websocket_id] = ConnectionMetrics(websocket_id)
+        return metrics
+
+    def remove(self, websocket_id):
+        with self._lock:
+            self._connections.pop(websocket_id, None)
+
+    def connections(self):
+        return list(self._connections.values())
+
+    def render_prometheus(self):
+        """All metrics in Prometheus text exposition format (0.0.4)"""
+        connections = self.connections()
+        lines = []
+
+        counters = (
+            ("tradex_ticks_in_total", "Ticks received from SmartAPI", lambda m: m.ticks_in),
+            ("tradex_forward_bytes_total", "Payload bytes forwarded to the backend", lambda m: m.bytes_forwarded),
+            ("tradex_forward_batches_total", "Forward requests sent to the backend", lambda m: m.forward_batches),
+        )
+        for name, help_text, getter in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for m in connections:
+                lines.append(f'{name}{{websocket="{_escape(m.websocket_id)}"}} {getter(m)}')
+
+        lines.append("# HELP tradex_forwards_total Ticks forwarded to the backend by outcome")
+        lines.append("# TYPE tradex_forwards_total counter")
+        for m in connections:
+            ws = _escape(m.websocket_id)
+            lines.append(f'tradex_forwards_total{{websocket="{ws}",result="ok"}} {m.forwards_ok}')
+            lines.append(f'tradex_forwards_total{{websocket="{ws}",result="failed"}} {m.forwards_failed}')
+
+        lines.append("# HELP tradex_token_ticks_in_total Ticks received per token")
+        lines.append("# TYPE tradex_token_ticks_in_total counter")
+        for m in connections:
+            ws = _escape(m.websocket_id)
+            for token, t in list(m.tokens.items()):
+                lines.append(f'tradex_token_ticks_in_total{{websocket="{ws}",token="{_escape(token)}"}} {t.ticks_in}')
+
+        lines.append("# HELP tradex_token_forwards_total Ticks forwarded per token by outcome")
+        lines.append("# TYPE tradex_token_forwards_total counter")
+        for m in connections:
+            ws = _escape(m.websocket_id)
+            for token, t in list(m.tokens.items()):
+                labels = f'websocket="{ws}",token="{_escape(token)}"'
+                lines.append(f'tradex_token_forwards_total{{{labels},result="ok"}} {t.forwards_ok}')
+                lines.append(f'tradex_token_forwards_total{{{labels},result="failed"}} {t.forwards_failed}')
+
+        counter_names = sorted({name for m in connections for name in m.counters})
+        for name in counter_names:
+            lines.append(f"# TYPE tradex_{name}_total counter")
+            for m in connections:
+                getter = m.counters.get(name)
+                if getter is not None:
+                    lines.append(f'tradex_{name}_total{{websocket="{_escape(m.websocket_id)}"}} {getter()}')
+
+        gauge_names = sorted({name for m in connections for name in m.gauges})
+        for name in gauge_names:
+            lines.append(f"# TYPE tradex_{name} gauge")
+            for m in connections:
+                getter = m.gauges.get(name)
+                if getter is not None:
+                    lines.append(f'tradex_{name}{{websocket="{_escape(m.websocket_id)}"}} {getter()}')
+
+        for name, help_text, attr in (
+            ("tradex_forward_latency_ms", "Backend forward round-trip time", "forward_latency"),
+            ("tradex_exchange_delay_ms", "Exchange timestamp to worker receive delay", "exchange_delay"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for m in connections:
+                _render_histogram(lines, name, f'websocket="{_escape(m.websocket_id)}"', getattr(m, attr))
+
+        return "\n".join(lines) + "\n"
+
+
+# Global registry shared by all managers and the /api/metrics route
+metrics_registry = MetricsRegistry()
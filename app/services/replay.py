@@ -0,0 +1,180 @@
+"""
+Tick replay engine
+Feeds recorded ticks (tick_analysis TICK_DATA lines or the binary tick
+journal) through SmartApiWebSocketManager.handle_tick - the same path
+on_data uses - with the original inter-arrival timing scaled by a speed
+factor. No SmartAPI login is involved; forwarding goes to whatever
+backend the config points at (e.g. mock_backend.py).
+"""
+import json
+import os
+import random
+import time
+from array import array
+from datetime import datetime
+
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+LATENCY_SAMPLE_SIZE = 1_000_000
+
+
+def load_log_ticks(paths):
+    """Yield (receive_ns, session_id, tick) from TICK_DATA log lines
+
+    Each file is read only up to its size when replay reaches it, so lines a
+    running worker appends meanwhile (e.g. to today's log) are not replayed.
+    """
+    for path in paths:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            consumed = 0
+            for raw in f:
+                consumed += len(raw)
+                if consumed > size:
+                    break
+                line = raw.decode("utf-8", errors="replace")
+                marker = line.find("TICK_DATA: ")
+                if marker < 0:
+                    continue
+                try:
+                    entry = json.loads(line[marker + len("TICK_DATA: "):])
+                except ValueError:
+                    continue
+                tick = entry.get("raw_tick") or {
+                    "token": entry.get("token"),
+                    "last_traded_price": entry.get("ltp_paise", 0),
+                    "volume_trade_for_the_day": entry.get("volume", 0),
+                    "exchange_timestamp": entry.get("exchange_timestamp", 0),
+                    "subscription_mode_val": entry.get("subscription_mode", "UNKNOWN")
+                }
+                receive_ns = int(datetime.fromisoformat(entry["timestamp"]).timestamp() * 1e9)
+                yield receive_ns, entry.get("session_id", "replay"), tick
+
+
+def load_journal_ticks(journal_dir=None, start_ns=None, end_ns=None):
+    """Yield (receive_ns, websocket_id, tick) from the binary tick journal"""
+    from app.services.tick_journal import RECORD, TickJournalReader
+
+    reader = TickJournalReader(journal_dir)
+    for day, view in reader.iter_views(start_ns, end_ns):
+        websocket_ids = reader.websocket_ids(day)
+        for token, ltp_paise, volume, exchange_ts, receive_ns, ws_index, _ in RECORD.iter_unpack(view):
+            websocket_id = websocket_ids[ws_index] if ws_index < len(websocket_ids) else f"ws-{ws_index}"
+            yield receive_ns, websocket_id, {
+                "token": str(token),
+                "last_traded_price": ltp_paise,
+                "volume_trade_for_the_day": volume,
+                "exchange_timestamp": exchange_ts,
+                "subscription_mode_val": "REPLAY"
+            }
+        view.release()
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q / 100.0))], 1)
+
+
+class TickReplayer:
+    """Drive the real per-tick pipeline from recorded ticks at N x speed"""
+
+    def __init__(self, source, speed=1.0, manager_factory=None, limit=None):
+        self.source = source  # iterable of (receive_ns, websocket_id, tick)
+        self.speed = speed    # float multiplier; None or 0 means as fast as possible
+        self.limit = limit
+        self.manager_factory = manager_factory or self._default_manager
+        self.managers = {}
+
+        self.ticks = 0
+        self.max_lag_ms = 0.0
+        self._latencies_us = array("d")
+
+    @staticmethod
+    def _default_manager(websocket_id):
+        from app.services.websocket_manager import SmartApiWebSocketManager
+        from app.services.tick_store import TickStore
+        manager = SmartApiWebSocketManager(f"replay-{websocket_id}", credentials={}, tokens=[])
+        # Replayed ticks must not land in the recordings being replayed (tick_analysis log,
+        # journal) or in the live process tick store; a private store keeps its cost measured
+        manager.log_tick_data = False
+        manager.journal = None
+        if manager.tick_store is not None:
+            manager.tick_store = TickStore()
+        return manager
+
+    def _manager_for(self, websocket_id):
+        manager = self.managers.get(websocket_id)
+        if manager is None:
+            manager = self.manager_factory(websocket_id)
+            self.managers[websocket_id] = manager
+        return manager
+
+    def _record_latency(self, micros):
+        # Reservoir sample keeps memory bounded on very long replays
+        if len(self._latencies_us) < LATENCY_SAMPLE_SIZE:
+            self._latencies_us.append(micros)
+        else:
+            slot = random.randrange(self.ticks)
+            if slot < LATENCY_SAMPLE_SIZE:
+                self._latencies_us[slot] = micros
+
+    def run(self):
+        """Replay the whole source; returns the report dict"""
+        first_ns = None
+        wall_start = time.perf_counter()
+        paced = bool(self.speed)
+
+        for receive_ns, websocket_id, tick in self.source:
+            if self.limit and self.ticks >= self.limit:
+                break
+            if first_ns is None:
+                first_ns = receive_ns
+                wall_start = time.perf_counter()
+
+            if paced:
+                due = wall_start + (receive_ns - first_ns) / 1e9 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag_ms = max(self.max_lag_ms, -delay * 1000)
+
+            manager = self._manager_for(websocket_id)
+            started = time.perf_counter()
+            manager.handle_tick(tick)
+            self.ticks += 1
+            self._record_latency((time.perf_counter() - started) * 1e6)
+
+        feed_seconds = time.perf_counter() - wall_start
+        for manager in self.managers.values():
+            manager.stop()
+        total_seconds = time.perf_counter() - wall_start
+        return self.report(feed_seconds, total_seconds)
+
+    def report(self, feed_seconds, total_seconds):
+        latencies = list(self._latencies_us)
+        forwarders = [m.forwarder for m in self.managers.values()]
+        return {
+            "ticks": self.ticks,
+            "speed": self.speed or "max",
+            "websockets": len(self.managers),
+            "feed_seconds": round(feed_seconds, 3),
+            "drain_seconds": round(total_seconds - feed_seconds, 3),
+            "ticks_per_second": round(self.ticks / max(feed_seconds, 1e-9), 1),
+            "max_schedule_lag_ms": round(self.max_lag_ms, 3),
+            "handle_tick_us": {
+                "p50": _percentile(latencies, 50),
+                "p99": _percentile(latencies, 99),
+                "max": round(max(latencies), 1) if latencies else None
+            },
+            "forwarder": {
+                "batches_sent": sum(f.batches_sent for f in forwarders),
+                "dropped": sum(f.dropped for f in forwarders),
+                "successful_forwards": sum(m.metrics.forwards_ok for m in self.managers.values()),
+                "failed_forwards": sum(m.metrics.forwards_failed for m in self.managers.values())
+            }
+        }
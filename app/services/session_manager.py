@@ -1,11 +1,18 @@
+import hashlib
 import os
+import threading
+import time
 import pyotp
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from SmartApi import SmartConnect
+from app.config import config
+from app.logger import get_logger
 
 load_dotenv()
 
+logger = get_logger(os.getenv("ENV", "development"))
+
 class AngelOneSessionManager:
     _session_data = None
     _session_created_at = None
@@ -58,7 +65,7 @@ class AngelOneSessionManager:
         
         # Check if session is older than 20 hours (JWT expires in 24h, be safe)
         session_age = datetime.now() - cls._session_created_at
-        if session_age > timedelta(hours=20):
+        if session_age > timedelta(hours=config.SESSION_MAX_AGE_HOURS):
             return False
         
         return True
@@ -76,3 +83,159 @@ class AngelOneSessionManager:
         except Exception as e:
             cls.reset_session()
             return cls.get_session()
+
+
+def credentials_digest(credentials):
+    """Fingerprint of the secrets a pooled session was created with"""
+    secret = "\0".join(str(credentials.get(field) or "") for field in ("api_key", "password", "totp_secret"))
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class _PooledSession:
+    __slots__ = ("credentials", "digest", "smart_api", "auth", "refresh_token", "created_at", "lock")
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.digest = credentials_digest(credentials)
+        self.smart_api = None
+        self.auth = None
+        self.refresh_token = None
+        self.created_at = None
+        self.lock = threading.Lock()
+
+
+class SessionPool:
+    """SmartAPI sessions keyed by client_code, shared by every manager and refreshed before expiry"""
+
+    def __init__(self, max_age_hours=None, refresh_after_hours=None, check_interval=None):
+        self.max_age = timedelta(hours=max_age_hours or config.SESSION_MAX_AGE_HOURS)
+        self.refresh_after = timedelta(hours=refresh_after_hours or config.SESSION_REFRESH_AFTER_HOURS)
+        self.check_interval = check_interval or config.SESSION_REFRESH_CHECK_SECONDS
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.logins = 0
+        self.refreshes = 0
+        self.hits = 0
+
+    def get(self, credentials):
+        """Auth dict (jwt_token, feed_token, api_key, client_code) for credentials, logging in only when needed
+
+        A cached session is only reused for the exact credentials it was
+        created with; other credentials for the same client_code must log in
+        themselves and replace the entry only if that login succeeds.
+        """
+        client_code = credentials["client_code"]
+        with self._lock:
+            entry = self._sessions.get(client_code)
+            if entry is None:
+                entry = self._sessions[client_code] = _PooledSession(credentials)
+        if entry.digest == credentials_digest(credentials):
+            # Per-client lock: concurrent connects for one client_code share a single login
+            with entry.lock:
+                if self._is_valid(entry):
+                    self.hits += 1
+                    return entry.auth
+                self._login(entry)
+        else:
+            logger.warning(f"⚠️ Credentials for {client_code} differ from the pooled session, logging in separately")
+            entry = _PooledSession(credentials)
+            with entry.lock:
+                self._login(entry)  # raises on bad credentials; the pooled entry is left untouched
+            with self._lock:
+                self._sessions[client_code] = entry
+        self._ensure_refresher()
+        return entry.auth
+
+    def peek(self, credentials):
+        """Cached auth for these exact credentials if still valid, without logging in"""
+        entry = self._sessions.get(credentials.get("client_code"))
+        if entry is not None and entry.digest == credentials_digest(credentials) and self._is_valid(entry):
+            return entry.auth
+        return None
+
+    def invalidate(self, client_code):
+        with self._lock:
+            self._sessions.pop(client_code, None)
+
+    def _is_valid(self, entry):
+        return entry.auth is not None and datetime.now() - entry.created_at < self.max_age
+
+    def _login(self, entry):
+        credentials = entry.credentials
+        smart_api = SmartConnect(credentials["api_key"])
+        totp = pyotp.TOTP(credentials["totp_secret"]).now()
+        session = smart_api.generateSession(credentials["client_code"], credentials["password"], totp)
+        if not session["status"]:
+            entry.auth = None
+            raise Exception(f"Login failed for client {credentials['client_code']}")
+        self.logins += 1
+        entry.smart_api = smart_api
+        entry.refresh_token = session["data"]["refreshToken"]
+        entry.auth = {
+            "jwt_token": session["data"]["jwtToken"],
+            "feed_token": smart_api.getfeedToken(),
+            "api_key": credentials["api_key"],
+            "client_code": credentials["client_code"]
+        }
+        entry.created_at = datetime.now()
+        logger.info(f"🔑 New SmartAPI session for {credentials['client_code']}")
+
+    def _refresh(self, entry):
+        # Prefer the refresh-token exchange; fall back to a full TOTP login
+        with entry.lock:
+            try:
+                response = entry.smart_api.generateToken(entry.refresh_token)
+                jwt_token = response["data"]["jwtToken"]
+                if not jwt_token.startswith("Bearer "):
+                    jwt_token = "Bearer " + jwt_token  # same form generateSession returns
+                entry.auth = dict(entry.auth, jwt_token=jwt_token, feed_token=response["data"]["feedToken"])
+                # The exchange rotates the refresh token too; the old one is spent
+                entry.refresh_token = response["data"].get("refreshToken") or entry.refresh_token
+                entry.created_at = datetime.now()
+                self.refreshes += 1
+                logger.info(f"🔑 Refreshed SmartAPI session for {entry.credentials['client_code']}")
+            except Exception as e:
+                logger.warning(f"⚠️ Token refresh failed for {entry.credentials['client_code']} ({e}), logging in again")
+                self._login(entry)
+
+    def refresh_due(self):
+        """Refresh every session older than refresh_after; called by the background thread"""
+        now = datetime.now()
+        for entry in list(self._sessions.values()):
+            if entry.auth is not None and now - entry.created_at >= self.refresh_after:
+                try:
+                    self._refresh(entry)
+                except Exception as e:
+                    logger.error(f"❌ Session refresh failed for {entry.credentials['client_code']}: {e}")
+
+    def _ensure_refresher(self):
+        if self._refresher is None:
+            with self._lock:
+                if self._refresher is None:
+                    self._refresher = threading.Thread(target=self._refresh_loop, daemon=True,
+                                                       name="session-refresher")
+                    self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.refresh_due()
+
+    def status(self):
+        now = datetime.now()
+        return {
+            "sessions": {
+                client_code[:4] + "***": {
+                    "valid": self._is_valid(entry),
+                    "age_minutes": round((now - entry.created_at).total_seconds() / 60, 1) if entry.created_at else None
+                } for client_code, entry in list(self._sessions.items())
+            },
+            "logins": self.logins,
+            "refreshes": self.refreshes,
+            "hits": self.hits
+        }
+
+
+# Process-wide pool used by managers, the subscription broker and /subscribe
+session_pool = SessionPool()
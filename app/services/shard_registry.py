@@ -0,0 +1,172 @@
+"""
+Shard registry for multi-process mode
+With SHARD_COUNT > 1 several worker processes run side by side, each on
+its own port. Every websocket_uuid belongs to exactly one shard, chosen by
+consistent hashing, and requests that land on another process are proxied
+to the owner. Shard addresses and the connection -> shard map live in a
+small SQLite file that all processes on the host share.
+"""
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from app.config import config
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+# Set on proxied requests so the receiving shard answers locally
+SHARD_FORWARD_HEADER = "X-TradeX-Shard-Forwarded"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_index INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    pid INTEGER,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS connections (
+    websocket_uuid TEXT PRIMARY KEY,
+    shard_index INTEGER NOT NULL,
+    tokens TEXT,
+    created_at REAL
+);
+"""
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring over shard indexes with virtual nodes"""
+
+    def __init__(self, shard_indexes, vnodes=64):
+        points = sorted((_hash(f"shard-{index}#{v}"), index) for index in shard_indexes for v in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._owners = [index for _, index in points]
+
+    def owner(self, key):
+        position = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[position]
+
+
+class ShardRegistry:
+    """SQLite-backed shard table and websocket_uuid -> shard map"""
+
+    def __init__(self, path=None, shard_count=None, shard_index=None):
+        self.path = path or config.SHARD_REGISTRY_PATH
+        self.shard_count = shard_count or config.SHARD_COUNT
+        self.shard_index = config.SHARD_INDEX if shard_index is None else shard_index
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(f"SHARD_INDEX must be in 0..{self.shard_count - 1}, got {self.shard_index}")
+        self.ring = HashRing(range(self.shard_count))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+        self._heartbeat = None
+
+    def _connect(self):
+        # Short-lived connections: safe across green threads and processes
+        db = sqlite3.connect(self.path, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    # -- shards --------------------------------------------------------------
+
+    def register_shard(self, url):
+        """Announce this process; connections it owned before a restart are gone, so drop them"""
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO shards (shard_index, url, pid, heartbeat_at) VALUES (?, ?, ?, ?)",
+                       (self.shard_index, url, os.getpid(), time.time()))
+            db.execute("DELETE FROM connections WHERE shard_index = ?", (self.shard_index,))
+        logger.info(f"🧭 Shard {self.shard_index}/{self.shard_count} registered at {url}")
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True, name="shard-heartbeat")
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(config.SHARD_HEARTBEAT_SECONDS)
+            try:
+                with self._connect() as db:
+                    db.execute("UPDATE shards SET heartbeat_at = ? WHERE shard_index = ?",
+                               (time.time(), self.shard_index))
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Shard heartbeat failed: {e}")
+
+    def shards(self):
+        """{shard_index: {"url", "pid", "alive"}}"""
+        cutoff = time.time() - config.SHARD_HEARTBEAT_SECONDS * 3
+        with self._connect() as db:
+            rows = db.execute("SELECT shard_index, url, pid, heartbeat_at FROM shards").fetchall()
+        return {index: {"url": url, "pid": pid, "alive": (heartbeat_at or 0) >= cutoff}
+                for index, url, pid, heartbeat_at in rows}
+
+    def url_of(self, shard_index):
+        with self._connect() as db:
+            row = db.execute("SELECT url FROM shards WHERE shard_index = ?", (shard_index,)).fetchone()
+        return row[0] if row else None
+
+    def owner_of(self, websocket_uuid):
+        return self.ring.owner(str(websocket_uuid))
+
+    def is_local(self, websocket_uuid):
+        return self.owner_of(websocket_uuid) == self.shard_index
+
+    # -- connections ---------------------------------------------------------
+
+    def record_connection(self, websocket_uuid, tokens):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO connections (websocket_uuid, shard_index, tokens, created_at) "
+                       "VALUES (?, ?, ?, ?)",
+                       (websocket_uuid, self.shard_index, json.dumps(tokens, default=str), time.time()))
+
+    def remove_connection(self, websocket_uuid):
+        with self._connect() as db:
+            db.execute("DELETE FROM connections WHERE websocket_uuid = ?", (websocket_uuid,))
+
+    def connections(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT websocket_uuid, shard_index FROM connections").fetchall()
+        return dict(rows)
+
+    # -- proxying ------------------------------------------------------------
+
+    def proxy(self, shard_index, method, path, body=None, content_type=None):
+        """Send a request to another shard; returns (status, body bytes, content type)"""
+        url = self.url_of(shard_index)
+        if not url:
+            return 503, json.dumps({"success": False, "error": f"Shard {shard_index} is not registered"}).encode(), "application/json"
+        headers = {SHARD_FORWARD_HEADER: str(self.shard_index)}
+        if content_type:
+            headers["Content-Type"] = content_type
+        try:
+            response = requests.request(method, f"{url}{path}", data=body, headers=headers,
+                                        timeout=config.SHARD_PROXY_TIMEOUT)
+        except requests.RequestException as e:
+            logger.error(f"❌ Proxy to shard {shard_index} failed: {e}")
+            return 503, json.dumps({"success": False, "error": f"Shard {shard_index} unreachable"}).encode(), "application/json"
+        return response.status_code, response.content, response.headers.get("Content-Type", "application/json")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide ShardRegistry, or None when sharding is off"""
+    global _registry
+    if not config.SHARDING_ENABLED:
+        return None
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ShardRegistry()
+    return _registry
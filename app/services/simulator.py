@@ -1,12 +1,16 @@
-import time
-import random
-from datetime import datetime
-from threading import Thread
+from app.services.market_simulator import MarketSimulator, socketio_sink
 from app.services.tracker import RealTimeCandleTracker
-from socket_server import emit_tick_to_clients
 
+# One engine steps every simulated token; tokens join it at their last historical close
+_engine = None
 _simulators = {}
 
+def _get_engine():
+    global _engine
+    if _engine is None:
+        _engine = MarketSimulator(sinks=[socketio_sink()])
+    return _engine
+
 def start_simulation(symboltoken, exchangeType, interval_min, from_date, to_date):
     if symboltoken in _simulators:
         return  # already simulating
@@ -16,27 +20,16 @@ def start_simulation(symboltoken, exchangeType, interval_min, from_date, to_date
     if not candles:
         raise Exception("No historical data available")
 
-    last_close = candles[-1][4] * 100  # in paise
-
-    def run_simulation():
-        ltp = last_close
-        while symboltoken in _simulators:
-            movement = random.randint(-50, 50)
-            ltp += movement
-            if ltp <= 0:
-                ltp = last_close
-
-            tick = {
-                "ltp": ltp / 100,
-                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "symboltoken": symboltoken
-            }
-            emit_tick_to_clients(tick)
-            time.sleep(1)
+    last_close = candles[-1][4]  # in rupees
 
-    thread = Thread(target=run_simulation, daemon=True)
-    _simulators[symboltoken] = thread
-    thread.start()
+    engine = _get_engine()
+    engine.add_tokens([symboltoken], last_close)
+    _simulators[symboltoken] = engine
+    engine.start()
 
 def stop_simulation(symboltoken):
-    _simulators.pop(symboltoken, None)
+    engine = _simulators.pop(symboltoken, None)
+    if engine:
+        engine.remove_tokens([symboltoken])
+        if not _simulators:
+            engine.stop()
@@ -0,0 +1,131 @@
+"""
+Versioned connection status
+Managers report state transitions (connecting, authenticated, connected,
+reconnecting, auth_failed) and token changes here; each change bumps one
+process-wide version. /api/status?since=<version> returns only the records
+changed after that version (plus removed websockets), pages by
+websocket_uuid, and answers If-None-Match with 304 while the version is
+unchanged. Listeners (the Socket.IO `status` stream) get every delta.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+MAX_TOMBSTONES = 1000  # removed websockets remembered for deltas; older `since` gets a full resync
+
+
+class StatusFeed:
+    """websocket_uuid -> status record, each stamped with the version it last changed at"""
+
+    def __init__(self):
+        # Versions restart with the process; the epoch tells clients to resync
+        self.epoch = int(time.time() * 1000)
+        self.version = 0
+        self._records = {}
+        self._removed = OrderedDict()  # websocket_uuid -> version it was removed at
+        self._floor = 0  # deltas since a version below this may miss removals
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def update(self, websocket_id, **fields):
+        """Merge fields into the record; bumps the version only when something changed"""
+        with self._lock:
+            record = self._records.get(websocket_id)
+            if record is not None and all(record.get(key) == value for key, value in fields.items()):
+                return None
+            self.version += 1
+            record = dict(record or {}, **fields)
+            record["version"] = self.version
+            record["changed_at"] = datetime.now().isoformat()
+            self._records[websocket_id] = record
+            self._removed.pop(websocket_id, None)
+            delta = self._delta_for({websocket_id: record}, [])
+        self._notify(delta)
+        return record
+
+    def remove(self, websocket_id):
+        """Websocket closed and gone from the registry"""
+        with self._lock:
+            if self._records.pop(websocket_id, None) is None:
+                return
+            self.version += 1
+            self._removed[websocket_id] = self.version
+            while len(self._removed) > MAX_TOMBSTONES:
+                _, version = self._removed.popitem(last=False)
+                self._floor = version
+            delta = self._delta_for({}, [websocket_id])
+        self._notify(delta)
+
+    def _delta_for(self, changed, removed):
+        return {"epoch": self.epoch, "version": self.version, "full": False, "changed": changed, "removed": removed}
+
+    @staticmethod
+    def parse_since(since):
+        """Client-supplied version -> int, or None (full resync) when missing or not an integer"""
+        try:
+            return None if since is None else int(since)
+        except (TypeError, ValueError):
+            return None
+
+    def etag(self, since=None, cursor=None, limit=None):
+        """Tag for one page of the feed: the version plus the normalised query it answers"""
+        query = hashlib.sha1(f"{since}|{cursor}|{limit}".encode()).hexdigest()[:12]
+        return f'"status-{self.epoch}-{self.version}-{query}"'
+
+    def delta(self, since=None, cursor=None, limit=None):
+        """Records changed after `since` (all of them when None, too old or ahead of this process)
+
+        Records are ordered by websocket_uuid; with limit, next_cursor is the
+        cursor for the following page (None on the last one). Removals are
+        listed on the first page only.
+        """
+        since = self.parse_since(since)
+        with self._lock:
+            full = since is None or since < self._floor or since > self.version
+            ids = sorted(ws_id for ws_id, record in self._records.items()
+                         if full or record["version"] > since)
+            removed = [] if full or cursor is not None else [
+                ws_id for ws_id, version in self._removed.items() if version > since]
+            if cursor is not None:
+                ids = [ws_id for ws_id in ids if ws_id > cursor]
+            next_cursor = None
+            if limit and len(ids) > limit:
+                ids = ids[:limit]
+                next_cursor = ids[-1]
+            return {
+                "epoch": self.epoch,
+                "version": self.version,
+                "since": since,
+                "full": full,
+                "total_websockets": len(self._records),
+                "changed": {ws_id: self._records[ws_id] for ws_id in ids},
+                "removed": removed,
+                "next_cursor": next_cursor
+            }
+
+    def add_listener(self, listener):
+        """listener(delta) is called after every change, outside the lock"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, delta):
+        for listener in list(self._listeners):
+            try:
+                listener(delta)
+            except Exception as e:
+                logger.error(f"Error in status listener: {e}")
+
+
+# Global feed shared by all managers, the /api/status routes and the Socket.IO `status` stream
+status_feed = StatusFeed()
@@ -0,0 +1,360 @@
+"""
+Shared upstream subscription broker
+Owns the SmartAPI websocket connections instead of each manager. Tokens
+requested by every logical websocket_uuid of a client_code are packed
+into as few upstream connections as the limits allow; a token watched
+by several managers is subscribed once. Each tick is fanned out to every
+watching manager for its own logging/metrics, but forwarded only once
+per backend target.
+"""
+import math
+import os
+import threading
+
+from app.config import config
+from app.logger import get_logger
+from app.services.feed_connection import FeedConnection
+from app.services.session_manager import credentials_digest, session_pool
+from app.services.token_specs import group_by_mode, parse_token_specs, specs_from_token_list
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+
+class UpstreamConnection:
+    """One self-healing feed carrying a packed set of tokens ({token: (exchange_type, mode)})"""
+
+    def __init__(self, broker, client_code, auth_provider, index):
+        self.broker = broker
+        self.client_code = client_code
+        self.auth_provider = auth_provider
+        self.name = f"upstream-{client_code}-{index}"
+        self.tokens = {}
+        self.feed = None
+
+    def start(self):
+        # FeedConnection replays self.tokens on every (re)connect
+        self.feed = FeedConnection(self.name, self.auth_provider, lambda: self.tokens,
+                                   lambda message: self.broker.dispatch(message, self.client_code))
+        logger.info(f"🔗 Starting {self.name} with {len(self.tokens)} tokens")
+        if not self.feed.start():
+            logger.error(f"❌ Upstream {self.name} could not log in")
+
+    @property
+    def connected(self):
+        return self.feed is not None and self.feed.connected
+
+    def _send(self, subscribe, specs):
+        if self.feed is None:
+            return
+        try:
+            for mode, token_list in group_by_mode(specs).items():
+                if subscribe:
+                    self.feed.subscribe(self.name, mode, token_list)
+                else:
+                    self.feed.unsubscribe(self.name, mode, token_list)
+        except Exception as e:
+            logger.error(f"Upstream {self.name} {'subscribe' if subscribe else 'unsubscribe'} failed: {e}")
+
+    def add(self, specs):
+        self.tokens.update(specs)
+        self._send(True, specs)
+
+    def remove(self, tokens):
+        specs = {token: self.tokens.pop(token) for token in tokens if token in self.tokens}
+        if specs:
+            self._send(False, specs)
+
+    def respec(self, token, spec):
+        """Move an owned token to a different exchange type / mode"""
+        self.remove([token])
+        self.add({token: spec})
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.close()
+            self.feed = None
+
+    def stats(self):
+        stats = {"tokens": len(self.tokens), "connected": self.connected}
+        if self.feed is not None:
+            feed_status = self.feed.status()
+            stats.update(reconnects=feed_status["reconnects"], failovers=feed_status["failovers"],
+                         standby_ready=feed_status["standby_ready"])
+        return stats
+
+
+class _ClientGroup:
+    """Upstream connections, watchers and token ownership for one client_code"""
+
+    def __init__(self, client_code, auth, credentials):
+        self.client_code = client_code
+        self.auth = auth
+        self.credentials = credentials
+        self.upstreams = []
+        self.owner = {}     # token -> UpstreamConnection
+        self.watchers = {}  # token -> [websocket_id, ...] in subscription order
+        self.specs = {}     # token -> effective (exchange_type, mode) on the upstream
+        self.next_index = 0
+
+    def auth_provider(self, refresh=False):
+        """Pooled session for the group's client_code; refresh=True forces a new login"""
+        if refresh:
+            session_pool.invalidate(self.client_code)
+        try:
+            self.auth = session_pool.get(self.credentials)
+        except Exception as e:
+            logger.error(f"Login failed for client {self.client_code}: {e}")
+            return None
+        return self.auth
+
+
+class BrokeredSocket:
+    """Stand-in for manager.ws in broker mode; routes subscribe/close through the broker"""
+
+    def __init__(self, broker, websocket_id):
+        self.broker = broker
+        self.websocket_id = websocket_id
+
+    def subscribe(self, correlation_id, mode, token_list):
+        self.broker.add_tokens(self.websocket_id, specs_from_token_list(mode, token_list))
+
+    def unsubscribe(self, correlation_id, mode, token_list):
+        self.broker.remove_tokens(self.websocket_id, specs_from_token_list(mode, token_list))
+
+    def close(self):
+        self.broker.unregister(self.websocket_id)
+
+    close_connection = close
+
+
+class SubscriptionBroker:
+    """Deduplicating, packing owner of all upstream SmartAPI connections"""
+
+    def __init__(self, tokens_per_connection=None, max_connections=None):
+        self.tokens_per_connection = tokens_per_connection or config.BROKER_TOKENS_PER_CONNECTION
+        self.max_connections = max_connections or config.BROKER_MAX_CONNECTIONS
+        self._managers = {}   # websocket_id -> manager
+        self._wanted = {}     # websocket_id -> {token: (exchange_type, mode)}
+        self._groups = {}     # client_code -> _ClientGroup
+        self._routes = {}     # (client_code, token) -> ((manager, forward), ...)
+        self._lock = threading.RLock()
+        self.rejected = 0
+
+    # -- subscriptions -------------------------------------------------------
+
+    def register(self, manager):
+        """Attach a manager; logs in once per client_code. Returns False if login failed"""
+        client_code = manager.credentials["client_code"]
+        # Outside the broker lock: a real login blocks on SmartAPI. The pool only hands out a
+        # cached session for identical credentials, so this also verifies a joining manager.
+        auth = manager.login()
+        if not auth:
+            return False
+        with self._lock:
+            group = self._groups.get(client_code)
+            if group is None:
+                group = self._groups[client_code] = _ClientGroup(client_code, auth, manager.credentials)
+            elif credentials_digest(group.credentials) != credentials_digest(manager.credentials):
+                # Different credentials that just logged in successfully (e.g. a rotated password)
+                group.credentials = manager.credentials
+                group.auth = auth
+            manager.ws = BrokeredSocket(self, manager.websocket_id)
+            self._managers[manager.websocket_id] = manager
+            self._wanted[manager.websocket_id] = {}
+        self.set_tokens(manager.websocket_id, manager.token_specs)
+        logger.info(f"🧩 Broker registered {manager.websocket_id} ({len(manager.tokens)} tokens, client {client_code})")
+        return True
+
+    def unregister(self, websocket_id):
+        with self._lock:
+            if websocket_id not in self._managers:
+                return
+            self.set_tokens(websocket_id, {})
+            manager = self._managers.pop(websocket_id)
+            self._wanted.pop(websocket_id, None)
+            client_code = manager.credentials["client_code"]
+            group = self._groups.get(client_code)
+            if group and not group.owner and not any(
+                    m.credentials["client_code"] == client_code for m in self._managers.values()):
+                for upstream in group.upstreams:
+                    upstream.close()
+                self._groups.pop(client_code, None)
+        logger.info(f"🧩 Broker unregistered {websocket_id}")
+
+    def add_tokens(self, websocket_id, specs):
+        self.set_tokens(websocket_id, {**self._wanted.get(websocket_id, {}), **specs})
+
+    def remove_tokens(self, websocket_id, tokens):
+        wanted = self._wanted.get(websocket_id, {})
+        self.set_tokens(websocket_id, {t: s for t, s in wanted.items() if t not in tokens})
+
+    def set_tokens(self, websocket_id, tokens):
+        """Replace a manager's token specs; upstream subscriptions change only for first/last watchers
+
+        tokens is a {token: (exchange_type, mode)} dict or a list accepted by
+        parse_token_specs. Returns the tokens that could not be placed.
+        """
+        with self._lock:
+            manager = self._managers.get(websocket_id)
+            if manager is None:
+                return set()
+            group = self._groups[manager.credentials["client_code"]]
+            wanted = dict(tokens) if isinstance(tokens, dict) else parse_token_specs(tokens)
+            previous = self._wanted[websocket_id]
+            added = wanted.keys() - previous.keys()
+            removed = previous.keys() - wanted.keys()
+            changed = {t for t in wanted.keys() & previous.keys() if wanted[t] != previous[t]}
+            self._wanted[websocket_id] = wanted
+
+            first_watch = set()
+            for token in added:
+                watchers = group.watchers.setdefault(token, [])
+                if not watchers:
+                    first_watch.add(token)
+                watchers.append(websocket_id)
+            last_watch = set()
+            for token in removed:
+                watchers = group.watchers.get(token, [])
+                if websocket_id in watchers:
+                    watchers.remove(websocket_id)
+                if not watchers:
+                    group.watchers.pop(token, None)
+                    last_watch.add(token)
+
+            self._release(group, last_watch)
+            # Shared tokens follow the heaviest mode any watcher asked for
+            for token in (added | removed | changed) - first_watch - last_watch:
+                spec = self._effective_spec(group, token)
+                if spec != group.specs.get(token):
+                    group.specs[token] = spec
+                    upstream = group.owner.get(token)
+                    if upstream is not None:
+                        upstream.respec(token, spec)
+            rejected = self._assign(group, {token: self._effective_spec(group, token) for token in first_watch})
+            for token in rejected:
+                group.watchers.pop(token, None)
+                wanted.pop(token, None)
+            manager.token_specs = dict(wanted)
+            manager.tokens = sorted(wanted)
+            if removed:
+                self._rebalance(group)
+            for token in added | removed:
+                self._rebuild_route(group, token)
+            return rejected
+
+    def _effective_spec(self, group, token):
+        watchers = group.watchers[token]
+        exchange_type = self._wanted[watchers[0]][token][0]
+        mode = max(self._wanted[websocket_id][token][1] for websocket_id in watchers)
+        return exchange_type, mode
+
+    def _release(self, group, tokens):
+        by_upstream = {}
+        for token in tokens:
+            group.specs.pop(token, None)
+            upstream = group.owner.pop(token, None)
+            if upstream is not None:
+                by_upstream.setdefault(upstream, set()).add(token)
+        for upstream, owned in by_upstream.items():
+            upstream.remove(owned)
+
+    def _assign(self, group, specs):
+        """Pack {token: spec} into existing upstreams with room, opening new ones up to the limit"""
+        pending = dict(specs)
+        for upstream in group.upstreams:
+            if not pending:
+                break
+            pending = self._fill(group, upstream, pending)
+        while pending and len(group.upstreams) < self.max_connections:
+            upstream = UpstreamConnection(self, group.client_code, group.auth_provider, group.next_index)
+            group.next_index += 1
+            group.upstreams.append(upstream)
+            pending = self._fill(group, upstream, pending)
+            upstream.start()
+        if pending:
+            self.rejected += len(pending)
+            logger.error(f"❌ Broker capacity reached for {group.client_code}: "
+                         f"{len(pending)} token(s) not subscribed")
+        return set(pending)
+
+    def _fill(self, group, upstream, pending):
+        room = self.tokens_per_connection - len(upstream.tokens)
+        if room <= 0:
+            return pending
+        batch = {token: pending.pop(token) for token in sorted(pending)[:room]}
+        for token, spec in batch.items():
+            group.owner[token] = upstream
+            group.specs[token] = spec
+        upstream.add(batch)
+        return pending
+
+    def _rebalance(self, group):
+        """Close connections that are no longer needed, moving their tokens onto the others"""
+        needed = math.ceil(len(group.owner) / self.tokens_per_connection)
+        while len(group.upstreams) > needed:
+            victim = min(group.upstreams, key=lambda u: len(u.tokens))
+            group.upstreams.remove(victim)
+            moving = dict(victim.tokens)
+            victim.close()
+            for token in moving:
+                group.owner.pop(token, None)
+            if moving:
+                logger.info(f"🧩 Rebalancing {len(moving)} token(s) off {victim.name}")
+                self._assign(group, moving)
+
+    def _rebuild_route(self, group, token):
+        # The first watcher per backend target forwards; the rest only log and count
+        key = (group.client_code, token)
+        watchers = group.watchers.get(token)
+        if not watchers:
+            self._routes.pop(key, None)
+            return
+        seen_targets = set()
+        route = []
+        for websocket_id in watchers:
+            manager = self._managers[websocket_id]
+            target = manager.forwarder.url
+            route.append((manager, target not in seen_targets))
+            seen_targets.add(target)
+        self._routes[key] = tuple(route)
+
+    # -- ticks ---------------------------------------------------------------
+
+    def dispatch(self, message, client_code):
+        # message is a Tick; FeedConnection converts full-decoder dicts. Only the
+        # managers of the client_code whose upstream delivered it receive it.
+        route = self._routes.get((client_code, message.token))
+        if not route:
+            return
+        for manager, forward in route:
+            try:
+                manager.handle_tick(message, forward=forward)
+            except Exception as e:
+                logger.error(f"Broker dispatch to {manager.websocket_id} failed: {e}")
+
+    def status(self):
+        with self._lock:
+            return {
+                "logical_websockets": len(self._managers),
+                "unique_tokens": sum(len(group.watchers) for group in self._groups.values()),
+                "requested_tokens": sum(len(w) for w in self._wanted.values()),
+                "rejected_tokens": self.rejected,
+                "upstreams": {
+                    upstream.name: upstream.stats()
+                    for group in self._groups.values() for upstream in group.upstreams
+                }
+            }
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Process-wide SubscriptionBroker"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = SubscriptionBroker()
+    return _broker
@@ -0,0 +1,103 @@
+"""
+Lean SmartAPI binary tick decoder
+SmartWebSocketV2 decodes every field of every frame into a dict; the
+pipeline only reads token, LTP, volume, exchange timestamp and mode.
+This decoder unpacks just those fields straight from the frame buffer
+into a Tick record, and decode_batch() fills a preallocated TickBatch
+for bursts of frames.
+"""
+import struct
+import time
+from array import array
+
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+from app.services.tick_record import Tick
+
+# mode, exchange type, token (null padded), sequence number, exchange timestamp, LTP (paise)
+HEAD = struct.Struct("<BB25sqqq")
+VOLUME = struct.Struct("<q")
+VOLUME_OFFSET = 67  # Quote and SnapQuote frames only
+
+LTP_MODE = SmartWebSocketV2.LTP_MODE
+
+# Full frame sizes per mode, for encode_frame
+FRAME_SIZES = {1: 51, 2: 123, 3: 379}
+
+
+def _token(raw):
+    return raw.split(b"\x00", 1)[0].decode()
+
+
+def decode_tick(frame):
+    """One binary frame -> Tick with only the fields the pipeline uses"""
+    mode, exchange_type, token, _, exchange_timestamp, ltp = HEAD.unpack_from(frame)
+    volume = VOLUME.unpack_from(frame, VOLUME_OFFSET)[0] if mode != LTP_MODE else 0
+    return Tick(_token(token), ltp, volume, exchange_timestamp, mode, exchange_type, time.time())
+
+
+class TickBatch:
+    """Preallocated column arrays for a burst of decoded frames"""
+
+    __slots__ = ("capacity", "count", "modes", "exchange_types", "tokens",
+                 "exchange_timestamps", "ltps", "volumes")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.modes = array("B", bytes(capacity))
+        self.exchange_types = array("B", bytes(capacity))
+        self.tokens = [None] * capacity
+        self.exchange_timestamps = array("q", bytes(8 * capacity))
+        self.ltps = array("q", bytes(8 * capacity))
+        self.volumes = array("q", bytes(8 * capacity))
+
+    def tick(self, index):
+        """Row index as a Tick"""
+        return Tick(self.tokens[index], self.ltps[index], self.volumes[index],
+                    self.exchange_timestamps[index], self.modes[index], self.exchange_types[index])
+
+    def __len__(self):
+        return self.count
+
+
+def decode_batch(frames, batch):
+    """Decode frames into batch from row 0; returns the number of rows filled (at most capacity)"""
+    unpack_head = HEAD.unpack_from
+    unpack_volume = VOLUME.unpack_from
+    modes, exchange_types, tokens = batch.modes, batch.exchange_types, batch.tokens
+    timestamps, ltps, volumes = batch.exchange_timestamps, batch.ltps, batch.volumes
+    count = 0
+    for frame in frames:
+        if count == batch.capacity:
+            break
+        # unpack_from reads bytes/bytearray/memoryview frames in place
+        mode, exchange_type, token, _, exchange_timestamp, ltp = unpack_head(frame)
+        modes[count] = mode
+        exchange_types[count] = exchange_type
+        tokens[count] = _token(token)
+        timestamps[count] = exchange_timestamp
+        ltps[count] = ltp
+        volumes[count] = unpack_volume(frame, VOLUME_OFFSET)[0] if mode != LTP_MODE else 0
+        count += 1
+    batch.count = count
+    return count
+
+
+def encode_frame(tick):
+    """Tick dict -> binary frame of the right size for its mode (other fields zeroed); for tests and benchmarks"""
+    mode = tick.get("subscription_mode", LTP_MODE)
+    frame = bytearray(FRAME_SIZES.get(mode, FRAME_SIZES[LTP_MODE]))
+    HEAD.pack_into(frame, 0, mode, tick.get("exchange_type", 1), str(tick["token"]).encode(),
+                   tick.get("sequence_number", 0), tick.get("exchange_timestamp", 0),
+                   tick.get("last_traded_price", 0))
+    if mode != LTP_MODE:
+        VOLUME.pack_into(frame, VOLUME_OFFSET, tick.get("volume_trade_for_the_day", 0))
+    return bytes(frame)
+
+
+class LeanSmartWebSocketV2(SmartWebSocketV2):
+    """SmartWebSocketV2 whose frames are decoded by decode_tick"""
+
+    def _parse_binary_data(self, binary_data):
+        return decode_tick(binary_data)
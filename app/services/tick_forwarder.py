@@ -0,0 +1,243 @@
+"""
+Batched tick forwarder
+Keeps a bounded in-memory queue per manager and posts arrays of candle
+payloads to the backend from a background flusher, so the websocket
+receive path never waits on a backend round-trip. When the backend falls
+behind and the queue is full, FORWARD_OVERFLOW_POLICY decides what is
+shed: the oldest entry, the incoming one, or (conflate) the queued tick
+for the same token is replaced by the newer one.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from app.config import config
+from app.logger import get_logger
+from app.services.backend_transport import CircuitOpenError, get_transport
+from app.services.metrics import LatencyHistogram
+from app.services.tick_record import Tick, json_default
+
+logger = get_logger(os.getenv("ENV", "development"))
+tick_analysis_logger = get_logger("tick_analysis")
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "conflate")
+QUEUE_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SHEDDING_WINDOW_SECONDS = 10  # "shedding" stays true this long after the last drop
+
+
+def overflow_policy(name=None):
+    """Normalized policy name (drop-oldest and drop_oldest are the same); ValueError if unknown"""
+    policy = (name or config.FORWARD_OVERFLOW_POLICY).strip().lower().replace("-", "_")
+    if policy == "conflate_per_token":
+        policy = "conflate"
+    if policy not in OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown forward overflow policy {name!r}, expected one of {OVERFLOW_POLICIES}")
+    return policy
+
+
+class TickForwarder:
+    """Bounded queue of candle payloads flushed to the backend in batches"""
+
+    def __init__(self, websocket_id, url=None, batch_size=None, flush_interval_ms=None,
+                 max_queue=None, on_result=None, pull=None, policy=None):
+        self.websocket_id = websocket_id
+        self.url = url or config.get_backend_candle_url()
+        self.batch_size = batch_size or config.FORWARD_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or config.FORWARD_FLUSH_INTERVAL_MS) / 1000.0
+        self.max_queue = max_queue or config.FORWARD_QUEUE_SIZE
+        self.on_result = on_result  # callable(ok, batch, response_time_ms, nbytes)
+        self.pull = pull  # optional callable() -> list of payloads, polled every flush cycle
+        self.policy = overflow_policy(policy)
+
+        self._queue = deque()  # [enqueued_at (monotonic), payload] entries
+        self._queued_ticks = {}  # conflate only: token -> its queued entry
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self.dropped = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.conflated = 0
+        self.high_watermark = 0
+        self.last_shed_at = None
+        self.batches_sent = 0
+        self.queue_wait = LatencyHistogram(QUEUE_WAIT_BUCKETS_MS)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"forwarder-{self.websocket_id}")
+        self._thread.start()
+
+    def enqueue(self, payload):
+        """Queue a payload without blocking; when full, the overflow policy decides what is shed"""
+        if not self._running:
+            self.start()
+        with self._lock:
+            queue = self._queue
+            if len(queue) >= self.max_queue and not self._overflow(payload):
+                return
+            entry = [time.monotonic(), payload]
+            queue.append(entry)
+            if self.policy == "conflate" and type(payload) is Tick:
+                self._queued_ticks[payload.token] = entry
+            size = len(queue)
+            if size > self.high_watermark:
+                self.high_watermark = size
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def _overflow(self, payload):
+        """Make room for payload under the lock; False when payload itself is shed"""
+        if self.policy == "conflate" and type(payload) is Tick:
+            entry = self._queued_ticks.get(payload.token)
+            if entry is not None:
+                # Newer tick takes the queued one's place (and keeps its queue time)
+                entry[1] = payload
+                self.conflated += 1
+                self._shed("conflated")
+                return False
+        elif self.policy == "drop_newest":
+            self.dropped += 1
+            self.dropped_newest += 1
+            self._shed("dropped newest")
+            return False
+        self._shed("dropped oldest")
+        self._forget(self._queue.popleft())
+        self.dropped += 1
+        self.dropped_oldest += 1
+        return True
+
+    def _forget(self, entry):
+        if self._queued_ticks:
+            payload = entry[1]
+            if type(payload) is Tick and self._queued_ticks.get(payload.token) is entry:
+                del self._queued_ticks[payload.token]
+
+    def _shed(self, action):
+        now = time.time()
+        if self.last_shed_at is None or now - self.last_shed_at > SHEDDING_WINDOW_SECONDS:
+            logger.warning(f"🚯 Forward queue full for {self.websocket_id} | {len(self._queue)}/{self.max_queue} | "
+                           f"Policy: {self.policy} | First shed: {action}")
+        self.last_shed_at = now
+
+    def depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        """Queue depth, shed counters and time-in-queue for /status"""
+        queue = self._queue
+        try:
+            oldest_ms = (time.monotonic() - queue[0][0]) * 1000 if queue else 0.0
+        except IndexError:
+            oldest_ms = 0.0  # drained between the check and the read
+        last_shed_at = self.last_shed_at
+        return {
+            "policy": self.policy,
+            "depth": len(queue),
+            "capacity": self.max_queue,
+            "high_watermark": self.high_watermark,
+            "dropped": self.dropped,
+            "dropped_oldest": self.dropped_oldest,
+            "dropped_newest": self.dropped_newest,
+            "conflated": self.conflated,
+            "shedding": last_shed_at is not None and time.time() - last_shed_at <= SHEDDING_WINDOW_SECONDS,
+            "last_shed_at": datetime.fromtimestamp(last_shed_at).isoformat() if last_shed_at else None,
+            "batches_sent": self.batches_sent,
+            "time_in_queue_ms": {**self.queue_wait.snapshot(), "oldest": round(oldest_ms, 3)}
+        }
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self.pull:
+                self._pull()
+            self.flush()
+
+    def _pull(self):
+        try:
+            for payload in self.pull():
+                self.enqueue(payload)
+        except Exception as e:
+            logger.error(f"Error pulling payloads for {self.websocket_id}: {e}")
+
+    def _take_batch(self):
+        with self._lock:
+            queue = self._queue
+            count = min(len(queue), self.batch_size)
+            if not count:
+                return []
+            now = time.monotonic()
+            observe = self.queue_wait.observe
+            conflating = self.policy == "conflate"
+            batch = []
+            for _ in range(count):
+                entry = queue.popleft()
+                observe((now - entry[0]) * 1000)
+                if conflating:
+                    self._forget(entry)
+                batch.append(entry[1])
+            return batch
+
+    def flush(self):
+        """Drain the queue, posting one request per batch"""
+        batch = self._take_batch()
+        while batch:
+            self._post(batch)
+            batch = self._take_batch()
+
+    def _post(self, batch):
+        response_time = None
+        body = b""
+        try:
+            body = json.dumps(batch, default=json_default, separators=(",", ":")).encode()
+            start_time = time.perf_counter()
+            response = get_transport().post(self.url, data=body, headers=JSON_HEADERS)
+            response_time = (time.perf_counter() - start_time) * 1000  # ms
+            self.batches_sent += 1
+
+            if response.status_code not in [200, 201]:
+                logger.warning(f"❌ Backend candle processing failed | Status: {response.status_code} | Batch: {len(batch)} | Response: {response.text}")
+                tick_analysis_logger.warning(f"FORWARD_FAILED: Batch={len(batch)}, Status={response.status_code}, Response={response.text}")
+                self._report(False, batch, response_time, len(body))
+            else:
+                logger.debug(f"✅ Batch forwarded successfully | Ticks: {len(batch)} | Response time: {response_time:.1f}ms")
+                tick_analysis_logger.debug(f"FORWARD_SUCCESS: Batch={len(batch)}, ResponseTime={response_time:.1f}ms")
+                self._report(True, batch, response_time, len(body))
+
+        except CircuitOpenError as e:
+            # Backend known to be down: fail fast and quietly until the probe succeeds
+            logger.debug(f"⛔ Batch not forwarded | Ticks: {len(batch)} | {e}")
+            tick_analysis_logger.debug(f"FORWARD_ERROR: Batch={len(batch)}, Error={str(e)}")
+            self._report(False, batch)
+
+        except Exception as e:
+            logger.error(f"❌ Failed to forward batch to backend | Ticks: {len(batch)} | Error: {e}")
+            tick_analysis_logger.error(f"FORWARD_ERROR: Batch={len(batch)}, Error={str(e)}")
+            self._report(False, batch)
+
+    def _report(self, ok, batch, response_time=None, nbytes=0):
+        if self.on_result:
+            try:
+                self.on_result(ok, batch, response_time, nbytes)
+            except Exception as e:
+                logger.error(f"Error in forward result callback: {e}")
+
+    def stop(self):
+        """Stop the flusher and send whatever is still queued"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + config.FORWARD_TIMEOUT)
+        self._thread = None
+        self.flush()
@@ -0,0 +1,362 @@
+"""
+Binary append-only tick journal
+Fixed-width little-endian records written straight into memory-mapped,
+preallocated segment files under <JOURNAL_DIR>/<YYYYMMDD>/. Each day has
+an index.json listing its segments with first/last receive times and
+record counts, plus the websocket_id table the records refer to.
+Readers mmap the segments and scan them in place.
+"""
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.config import config
+from app.logger import get_logger
+
+logger = get_logger(os.getenv("ENV", "development"))
+
+# token, ltp_paise, volume, exchange_timestamp (ms), receive_ns, websocket index, reserved
+RECORD = struct.Struct("<qqqqqII")
+RECORD_SIZE = RECORD.size  # 48 bytes
+RECORD_FIELDS = [
+    ("token", "<i8"),
+    ("ltp_paise", "<i8"),
+    ("volume", "<i8"),
+    ("exchange_timestamp", "<i8"),
+    ("receive_ns", "<i8"),
+    ("websocket_index", "<u4"),
+    ("reserved", "<u4"),
+]
+RECEIVE_NS_OFFSET = 32
+INDEX_FILE = "index.json"
+
+
+def _token_to_int(token):
+    try:
+        return int(token)
+    except (TypeError, ValueError):
+        return -1
+
+
+class JournalSegment:
+    """One preallocated, memory-mapped segment file"""
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        self.first_ns = None
+        self.last_ns = None
+        self._file = open(path, "w+b")
+        self._file.truncate(capacity * RECORD_SIZE)
+        self._mm = mmap.mmap(self._file.fileno(), capacity * RECORD_SIZE)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, token, ltp_paise, volume, exchange_timestamp, receive_ns, websocket_index):
+        RECORD.pack_into(self._mm, self.count * RECORD_SIZE, token, ltp_paise, volume,
+                         exchange_timestamp, receive_ns, websocket_index, 0)
+        self.count += 1
+        if self.first_ns is None:
+            self.first_ns = receive_ns
+        self.last_ns = receive_ns
+
+    def sync(self):
+        self._mm.flush()
+
+    def close(self):
+        """Flush and trim the preallocated tail"""
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(self.count * RECORD_SIZE)
+        self._file.close()
+
+    def describe(self, closed):
+        return {
+            "file": os.path.basename(self.path),
+            "first_ns": self.first_ns,
+            "last_ns": self.last_ns,
+            "records": self.count,
+            "closed": closed
+        }
+
+
+class TickJournal:
+    """Process-wide journal writer shared by all websocket managers"""
+
+    def __init__(self, journal_dir=None, segment_mb=None, sync_interval=1.0):
+        self.journal_dir = journal_dir or config.JOURNAL_DIR
+        self.capacity = max(1, int((segment_mb or config.JOURNAL_SEGMENT_MB) * 1024 * 1024) // RECORD_SIZE)
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._day = None
+        self._day_dir = None
+        self._day_end_ns = 0
+        self._segment = None
+        self._closed_segments = []
+        self._websocket_ids = []
+        self._websocket_index = {}
+        self._dirty = False
+        self._running = True
+        self._thread = threading.Thread(target=self._sync_loop, daemon=True, name="tick-journal")
+        self._thread.start()
+        self.records_written = 0
+
+    def append(self, websocket_id, tick, receive_ns=None):
+        """Journal one Tick; cheap enough for the on_data path"""
+        receive_ns = receive_ns or time.time_ns()
+        with self._lock:
+            segment = self._segment
+            if segment is None or segment.full or receive_ns >= self._day_end_ns:
+                segment = self._rotate(receive_ns)
+            index = self._websocket_index.get(websocket_id)
+            if index is None:
+                index = self._register_websocket(websocket_id)
+            segment.append(
+                _token_to_int(tick.token),
+                int(tick.ltp_paise or 0),
+                int(tick.volume or 0),
+                int(tick.exchange_timestamp or 0),
+                receive_ns,
+                index
+            )
+            self._dirty = True
+            self.records_written += 1
+
+    @staticmethod
+    def _day_of(receive_ns):
+        return datetime.fromtimestamp(receive_ns / 1e9).strftime("%Y%m%d")
+
+    def _rotate(self, receive_ns):
+        day = self._day_of(receive_ns)
+        if self._segment is not None:
+            self._segment.close()
+            self._closed_segments.append(self._segment.describe(closed=True))
+            self._segment = None
+
+        if day != self._day:
+            if self._day_dir is not None:
+                # Seal the previous day's index: its last segment is closed now
+                self._write_index()
+            self._day = day
+            midnight = datetime.strptime(day, "%Y%m%d") + timedelta(days=1)
+            self._day_end_ns = int(midnight.timestamp() * 1e9)
+            self._day_dir = os.path.join(self.journal_dir, day)
+            os.makedirs(self._day_dir, exist_ok=True)
+            existing = self._load_index(self._day_dir)
+            self._closed_segments = []
+            for entry in existing.get("segments", []):
+                if not entry.get("closed"):
+                    # Left open by a run that crashed or was killed before close()
+                    entry = self._recover_segment(self._day_dir, entry)
+                if entry is not None:
+                    self._closed_segments.append(entry)
+            self._websocket_ids = existing.get("websockets", [])
+            self._websocket_index = {ws_id: i for i, ws_id in enumerate(self._websocket_ids)}
+
+        sequence = len(self._closed_segments) + 1
+        path = os.path.join(self._day_dir, f"segment_{sequence:06d}.bin")
+        while os.path.exists(path):
+            sequence += 1
+            path = os.path.join(self._day_dir, f"segment_{sequence:06d}.bin")
+        self._segment = JournalSegment(path, self.capacity)
+        self._write_index()
+        logger.info(f"📓 Tick journal segment opened: {path}")
+        return self._segment
+
+    @staticmethod
+    def _recover_segment(day_dir, entry):
+        """Close a segment left open by a run that never called close(); None if it holds nothing"""
+        path = os.path.join(day_dir, entry["file"])
+        try:
+            with open(path, "r+b") as f:
+                size = os.fstat(f.fileno()).st_size
+                count = 0
+                if size >= RECORD_SIZE:
+                    with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                        count = TickJournalReader._written_count(mm, size // RECORD_SIZE)
+                        if count:
+                            first_ns = TickJournalReader._receive_ns(mm, 0)
+                            last_ns = TickJournalReader._receive_ns(mm, count - 1)
+                f.truncate(count * RECORD_SIZE)
+        except OSError as e:
+            logger.error(f"Tick journal could not recover {path}: {e}")
+            return None
+        if not count:
+            os.remove(path)
+            return None
+        logger.warning(f"📓 Tick journal recovered {count} records from unclosed segment {path}")
+        return dict(entry, first_ns=first_ns, last_ns=last_ns, records=count, closed=True)
+
+    def _register_websocket(self, websocket_id):
+        index = len(self._websocket_ids)
+        self._websocket_ids.append(websocket_id)
+        self._websocket_index[websocket_id] = index
+        return index
+
+    @staticmethod
+    def _load_index(day_dir):
+        try:
+            with open(os.path.join(day_dir, INDEX_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        segments = list(self._closed_segments)
+        if self._segment is not None:
+            segments.append(self._segment.describe(closed=False))
+        index = {
+            "record_size": RECORD_SIZE,
+            "record_format": RECORD.format,
+            "fields": [name for name, _ in RECORD_FIELDS],
+            "websockets": self._websocket_ids,
+            "segments": segments
+        }
+        path = os.path.join(self._day_dir, INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def _sync_loop(self):
+        while self._running:
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def sync(self):
+        """Flush the active segment and refresh the day index"""
+        with self._lock:
+            if not self._dirty or self._segment is None:
+                return
+            try:
+                self._segment.sync()
+                self._write_index()
+                self._dirty = False
+            except Exception as e:
+                logger.error(f"Tick journal sync failed: {e}")
+
+    def close(self):
+        self._running = False
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._closed_segments.append(self._segment.describe(closed=True))
+                self._segment = None
+                self._write_index()
+
+
+class TickJournalReader:
+    """Zero-copy, time-ranged access to journal segments"""
+
+    def __init__(self, journal_dir=None):
+        self.journal_dir = journal_dir or config.JOURNAL_DIR
+
+    def days(self):
+        if not os.path.isdir(self.journal_dir):
+            return []
+        return sorted(d for d in os.listdir(self.journal_dir) if d.isdigit())
+
+    def index(self, day):
+        return TickJournal._load_index(os.path.join(self.journal_dir, day))
+
+    def websocket_ids(self, day):
+        return self.index(day).get("websockets", [])
+
+    def segments(self, start_ns=None, end_ns=None):
+        """(day, segment entry) pairs overlapping [start_ns, end_ns]"""
+        for day in self.days():
+            for entry in self.index(day).get("segments", []):
+                if entry.get("first_ns") is None:
+                    continue
+                if end_ns is not None and entry["first_ns"] > end_ns:
+                    continue
+                # The open segment's last_ns may lag behind the file; keep it
+                if start_ns is not None and entry.get("closed") and entry["last_ns"] < start_ns:
+                    continue
+                yield day, entry
+
+    def open_segment(self, day, entry):
+        """Return (mmap, memoryview) over the segment's written records"""
+        path = os.path.join(self.journal_dir, day, entry["file"])
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return None, memoryview(b"")
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        count = size // RECORD_SIZE
+        if not entry.get("closed"):
+            # Preallocated tail of the live segment is zero-filled
+            count = self._written_count(mm, count)
+        return mm, memoryview(mm)[:count * RECORD_SIZE]
+
+    @staticmethod
+    def _receive_ns(buf, position):
+        return struct.unpack_from("<q", buf, position * RECORD_SIZE + RECEIVE_NS_OFFSET)[0]
+
+    @classmethod
+    def _written_count(cls, buf, count):
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            if cls._receive_ns(buf, mid) == 0:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    @classmethod
+    def _lower_bound(cls, view, count, ns):
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            if cls._receive_ns(view, mid) < ns:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def iter_views(self, start_ns=None, end_ns=None):
+        """Yield (day, memoryview) slices holding only records inside the time range"""
+        for day, entry in self.segments(start_ns, end_ns):
+            mm, view = self.open_segment(day, entry)
+            count = len(view) // RECORD_SIZE
+            first = self._lower_bound(view, count, start_ns) if start_ns is not None else 0
+            last = self._lower_bound(view, count, end_ns + 1) if end_ns is not None else count
+            if last > first:
+                yield day, view[first * RECORD_SIZE:last * RECORD_SIZE]
+            view.release()
+            if mm is not None:
+                try:
+                    mm.close()
+                except BufferError:
+                    # The caller still holds a slice; the map is released with it
+                    pass
+
+    def iter_records(self, start_ns=None, end_ns=None):
+        """Yield record tuples (see RECORD_FIELDS) inside the time range"""
+        for _, view in self.iter_views(start_ns, end_ns):
+            yield from RECORD.iter_unpack(view)
+            view.release()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Process-wide TickJournal, created on first use"""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = TickJournal()
+                atexit.register(_journal.close)
+    return _journal
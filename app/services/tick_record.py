@@ -0,0 +1,96 @@
+"""
+Compact tick record
+One Tick is built per frame (by the lean decoder, or from a dict at the
+edge of the pipeline) and shared by journaling, logging, conflation,
+candles, forwarding and Socket.IO emits. Dicts and JSON are only
+produced where a tick leaves the worker.
+"""
+import time
+from datetime import datetime
+
+MODE_NAMES = {1: "LTP", 2: "QUOTE", 3: "SNAP_QUOTE"}
+MODE_NUMBERS = {name: number for number, name in MODE_NAMES.items()}
+
+
+class Tick:
+    """token, LTP (paise), cumulative volume, exchange timestamp (ms), mode, exchange type, receive time"""
+
+    __slots__ = ("token", "ltp_paise", "volume", "exchange_timestamp", "mode",
+                 "exchange_type", "received_at", "raw")
+
+    def __init__(self, token, ltp_paise, volume=0, exchange_timestamp=0, mode=1,
+                 exchange_type=1, received_at=None, raw=None):
+        self.token = token
+        self.ltp_paise = ltp_paise
+        self.volume = volume
+        self.exchange_timestamp = exchange_timestamp
+        self.mode = mode
+        self.exchange_type = exchange_type
+        self.received_at = received_at or time.time()
+        self.raw = raw  # original dict when built from a full SmartWebSocketV2 decode
+
+    @property
+    def ltp(self):
+        return self.ltp_paise / 100.0 if self.ltp_paise else 0.0
+
+    @property
+    def mode_name(self):
+        return MODE_NAMES.get(self.mode, "UNKNOWN")
+
+    @classmethod
+    def from_dict(cls, message):
+        """SmartWebSocketV2-shaped dict (or a replayed one) -> Tick"""
+        mode = message.get("subscription_mode")
+        if mode is None:
+            mode = MODE_NUMBERS.get(message.get("subscription_mode_val"), 0)
+        return cls(str(message.get("token", "")), message.get("last_traded_price") or 0,
+                   message.get("volume_trade_for_the_day") or 0, message.get("exchange_timestamp") or 0,
+                   mode, message.get("exchange_type", 1), raw=message)
+
+    def to_dict(self):
+        """Library-shaped dict with the fields this record carries"""
+        if self.raw is not None:
+            return self.raw
+        return {
+            "subscription_mode": self.mode,
+            "subscription_mode_val": self.mode_name,
+            "exchange_type": self.exchange_type,
+            "token": self.token,
+            "exchange_timestamp": self.exchange_timestamp,
+            "last_traded_price": self.ltp_paise,
+            "volume_trade_for_the_day": self.volume
+        }
+
+    def to_payload(self):
+        """Candle-processing payload posted to the backend"""
+        return {
+            "token": self.token,
+            "name": f"Token-{self.token}",
+            "ltp": self.ltp,
+            "volume": int(self.volume),
+            "timestamp": datetime.fromtimestamp(self.received_at).isoformat()
+        }
+
+    def to_client(self):
+        """Socket.IO `tick` event body"""
+        return {
+            "symboltoken": self.token,
+            "ltp": self.ltp,
+            "volume": self.volume,
+            "timestamp": datetime.fromtimestamp(self.received_at).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def __repr__(self):
+        return f"Tick({self.token}, {self.ltp_paise}, vol={self.volume}, mode={self.mode})"
+
+
+def as_tick(message):
+    """Tick passthrough; dicts from the full decoder, replay or tests are converted once"""
+    return message if type(message) is Tick else Tick.from_dict(message)
+
+
+def json_default(obj):
+    """json.dumps default=: Ticks become candle payloads, anything else its str()"""
+    if type(obj) is Tick:
+        return obj.to_payload()
+    return str(obj)
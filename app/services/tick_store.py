@@ -0,0 +1,125 @@
+"""
+Latest-tick store
+Remembers the most recent Tick per token plus a fixed-size ring buffer of
+the last N ticks in flat arrays, so memory stays bounded at
+tokens x TICK_STORE_HISTORY. Fed from handle_tick; served by /api/ltp,
+/api/ticks/<token> and the Socket.IO subscribe snapshot.
+"""
+import threading
+from array import array
+
+from app.config import config
+
+
+def tick_snapshot(tick):
+    """JSON-ready latest tick"""
+    return {
+        "token": tick.token,
+        "ltp": tick.ltp,
+        "ltp_paise": tick.ltp_paise,
+        "volume": tick.volume,
+        "exchange_timestamp": tick.exchange_timestamp,
+        "mode": tick.mode_name,
+        "received_at": tick.received_at
+    }
+
+
+class TokenHistory:
+    """Latest Tick and a ring buffer of (ltp_paise, volume, exchange_ts, received_at) for one token"""
+
+    __slots__ = ("token", "capacity", "latest", "ltps", "volumes", "exchange_timestamps",
+                 "received", "next", "count")
+
+    def __init__(self, token, capacity):
+        self.token = token
+        self.capacity = capacity
+        self.latest = None
+        self.ltps = array("q", bytes(8 * capacity))
+        self.volumes = array("q", bytes(8 * capacity))
+        self.exchange_timestamps = array("q", bytes(8 * capacity))
+        self.received = array("d", bytes(8 * capacity))
+        self.next = 0
+        self.count = 0
+
+    def append(self, tick):
+        i = self.next
+        self.ltps[i] = tick.ltp_paise
+        self.volumes[i] = tick.volume
+        self.exchange_timestamps[i] = tick.exchange_timestamp
+        self.received[i] = tick.received_at
+        self.next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.latest = tick
+
+    def last(self, n):
+        """Up to n most recent ticks, oldest first"""
+        n = max(0, min(n, self.count))
+        start = (self.next - n) % self.capacity
+        rows = []
+        for k in range(n):
+            i = (start + k) % self.capacity
+            rows.append({
+                "ltp": self.ltps[i] / 100.0,
+                "ltp_paise": self.ltps[i],
+                "volume": self.volumes[i],
+                "exchange_timestamp": self.exchange_timestamps[i],
+                "received_at": self.received[i]
+            })
+        return rows
+
+
+class TickStore:
+    """Process-wide token -> TokenHistory map"""
+
+    def __init__(self, history_size=None):
+        self.history_size = max(1, history_size or config.TICK_STORE_HISTORY)
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def record(self, tick):
+        history = self._tokens.get(tick.token)
+        if history is None:
+            with self._lock:
+                history = self._tokens.setdefault(tick.token, TokenHistory(tick.token, self.history_size))
+        # The broker hands the same Tick to every watching manager; store it once
+        if history.latest is not tick:
+            history.append(tick)
+
+    def latest(self, token):
+        """Latest Tick for token, or None"""
+        history = self._tokens.get(str(token))
+        return history.latest if history else None
+
+    def snapshot(self, tokens=None):
+        """{token: latest tick dict or None} for tokens (all tokens when None)"""
+        if tokens is None:
+            tokens = list(self._tokens)
+        result = {}
+        for token in tokens:
+            tick = self.latest(token)
+            result[str(token)] = tick_snapshot(tick) if tick else None
+        return result
+
+    def history(self, token, n=None):
+        history = self._tokens.get(str(token))
+        if history is None:
+            return []
+        return history.last(n or self.history_size)
+
+    def stats(self):
+        return {"tokens": len(self._tokens), "history_size": self.history_size}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_tick_store():
+    """Process-wide TickStore"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TickStore()
+    return _store
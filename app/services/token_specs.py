@@ -0,0 +1,83 @@
+"""
+Token subscription specs
+A subscription entry is either a plain token string (NSE cash, LTP mode)
+or a dict such as {"token": "43650", "exchangeType": "NFO", "mode": "QUOTE"}.
+Specs are normalised to {token: (exchange_type, mode)} so subscription
+changes can be diffed and sent to SmartAPI grouped by mode.
+"""
+
+# SmartWebSocketV2 exchange types
+EXCHANGE_TYPES = {
+    "NSE": 1, "NSE_CM": 1,
+    "NFO": 2, "NSE_FO": 2,
+    "BSE": 3, "BSE_CM": 3,
+    "BFO": 4, "BSE_FO": 4,
+    "MCX": 5, "MCX_FO": 5,
+    "NCX": 7, "NCX_FO": 7,
+    "CDS": 13, "CDE_FO": 13,
+}
+
+# SmartWebSocketV2 feed modes (depth is not supported by the tick pipeline)
+MODES = {"LTP": 1, "QUOTE": 2, "SNAP_QUOTE": 3, "SNAPQUOTE": 3}
+
+DEFAULT_EXCHANGE_TYPE = 1
+DEFAULT_MODE = 1
+
+
+def _lookup(value, names, default, kind):
+    if value is None or value == "":
+        return default
+    if isinstance(value, str) and not value.isdigit():
+        try:
+            return names[value.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown {kind}: {value}")
+    number = int(value)
+    if number not in names.values():
+        raise ValueError(f"Unknown {kind}: {value}")
+    return number
+
+
+def parse_token_specs(tokens, default_exchange_type=DEFAULT_EXCHANGE_TYPE, default_mode=DEFAULT_MODE):
+    """Normalise a list of token strings/dicts to {token: (exchange_type, mode)}; raises ValueError"""
+    specs = {}
+    for entry in tokens or []:
+        if isinstance(entry, dict):
+            token = entry.get("token") or entry.get("symboltoken")
+            if not token:
+                raise ValueError(f"Token spec without token: {entry}")
+            exchange_type = _lookup(entry.get("exchangeType", entry.get("exchange")),
+                                    EXCHANGE_TYPES, default_exchange_type, "exchangeType")
+            mode = _lookup(entry.get("mode"), MODES, default_mode, "mode")
+        else:
+            token, exchange_type, mode = entry, default_exchange_type, default_mode
+        token = str(token)
+        if specs.get(token, (exchange_type, mode)) != (exchange_type, mode):
+            # Ticks are routed by token alone, so one token can only be subscribed under one spec
+            raise ValueError(f"Token {token} listed more than once with different exchangeType/mode")
+        specs[token] = (exchange_type, mode)
+    return specs
+
+
+def group_by_mode(specs):
+    """{token: (exchange_type, mode)} -> {mode: [{"exchangeType": ..., "tokens": [...]}, ...]}"""
+    grouped = {}
+    for token, (exchange_type, mode) in specs.items():
+        grouped.setdefault(mode, {}).setdefault(exchange_type, []).append(token)
+    return {
+        mode: [{"exchangeType": exchange_type, "tokens": sorted(tokens)}
+               for exchange_type, tokens in sorted(by_exchange.items())]
+        for mode, by_exchange in sorted(grouped.items())
+    }
+
+
+def specs_from_token_list(mode, token_list):
+    """Inverse of one group_by_mode entry: SmartAPI token_list for a mode -> specs"""
+    return {str(token): (entry["exchangeType"], mode) for entry in token_list for token in entry["tokens"]}
+
+
+def diff_specs(old, new):
+    """Returns (to_unsubscribe, to_subscribe); a token whose spec changed appears in both"""
+    to_unsubscribe = {t: s for t, s in old.items() if new.get(t) != s}
+    to_subscribe = {t: s for t, s in new.items() if old.get(t) != s}
+    return to_unsubscribe, to_subscribe
@@ -1,6 +1,13 @@
 import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
 import eventlet
+from app.config import config
 from app.logger import get_logger
+from app.services.candle_cache import CandleCache, cache_lock
+from app.services.session_manager import AngelOneSessionManager
 from app.services.websocket_manager import SmartApiWebSocketManager, _running_websockets
 
 logger = get_logger(os.getenv("ENV", "development"))
@@ -17,3 +24,140 @@ def stop_tracking(websocket_id):
     manager = _running_websockets.pop(websocket_id, None)
     if manager:
         manager.stop()
+
+
+IST = timezone(timedelta(hours=5, minutes=30))
+API_DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# interval_min -> SmartAPI interval name, and the longest range one getCandleData call may span (days)
+INTERVALS = {
+    1: ("ONE_MINUTE", 30),
+    3: ("THREE_MINUTE", 60),
+    5: ("FIVE_MINUTE", 100),
+    10: ("TEN_MINUTE", 100),
+    15: ("FIFTEEN_MINUTE", 200),
+    30: ("THIRTY_MINUTE", 200),
+    60: ("ONE_HOUR", 400),
+    1440: ("ONE_DAY", 2000),
+}
+
+# SmartWebSocketV2 exchange type -> historical API exchange
+EXCHANGES = {1: "NSE", 2: "NFO", 3: "BSE", 4: "BFO", 5: "MCX", 7: "NCDEX", 13: "CDS"}
+
+_last_request_at = 0.0
+_request_lock = threading.Lock()
+
+
+def _throttle():
+    """Space getCandleData calls HISTORICAL_REQUEST_GAP_MS apart across the process"""
+    global _last_request_at
+    with _request_lock:
+        wait = _last_request_at + config.HISTORICAL_REQUEST_GAP_MS / 1000.0 - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_at = time.time()
+
+
+def _to_epoch(value):
+    """"YYYY-MM-DD HH:MM" / "YYYY-MM-DD" / datetime (naive = IST) -> epoch seconds"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, API_DATE_FORMAT if " " in value else "%Y-%m-%d")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=IST)
+    return int(value.timestamp())
+
+
+def _to_end_epoch(value):
+    """Exclusive end for an inclusive todate: the whole day for "YYYY-MM-DD", else through that minute"""
+    if isinstance(value, str) and " " not in value:
+        return _to_epoch(value) + 86400
+    return _to_epoch(value) + 60
+
+
+def _to_api_date(epoch):
+    return datetime.fromtimestamp(epoch, IST).strftime(API_DATE_FORMAT)
+
+
+class RealTimeCandleTracker:
+    """Historical candles for one token/interval from SmartAPI, cached on disk"""
+
+    def __init__(self, symboltoken, exchangeType, interval_min, smart_api=None):
+        if int(interval_min) not in INTERVALS:
+            raise ValueError(f"Unsupported interval_min {interval_min}, expected one of {sorted(INTERVALS)}")
+        self.symboltoken = str(symboltoken)
+        self.exchange = EXCHANGES.get(int(exchangeType), str(exchangeType))
+        self.interval_min = int(interval_min)
+        self.interval, self.max_days = INTERVALS[self.interval_min]
+        self.smart_api = smart_api
+        self.cache_path = os.path.join(config.CANDLE_CACHE_DIR,
+                                       f"{self.exchange}_{self.symboltoken}_{self.interval}.bin")
+
+    def fetch_historical_candles(self, from_date, to_date):
+        """[timestamp, open, high, low, close, volume] rows from from_date to to_date (inclusive)"""
+        start = _to_epoch(from_date)
+        end = _to_end_epoch(to_date)
+        with cache_lock(self.cache_path):
+            try:
+                cache = CandleCache(self.cache_path)
+            except ValueError as e:
+                # A truncated/corrupt file is only a cache: drop it and refetch
+                logger.warning(f"⚠️ Discarding unreadable candle cache: {e}")
+                os.remove(self.cache_path)
+                cache = CandleCache(self.cache_path)
+            gaps = cache.missing(start, end)
+            if gaps:
+                fetched = self._fetch_gaps(cache, gaps)
+                if fetched:
+                    cache.save()
+                logger.info(f"🕯️ Historical candles {self.exchange}:{self.symboltoken} {self.interval} | "
+                            f"Gaps fetched: {fetched}/{len(gaps)} | Cached candles: {len(cache)}")
+            else:
+                logger.debug(f"🕯️ Historical candles {self.exchange}:{self.symboltoken} {self.interval} served from cache")
+            rows = cache.rows(start, end)
+        return [[datetime.fromtimestamp(ts, IST).isoformat(), o, h, l, c, v] for ts, o, h, l, c, v in rows]
+
+    def _fetch_gaps(self, cache, gaps):
+        """Fetch each gap in max_days chunks; returns how many gaps were fully fetched"""
+        # The candle still forming (and anything later) must be fetched again next time
+        settled = int(time.time()) - self.interval_min * 60
+        fetched = 0
+        for gap_start, gap_end in gaps:
+            chunk_start = gap_start
+            while chunk_start < gap_end:
+                chunk_end = min(gap_end, chunk_start + self.max_days * 86400)
+                rows = self._request(chunk_start, chunk_end)
+                if rows is None:
+                    break
+                cache.add(rows, (chunk_start, min(chunk_end, settled)) if chunk_start < settled else None)
+                chunk_start = chunk_end
+            else:
+                fetched += 1
+        return fetched
+
+    def _request(self, start, end):
+        """One getCandleData call for [start, end); (ts, o, h, l, c, v) rows, or None on failure"""
+        params = {
+            "exchange": self.exchange,
+            "symboltoken": self.symboltoken,
+            "interval": self.interval,
+            "fromdate": _to_api_date(start),
+            "todate": _to_api_date(end - 60)
+        }
+        try:
+            if self.smart_api is None:
+                self.smart_api = AngelOneSessionManager.get_session()["smart_api"]
+            _throttle()
+            response = self.smart_api.getCandleData(params)
+        except Exception as e:
+            logger.error(f"❌ getCandleData failed | {params} | Error: {e}")
+            return None
+        if not response or not response.get("status"):
+            logger.error(f"❌ getCandleData failed | {params} | Response: {response}")
+            return None
+        rows = []
+        for timestamp, o, h, l, c, v in response.get("data") or []:
+            ts = int(datetime.fromisoformat(timestamp).timestamp())
+            if start <= ts < end:
+                rows.append((ts, float(o), float(h), float(l), float(c), int(v)))
+        rows.sort()
+        return rows
@@ -1,12 +1,22 @@
 import eventlet
 import os
-import pyotp
-from SmartApi import SmartConnect
-from SmartApi.smartWebSocketV2 import SmartWebSocketV2
 from app.logger import get_logger
 from app.config import config
+from app.services.feed_connection import FeedConnection
+from app.services.tick_forwarder import TickForwarder
+from app.services.candle_engine import CandleEngine
+from app.services.conflation import TickConflator
+from app.services.tick_journal import get_journal
+from app.services.metrics import metrics_registry
+from app.services.subscription_broker import BrokeredSocket, get_broker
+from app.services.tick_record import as_tick
+from app.services.tick_store import get_tick_store
+from app.services.token_specs import diff_specs, group_by_mode, parse_token_specs
+from app.services.session_manager import session_pool
+from app.services.status_feed import status_feed
 import threading
 import json
+import logging
 from datetime import datetime
 
 logger = get_logger(os.getenv("ENV", "development"))
@@ -17,122 +27,220 @@ tick_analysis_logger = get_logger("tick_analysis")
 # Global registry for running websockets
 _running_websockets = {}
 
-# Session statistics
-session_stats = {
-    'start_time': datetime.now(),
-    'total_ticks': 0,
-    'successful_forwards': 0,
-    'failed_forwards': 0,
-    'unique_tokens': set(),
-    'total_volume': 0,
-    'price_range': {'min': float('inf'), 'max': 0}
-}
+class _TickLogEntry:
+    """TICK_DATA record whose JSON is only built when the log record is formatted"""
+    __slots__ = ('session_id', 'tick_count', 'tick', 'include_raw')
+
+    def __init__(self, session_id, tick_count, tick, include_raw=False):
+        self.session_id = session_id
+        self.tick_count = tick_count
+        self.tick = tick
+        self.include_raw = include_raw
+
+    def __str__(self):
+        tick = self.tick
+        log_entry = {
+            'session_id': self.session_id,
+            'tick_count': self.tick_count,
+            'timestamp': datetime.fromtimestamp(tick.received_at).isoformat(),
+            'token': tick.token,
+            'ltp_paise': tick.ltp_paise,
+            'ltp_rupees': round(tick.ltp, 2),
+            'volume': tick.volume,
+            'exchange_timestamp': tick.exchange_timestamp,
+            'subscription_mode': tick.mode_name
+        }
+        if self.include_raw:
+            log_entry['raw_tick'] = tick.to_dict()
+        return json.dumps(log_entry, default=str)
 
 class SmartApiWebSocketManager:
+    # Forwarder implementation; the asyncio runtime swaps in its own
+    forwarder_class = TickForwarder
+
     def __init__(self, websocket_id, credentials, tokens, backend_url=None):
         self.websocket_id = websocket_id
-        self.tokens = tokens  # list of up to 50
+        # Token strings or {"token", "exchangeType", "mode"} dicts -> {token: (exchange_type, mode)}
+        self.token_specs = parse_token_specs(tokens)
+        self.tokens = list(self.token_specs)  # list of up to 50
         self.credentials = credentials  # dict: api_key, client_code, password, totp_secret
         self.backend_url = backend_url or config.BACKEND_WEBHOOK_URL
         self.ws = None
         self._should_run = True
         self._ws_closed = False
         self._last_auth = None
+        self.state = None  # last state published to the status feed
+        self._tick_log_counter = 0
+        self.log_tick_data = True  # TICK_DATA file records; off for replay managers
+        self.metrics = metrics_registry.connection(websocket_id)
+        self.journal = get_journal() if config.JOURNAL_ENABLED else None
+        self.tick_store = get_tick_store() if config.TICK_STORE_ENABLED else None
+        if config.CANDLE_ENGINE_ENABLED:
+            self.candle_engine = CandleEngine()
+            self.forwarder = self.forwarder_class(websocket_id, url=config.get_backend_bar_url(),
+                                                  on_result=self._on_forward_result,
+                                                  pull=self.candle_engine.pending_updates)
+        else:
+            self.candle_engine = None
+            self.forwarder = self.forwarder_class(websocket_id, on_result=self._on_forward_result)
+        self.metrics.gauges["forward_queue_depth"] = self.forwarder.depth
+        self.metrics.counters["forward_queue_dropped"] = lambda: self.forwarder.dropped
+        self.metrics.counters["forward_queue_conflated"] = lambda: self.forwarder.conflated
+        if config.CONFLATION_ENABLED:
+            self.conflator = TickConflator(self.forward_tick_to_backend, name=f"conflator-{websocket_id}")
+        else:
+            self.conflator = None
 
-    def start(self):
-        # Use credentials from request, not .env
-        api_key = self.credentials["api_key"]
-        client_code = self.credentials["client_code"]
-        password = self.credentials["password"]
-        totp_secret = self.credentials["totp_secret"]
-        
-        # Generate TOTP
-        totp = pyotp.TOTP(totp_secret).now()
-        smart_api = SmartConnect(api_key)
-        session = smart_api.generateSession(client_code, password, totp)
-        if not session["status"]:
-            logger.error(f"Login failed for websocket_id={self.websocket_id}")
+    def login(self):
+        """Auth for the request credentials from the shared session pool; returns the auth dict or None"""
+        try:
+            self._last_auth = session_pool.get(self.credentials)
+        except Exception as e:
+            logger.error(f"Login failed for websocket_id={self.websocket_id}: {e}")
             self._last_auth = None
-            return None
-            
-        jwt_token = session["data"]["jwtToken"]
-        feed_token = smart_api.getfeedToken()
-        self._last_auth = {
-            "jwt_token": jwt_token,
-            "feed_token": feed_token,
-            "api_key": api_key,
-            "client_code": client_code
-        }
-        
-        ws = SmartWebSocketV2(jwt_token, api_key, client_code, feed_token)
-        self.ws = ws
-        token_list = [{"exchangeType": 1, "tokens": self.tokens}]
-        correlation_id = f"ws_{self.websocket_id}"
+        self._set_state("authenticated" if self._last_auth else "auth_failed")
+        return self._last_auth
 
-        def on_open(wsapp):
-            logger.info(f"WebSocket connected for {self.websocket_id}")
-            ws.subscribe(correlation_id, 1, token_list)
+    def _set_state(self, state, **fields):
+        """Publish a state transition (and any changed fields) to the versioned status feed"""
+        if not self._should_run:
+            return  # stopped; the record is already gone
+        if state == "authenticated" and self.state == "connected":
+            return  # re-logins for reconnects or the standby do not downgrade a live feed
+        self.state = state
+        status_feed.update(self.websocket_id, state=state, **fields)
 
-        def on_data(wsapp, message):
-            # Log tick to both console and file with detailed analysis
-            self.log_tick_analysis(message)
-            self.forward_tick_to_backend(message)
+    def start(self):
+        self._set_state("connecting", tokens=list(self.tokens), tokens_count=len(self.tokens),
+                        backend_url=self.backend_url)
+        if config.BROKER_ENABLED:
+            # Upstream connections are shared and owned by the subscription broker
+            if get_broker().register(self):
+                self._set_state("connected")
+                tick_analysis_logger.info(f"🚀 SESSION START - WebSocket {self.websocket_id} | Tokens: {len(self.tokens)} | Brokered | Time: {datetime.now().isoformat()}")
+            return None
 
-        ws.on_open = on_open
-        ws.on_data = on_data
-        ws.on_error = lambda wsapp, error: logger.error(f"WebSocket error: {error}")
-        ws.on_close = lambda wsapp: logger.info(f"WebSocket closed for {self.websocket_id}")
+        # Reconnects, resubscription and the optional hot standby live in FeedConnection
+        feed = FeedConnection(self.websocket_id, self._auth, lambda: self.token_specs,
+                              self.handle_tick, correlation_id=self.correlation_id, on_state=self._set_state)
+        self.ws = feed
+        if not feed.start():
+            self.ws = None
+            return None
 
         logger.info(f"Starting SmartAPI websocket for {self.websocket_id} with {len(self.tokens)} tokens")
         
         # Log session start
         tick_analysis_logger.info(f"🚀 SESSION START - WebSocket {self.websocket_id} | Tokens: {len(self.tokens)} | Time: {datetime.now().isoformat()}")
-        
-        ws.connect()
+
+    def _auth(self, refresh=False):
+        """Auth provider for FeedConnection; refresh=True drops the pooled session first"""
+        if refresh:
+            session_pool.invalidate(self.credentials["client_code"])
+        return self.login()
+
+    def is_connected(self):
+        return self.ws is not None and not self._ws_closed and getattr(self.ws, "connected", True)
+
+    def feed_status(self):
+        """Reconnect/failover counters and recent incidents (None in broker mode)"""
+        return self.ws.status() if isinstance(self.ws, FeedConnection) else None
+
+    @property
+    def correlation_id(self):
+        return f"ws_{self.websocket_id}"
+
+    def update_subscriptions(self, tokens):
+        """Move to a new token set by subscribing only what was added and unsubscribing what was removed
+
+        A token whose exchange type or mode changed is unsubscribed under its
+        old spec and subscribed under the new one. Returns the diff; in broker
+        mode tokens the broker had no capacity for are listed as rejected.
+        """
+        old_specs = self.token_specs
+        new_specs = parse_token_specs(tokens)
+        rejected = set()
+        ws = self.ws
+        if isinstance(ws, BrokeredSocket):
+            # The broker applies the change itself and leaves out tokens it could not place
+            rejected = ws.broker.set_tokens(self.websocket_id, new_specs)
+            new_specs = dict(self.token_specs)
+            to_unsubscribe, to_subscribe = diff_specs(old_specs, new_specs)
+        else:
+            to_unsubscribe, to_subscribe = diff_specs(old_specs, new_specs)
+            if ws is not None:
+                for mode, token_list in group_by_mode(to_unsubscribe).items():
+                    ws.unsubscribe(self.correlation_id, mode, token_list)
+                for mode, token_list in group_by_mode(to_subscribe).items():
+                    ws.subscribe(self.correlation_id, mode, token_list)
+        self.token_specs = new_specs
+        self.tokens = list(new_specs)
+        if self.state is not None:
+            status_feed.update(self.websocket_id, tokens=list(self.tokens), tokens_count=len(self.tokens))
+
+        removed = [token for token in to_unsubscribe if token not in new_specs]
+        if removed:
+            if self.conflator:
+                self.conflator.forget(removed)
+            self.metrics.forget_tokens(removed)
+        added = [token for token in to_subscribe if token not in to_unsubscribe]
+        changed = [token for token in to_subscribe if token in to_unsubscribe]
+        logger.info(f"🔁 Subscriptions for {self.websocket_id}: +{len(added)} -{len(removed)} ~{len(changed)}"
+                    + (f" | {len(rejected)} rejected" if rejected else ""))
+        return {"added": sorted(added), "removed": sorted(removed), "changed": sorted(changed),
+                "rejected": sorted(rejected)}
+
+    def handle_tick(self, message, forward=True):
+        """Per-tick pipeline behind on_data: tick store, journal, analysis logging, conflation, forwarding
+
+        message is a Tick (dicts from replay or the full decoder are
+        converted once here). forward=False is used by the subscription
+        broker when another manager already forwards this token to the
+        same backend target.
+        """
+        tick = as_tick(message)
+        if self.tick_store:
+            self.tick_store.record(tick)
+        if forward and self.journal:
+            self.journal.append(self.websocket_id, tick)
+        # Log tick to both console and file with detailed analysis
+        self.log_tick_analysis(tick)
+        if not forward:
+            return
+        if self.conflator:
+            self.conflator.offer(tick)
+        else:
+            self.forward_tick_to_backend(tick)
 
     def log_tick_analysis(self, tick):
         """Enhanced tick logging for analysis"""
         try:
-            global session_stats
-            session_stats['total_ticks'] += 1
-            
-            # Extract tick data
-            token = str(tick.get('token', 'UNKNOWN'))
-            ltp_paise = tick.get('last_traded_price', 0)
-            ltp_rupees = ltp_paise / 100.0 if ltp_paise else 0.0
-            volume = tick.get('volume_trade_for_the_day', 0)
-            exchange_timestamp = tick.get('exchange_timestamp', 0)
-            subscription_mode = tick.get('subscription_mode_val', 'UNKNOWN')
-            
-            # Update session stats
-            session_stats['unique_tokens'].add(token)
-            session_stats['total_volume'] += volume
-            if ltp_rupees > 0:
-                session_stats['price_range']['min'] = min(session_stats['price_range']['min'], ltp_rupees)
-                session_stats['price_range']['max'] = max(session_stats['price_range']['max'], ltp_rupees)
+            token = tick.token
+            ltp_rupees = tick.ltp
+            volume = tick.volume
             
-            # Create detailed log entry
-            log_entry = {
-                'session_id': self.websocket_id,
-                'tick_count': session_stats['total_ticks'],
-                'timestamp': datetime.now().isoformat(),
-                'token': token,
-                'ltp_paise': ltp_paise,
-                'ltp_rupees': round(ltp_rupees, 2),
-                'volume': volume,
-                'exchange_timestamp': exchange_timestamp,
-                'subscription_mode': subscription_mode,
-                'raw_tick': tick
-            }
+            # Update per-connection metrics
+            metrics = self.metrics
+            metrics.record_tick(token, ltp_rupees, volume, tick.exchange_timestamp)
             
-            # Console log (simplified)
-            logger.info(f"📊 TICK #{session_stats['total_ticks']:>6} | Token: {token:>5} | LTP: ₹{ltp_rupees:>8.2f} | Vol: {volume:>8} | {subscription_mode}")
+            # Sampling: per-token allow list and/or 1-in-N ticks
+            self._tick_log_counter += 1
+            sampled = (self._tick_log_counter % config.TICK_LOG_SAMPLE_EVERY == 0
+                       and (not config.TICK_LOG_TOKENS or token in config.TICK_LOG_TOKENS))
             
-            # File log (detailed JSON)
-            tick_analysis_logger.info(f"TICK_DATA: {json.dumps(log_entry, default=str)}")
+            if sampled:
+                # Console log (simplified); %-args so nothing is formatted unless the level is enabled
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("📊 TICK #%6d | Token: %5s | LTP: ₹%8.2f | Vol: %8s | %s",
+                                metrics.ticks_in, token, ltp_rupees, volume, tick.mode_name)
+                
+                # File log (detailed JSON, serialized by whichever thread formats the record)
+                if self.log_tick_data and tick_analysis_logger.isEnabledFor(logging.INFO):
+                    tick_analysis_logger.info("TICK_DATA: %s", _TickLogEntry(
+                        self.websocket_id, metrics.ticks_in, tick, config.TICK_LOG_RAW))
             
             # Every 100 ticks, log session summary
-            if session_stats['total_ticks'] % 100 == 0:
+            if metrics.ticks_in % 100 == 0:
                 self.log_session_summary()
                 
         except Exception as e:
@@ -141,21 +249,7 @@ class SmartApiWebSocketManager:
     def log_session_summary(self):
         """Log session statistics summary"""
         try:
-            global session_stats
-            duration = datetime.now() - session_stats['start_time']
-            
-            summary = {
-                'session_id': self.websocket_id,
-                'duration_seconds': duration.total_seconds(),
-                'total_ticks': session_stats['total_ticks'],
-                'unique_tokens': len(session_stats['unique_tokens']),
-                'total_volume': session_stats['total_volume'],
-                'successful_forwards': session_stats['successful_forwards'],
-                'failed_forwards': session_stats['failed_forwards'],
-                'success_rate': round((session_stats['successful_forwards'] / max(1, session_stats['total_ticks'])) * 100, 2),
-                'ticks_per_second': round(session_stats['total_ticks'] / max(1, duration.total_seconds()), 2),
-                'price_range': session_stats['price_range'] if session_stats['price_range']['min'] != float('inf') else None
-            }
+            summary = self.metrics.summary()
             
             logger.info(f"📈 SESSION SUMMARY: Ticks: {summary['total_ticks']} | Tokens: {summary['unique_tokens']} | Success: {summary['success_rate']}% | TPS: {summary['ticks_per_second']}")
             tick_analysis_logger.info(f"SESSION_SUMMARY: {json.dumps(summary, default=str)}")
@@ -164,56 +258,25 @@ class SmartApiWebSocketManager:
             logger.error(f"Error in session summary logging: {e}")
 
     def forward_tick_to_backend(self, tick):
-        import requests
-        from datetime import datetime
-        
-        global session_stats
-        
-        # Only send to candle processing endpoint (no duplicate calls)
-        backend_candle_url = config.get_backend_candle_url()
-        
-        # Transform tick data for candle processing
-        candle_payload = self.transform_tick_for_candle(tick)
-        if candle_payload:
-            try:
-                start_time = datetime.now()
-                candle_response = requests.post(backend_candle_url, json=candle_payload, timeout=2)
-                response_time = (datetime.now() - start_time).total_seconds() * 1000  # ms
-                
-                if candle_response.status_code not in [200, 201]:
-                    session_stats['failed_forwards'] += 1
-                    logger.warning(f"❌ Backend candle processing failed | Status: {candle_response.status_code} | Token: {candle_payload.get('token')} | Response: {candle_response.text}")
-                    tick_analysis_logger.warning(f"FORWARD_FAILED: Token={candle_payload.get('token')}, Status={candle_response.status_code}, Response={candle_response.text}")
-                else:
-                    session_stats['successful_forwards'] += 1
-                    logger.debug(f"✅ Tick forwarded successfully | Token: {candle_payload.get('token')} | LTP: ₹{candle_payload.get('ltp')} | Response time: {response_time:.1f}ms")
-                    tick_analysis_logger.debug(f"FORWARD_SUCCESS: Token={candle_payload.get('token')}, LTP={candle_payload.get('ltp')}, ResponseTime={response_time:.1f}ms")
-                    
-            except Exception as e:
-                session_stats['failed_forwards'] += 1
-                logger.error(f"❌ Failed to forward tick to backend | Token: {candle_payload.get('token', 'UNKNOWN')} | Error: {e}")
-                tick_analysis_logger.error(f"FORWARD_ERROR: Token={candle_payload.get('token', 'UNKNOWN')}, Error={str(e)}")
+        """Queue the tick for the batched forwarder; never blocks on the backend
+
+        The Tick itself is queued; it becomes a candle payload only when its
+        batch is serialized for the POST.
+        """
+        if self.candle_engine:
+            # Only bar updates and closes leave the worker
+            for event in self.candle_engine.on_tick(tick):
+                self.forwarder.enqueue(event)
         else:
-            logger.warning(f"⚠️ Failed to transform tick data for token: {tick.get('token', 'UNKNOWN')}")
-            tick_analysis_logger.warning(f"TRANSFORM_FAILED: {json.dumps(tick, default=str)}")
+            self.forwarder.enqueue(tick)
+
+    def _on_forward_result(self, ok, batch, response_time_ms, nbytes):
+        self.metrics.record_forward(ok, batch, response_time_ms, nbytes)
     
     def transform_tick_for_candle(self, tick):
         """Transform SmartAPI tick data to candle processing format"""
         try:
-            from datetime import datetime
-            
-            # SmartAPI tick format to candle format transformation
-            # Extract LTP from last_traded_price and convert paise to rupees
-            ltp_paise = tick.get("last_traded_price", 0)
-            ltp_rupees = ltp_paise / 100.0 if ltp_paise else 0.0
-            
-            return {
-                "token": str(tick.get("token", "")),
-                "name": tick.get("tradingsymbol", "") or tick.get("symbol", "") or f"Token-{tick.get('token', 'unknown')}",
-                "ltp": ltp_rupees,  # Convert paise to rupees
-                "volume": int(tick.get("volume_trade_for_the_day", 0)),
-                "timestamp": datetime.now().isoformat()
-            }
+            return as_tick(tick).to_payload()
         except Exception as e:
             logger.error(f"Failed to transform tick for candle processing: {e}")
             logger.error(f"Tick data: {tick}")
@@ -221,6 +284,12 @@ class SmartApiWebSocketManager:
 
     def stop(self):
         self._should_run = False
+        if self.conflator:
+            self.conflator.stop()
+        if self.candle_engine:
+            for event in self.candle_engine.flush():
+                self.forwarder.enqueue(event)
+        self.forwarder.stop()
         if self.ws:
             try:
                 self.ws.close()
@@ -228,15 +297,34 @@ class SmartApiWebSocketManager:
                 pass
             self.ws = None
         self._ws_closed = True
+        metrics_registry.remove(self.websocket_id)
+        status_feed.remove(self.websocket_id)
         logger.info(f"Stopped SmartAPI websocket for {self.websocket_id}")
 
     def get_last_auth(self):
         return getattr(self, '_last_auth', None)
 
+    def describe(self):
+        """Per-connection status entry shared by /status and /connection-status"""
+        auth = self.get_last_auth()
+        is_connected = self.is_connected()
+        return {
+            "tokens": self.tokens,
+            "tokens_count": len(self.tokens) if self.tokens else 0,
+            "token_specs": {token: {"exchangeType": et, "mode": mode} for token, (et, mode) in self.token_specs.items()},
+            "active": is_connected,
+            "authenticated": bool(auth),
+            "status": "connected" if (auth and is_connected) else "connecting",
+            "backend_url": self.backend_url,
+            "conflation": self.conflator.stats() if self.conflator else None,
+            "forwarding": self.forwarder.stats(),
+            "feed": self.feed_status()
+        }
+
 # Optionally, add a function to get status for all running websockets
 
 def get_websocket_status():
     return {ws_id: {
         "tokens": ws.tokens,
-        "active": ws.ws is not None and not ws._ws_closed
+        "active": ws.is_connected()
     } for ws_id, ws in _running_websockets.items()}
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+In-process micro-benchmarks for the per-tick hot path.
+
+Times each stage a live tick goes through, using realistic SmartAPI tick
+dicts (LTP, Quote and SnapQuote shapes):
+  - decode_frame               (SmartWebSocketV2 parser vs lean decode_tick vs decode_batch)
+  - transform_tick_for_candle
+  - log_tick_analysis          (with the current logging env; console output is discarded)
+  - forward_tick_to_backend    (enqueue cost, plus batched drain against a local stub backend)
+  - handle_tick_allocations    (tracemalloc bytes and blocks still held per tick after the full pipeline)
+  - emit_tick_to_clients       (10 / 100 / 1000 subscribed sids; socketio.emit is counted, not sent)
+
+Reports ops/s and p50/p99 per stage and can save/compare JSON results so
+hot-path regressions show up before production.
+
+Usage:
+    python bench_hot_path.py
+    python bench_hot_path.py --iterations 50000 --json bench.json
+    python bench_hot_path.py --compare bench.json --threshold 20
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKENS = [str(t) for t in (3045, 2885, 1594, 11536, 4963, 14366, 1333, 26000, 26009, 26017)]
+
+
+def make_tick(mode, token, sequence):
+    """SmartAPI-shaped tick dict as produced by SmartWebSocketV2._parse_binary_data"""
+    ltp = 150000 + random.randint(-5000, 5000)
+    tick = {
+        "subscription_mode": mode,
+        "exchange_type": 1,
+        "token": token,
+        "sequence_number": sequence,
+        "exchange_timestamp": int(time.time() * 1000),
+        "last_traded_price": ltp,
+        "subscription_mode_val": {1: "LTP", 2: "QUOTE", 3: "SNAP_QUOTE"}[mode],
+    }
+    if mode in (2, 3):
+        tick.update({
+            "last_traded_quantity": random.randint(1, 500),
+            "average_traded_price": ltp - 120,
+            "volume_trade_for_the_day": 1_000_000 + sequence * 7,
+            "total_buy_quantity": 125000.0,
+            "total_sell_quantity": 98000.0,
+            "open_price_of_the_day": ltp - 900,
+            "high_price_of_the_day": ltp + 1200,
+            "low_price_of_the_day": ltp - 1500,
+            "closed_price": ltp - 300,
+        })
+    if mode == 3:
+        tick.update({
+            "last_traded_timestamp": int(time.time()),
+            "open_interest": 0,
+            "open_interest_change_percentage": 0,
+            "upper_circuit_limit": ltp + 15000,
+            "lower_circuit_limit": ltp - 15000,
+            "52_week_high_price": ltp + 40000,
+            "52_week_low_price": ltp - 40000,
+            "best_5_buy_data": [{"flag": 1, "quantity": 10, "price": ltp - i, "no of orders": 2} for i in range(5)],
+            "best_5_sell_data": [{"flag": 0, "quantity": 10, "price": ltp + i, "no of orders": 2} for i in range(5)],
+        })
+    return tick
+
+
+def make_ticks(count):
+    modes = (1, 2, 2, 3)  # Quote-heavy mix
+    return [make_tick(modes[i % len(modes)], TOKENS[i % len(TOKENS)], i) for i in range(count)]
+
+
+def timed(fn, args_list):
+    """Run fn over args_list; returns per-op durations in ns and total seconds"""
+    durations = [0] * len(args_list)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, args in enumerate(args_list):
+        t0 = clock()
+        fn(*args)
+        durations[i] = clock() - t0
+    total = (clock() - start) / 1e9
+    return durations, total
+
+
+def summarize(durations, total):
+    ordered = sorted(durations)
+    n = len(ordered)
+    return {
+        "ops": n,
+        "ops_per_sec": round(n / max(total, 1e-12), 1),
+        "p50_us": round(ordered[n // 2] / 1000, 3),
+        "p99_us": round(ordered[min(n - 1, int(n * 0.99))] / 1000, 3),
+        "max_us": round(ordered[-1] / 1000, 3),
+    }
+
+
+class _StubBackend(BaseHTTPRequestHandler):
+    received = 0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+            _StubBackend.received += len(payload) if isinstance(payload, list) else 1
+        except ValueError:
+            pass
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def redirect_log_output():
+    """Point console and log file handlers at /dev/null; returns a callable that restores them
+
+    Records are still formatted and written, so logging cost stays in the
+    measurement, but bench ticks never reach logs/tick_analysis_*.log where
+    analyze_ticks.py and replay_ticks.py would read them as real data.
+    """
+    from app import logger as app_logger
+
+    devnull = open(os.devnull, "w")
+    handlers = [h for name in ("tick_analysis", os.getenv("ENV", "development"))
+                for h in logging.getLogger(name).handlers]
+    for listener in app_logger._listeners:
+        handlers.extend(listener.handlers)
+    originals = [(handler, handler.setStream(devnull)) for handler in handlers
+                 if isinstance(handler, logging.StreamHandler)]
+
+    def restore():
+        for handler, stream in originals:
+            handler.setStream(stream)  # None makes a delayed FileHandler reopen its file
+        devnull.close()
+    return restore
+
+
+def run(iterations, sid_counts):
+    server = start_stub_backend()
+    backend = f"http://127.0.0.1:{server.server_port}"
+    os.environ["BACKEND_BASE_URL"] = backend
+
+    from app.config import config
+    config.BACKEND_BASE_URL = backend
+
+    import socket_server
+    from app.services.metrics import metrics_registry
+    from app.services.websocket_manager import SmartApiWebSocketManager
+
+    restore_logs = redirect_log_output()
+    ticks = make_ticks(iterations)
+    args = [(tick,) for tick in ticks]
+    results = {}
+
+    # Decode: the same binary frames through the library parser and the lean decoder
+    from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+    from app.services.tick_decoder import TickBatch, decode_batch, decode_tick, encode_frame
+
+    frames = [(encode_frame(tick),) for tick in ticks]
+    parser = SmartWebSocketV2.__new__(SmartWebSocketV2)
+    results["decode_frame[library]"] = summarize(*timed(parser._parse_binary_data, frames))
+    results["decode_frame[lean]"] = summarize(*timed(decode_tick, frames))
+    burst = 256
+    batch = TickBatch(burst)
+    bursts = [([frame for (frame,) in frames[i:i + burst]], batch) for i in range(0, len(frames), burst)]
+    durations, total = timed(decode_batch, bursts)
+    stats = summarize([d // burst for d in durations], total)
+    stats["ops_per_sec"] = round(len(frames) / max(total, 1e-12), 1)
+    results[f"decode_frame[batch_{burst}]"] = stats
+
+    # The pipeline stages take the Tick records the decoder produces
+    records = [(decode_tick(frame),) for (frame,) in frames]
+
+    manager = SmartApiWebSocketManager("bench", credentials={}, tokens=TOKENS)
+    results["transform_tick_for_candle"] = summarize(*timed(manager.transform_tick_for_candle, records))
+    results["log_tick_analysis"] = summarize(*timed(manager.log_tick_analysis, records))
+
+    _StubBackend.received = 0
+    results["forward_tick_to_backend"] = summarize(*timed(manager.forward_tick_to_backend, records))
+    drain_start = time.perf_counter()
+    manager.stop()
+    drain = time.perf_counter() - drain_start
+    results["forward_drain"] = {
+        "ticks_delivered": _StubBackend.received,
+        "batches_sent": manager.forwarder.batches_sent,
+        "drain_seconds": round(drain, 3),
+    }
+
+    # Allocations: decode + handle_tick with the forwarder queue holding the results
+    alloc_manager = SmartApiWebSocketManager("bench-alloc", credentials={}, tokens=TOKENS)
+    alloc_manager.forwarder.start = lambda: None  # keep everything queued so it is counted
+    alloc_frames = [frame for (frame,) in frames[:5000]]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for frame in alloc_frames:
+        alloc_manager.handle_tick(decode_tick(frame))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = [stat for stat in after.compare_to(before, "filename") if stat.size_diff > 0]
+    results["handle_tick_allocations"] = {
+        "ticks": len(alloc_frames),
+        "bytes_per_tick": round(sum(stat.size_diff for stat in held) / len(alloc_frames), 1),
+        "blocks_per_tick": round(sum(stat.count_diff for stat in held) / len(alloc_frames), 2),
+    }
+    alloc_manager.forwarder._queue.clear()
+    metrics_registry.remove("bench-alloc")
+
+    # Fan-out: count emits instead of sending them; rooms are tracked by the index only
+    emitted = [0]
+
+    def counting_emit(*a, **k):
+        emitted[0] += 1
+
+    original_emit = socket_server.socketio.emit
+    original_join, original_leave = socket_server.join_room, socket_server.leave_room
+    socket_server.socketio.emit = counting_emit
+    socket_server.join_room = socket_server.leave_room = lambda *a, **k: None
+    emit_args = records
+    try:
+        for sid_count in sid_counts:
+            socket_server.subscriptions.clear()
+            socket_server.token_watchers.clear()
+            for i in range(sid_count):
+                token = random.choice(TOKENS)
+                socket_server.subscriptions[f"sid-{i}"] = {token}
+                socket_server._add_watcher(f"sid-{i}", token)
+            emitted[0] = 0
+            stats = summarize(*timed(socket_server.emit_tick_to_clients, emit_args))
+            stats["emits"] = emitted[0]
+            results[f"emit_tick_to_clients[{sid_count}_sids]"] = stats
+    finally:
+        socket_server.socketio.emit = original_emit
+        socket_server.join_room, socket_server.leave_room = original_join, original_leave
+        socket_server.subscriptions.clear()
+        socket_server.token_watchers.clear()
+        server.shutdown()
+        restore_logs()
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print per-stage p50 change vs baseline; returns the list of regressed stages"""
+    regressions = []
+    print(f"\n🔍 COMPARISON (regression threshold {threshold}%)")
+    for stage, stats in current["results"].items():
+        before = baseline.get("results", {}).get(stage)
+        if not before or "p50_us" not in stats or not before.get("p50_us"):
+            continue
+        change = (stats["p50_us"] - before["p50_us"]) / before["p50_us"] * 100
+        flag = "❌" if change > threshold else "✅"
+        print(f"   {flag} {stage:<36} p50 {before['p50_us']:>9.3f}us -> {stats['p50_us']:>9.3f}us ({change:+.1f}%)")
+        if change > threshold:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the per-tick hot path")
+    parser.add_argument("--iterations", type=int, default=20000, help="ticks per stage")
+    parser.add_argument("--sids", default="10,100,1000", help="subscribed sid counts for the fan-out stage")
+    parser.add_argument("--json", dest="json_path", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=15.0, help="p50 regression threshold in percent")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    report = run(args.iterations, [int(s) for s in args.sids.split(",") if s.strip()])
+
+    print("⚡ HOT PATH BENCHMARK")
+    for stage, stats in report["results"].items():
+        print(f"   {stage:<36} " + " | ".join(f"{k}: {v}" for k, v in stats.items()))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
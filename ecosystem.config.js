@@ -1,39 +1,55 @@
+// Sharded mode: `SHARD_COUNT=4 pm2 start ecosystem.config.js --env production`
+// starts smartapi-worker-shard-0..3 on ports 5002, 5003, ... instead of
+// the single instance. Any shard serves /api and proxies to the owning shard.
+const SHARD_COUNT = parseInt(process.env.SHARD_COUNT || "1", 10);
+const BASE_PORT = 5002;
+
+const worker = {
+  name: "smartapi-worker",
+  script: "run.py",
+  interpreter: "python3",
+  cwd: "/opt/apps/TradeX-Worker",
+  instances: 1,
+  exec_mode: "fork",
+  watch: false,
+  autorestart: true,
+  max_restarts: 10,
+  min_uptime: "10s",
+  max_memory_restart: "512M",
+  env: {
+    ENV: "production",
+    BACKEND_BASE_URL: "http://localhost:5000",
+    BACKEND_WEBHOOK_URL: "http://localhost:5000/api/websocket",
+    WORKER_HOST: "0.0.0.0",
+    WORKER_PORT: "5002",
+    LOG_LEVEL: "INFO",
+  },
+  env_development: {
+    ENV: "development",
+    BACKEND_BASE_URL: "http://localhost:5000",
+    BACKEND_WEBHOOK_URL: "http://localhost:5000/api/websocket",
+    WORKER_HOST: "0.0.0.0",
+    WORKER_PORT: "5002",
+    LOG_LEVEL: "DEBUG",
+  },
+  error_file: "./logs/smartapi-worker-error.log",
+  out_file: "./logs/smartapi-worker-out.log",
+  log_file: "./logs/smartapi-worker-combined.log",
+  time: true,
+  merge_logs: true,
+  log_date_format: "YYYY-MM-DD HH:mm:ss Z",
+};
+
+const shard = (index) => ({
+  ...worker,
+  name: `smartapi-worker-shard-${index}`,
+  env: { ...worker.env, SHARD_COUNT: String(SHARD_COUNT), SHARD_INDEX: String(index), WORKER_PORT: String(BASE_PORT + index) },
+  env_development: { ...worker.env_development, SHARD_COUNT: String(SHARD_COUNT), SHARD_INDEX: String(index), WORKER_PORT: String(BASE_PORT + index) },
+  error_file: `./logs/smartapi-worker-shard-${index}-error.log`,
+  out_file: `./logs/smartapi-worker-shard-${index}-out.log`,
+  log_file: `./logs/smartapi-worker-shard-${index}-combined.log`,
+});
+
 module.exports = {
-  apps: [
-    {
-      name: "smartapi-worker",
-      script: "run.py",
-      interpreter: "python3",
-      cwd: "/opt/apps/TradeX-Worker",
-      instances: 1,
-      exec_mode: "fork",
-      watch: false,
-      autorestart: true,
-      max_restarts: 10,
-      min_uptime: "10s",
-      max_memory_restart: "512M",
-      env: {
-        ENV: "production",
-        BACKEND_BASE_URL: "http://localhost:5000",
-        BACKEND_WEBHOOK_URL: "http://localhost:5000/api/websocket",
-        WORKER_HOST: "0.0.0.0",
-        WORKER_PORT: "5002",
-        LOG_LEVEL: "INFO",
-      },
-      env_development: {
-        ENV: "development",
-        BACKEND_BASE_URL: "http://localhost:5000",
-        BACKEND_WEBHOOK_URL: "http://localhost:5000/api/websocket",
-        WORKER_HOST: "0.0.0.0",
-        WORKER_PORT: "5002",
-        LOG_LEVEL: "DEBUG",
-      },
-      error_file: "./logs/smartapi-worker-error.log",
-      out_file: "./logs/smartapi-worker-out.log",
-      log_file: "./logs/smartapi-worker-combined.log",
-      time: true,
-      merge_logs: true,
-      log_date_format: "YYYY-MM-DD HH:mm:ss Z",
-    },
-  ],
+  apps: SHARD_COUNT > 1 ? Array.from({ length: SHARD_COUNT }, (_, i) => shard(i)) : [worker],
 };
@@ -50,6 +50,28 @@ def receive_ltp_tick(websocket_uuid):
         print(f"❌ Error processing LTP tick: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/in-memory-candles/process-tick', methods=['POST'])
+@app.route('/api/in-memory-candles/process-bars', methods=['POST'])
+def receive_candle_ticks():
+    """Endpoint to receive batched candle payloads from the Flask worker"""
+    try:
+        data = request.get_json()
+        batch = data if isinstance(data, list) else [data]
+        
+        for tick in batch:
+            received_ticks.append({
+                'received_at': datetime.now().isoformat(),
+                'tick': tick
+            })
+        
+        print(f"🕯️ Candle batch: {len(batch)} tick(s), last token={batch[-1].get('token', 'unknown') if batch else 'n/a'}")
+        
+        return jsonify({'status': 'success', 'received': len(batch)})
+        
+    except Exception as e:
+        print(f"❌ Error processing candle batch: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/ticks', methods=['GET'])
 def get_received_ticks():
     """Get all received ticks for testing"""
@@ -77,5 +99,6 @@ def health():
 if __name__ == '__main__':
     print("🚀 Starting mock backend server on port 3000...")
     print("📊 LTP Tick endpoint: http://localhost:3000/api/websocket/{websocket_uuid}/ltp")
+    print("🕯️ Candle batch endpoint: http://localhost:3000/api/in-memory-candles/process-tick")
     print("📈 View ticks: http://localhost:3000/api/ticks")
     app.run(host='0.0.0.0', port=3000, debug=True)
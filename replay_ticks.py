@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Replay recorded ticks through the worker's real per-tick pipeline.
+
+Reads TICK_DATA lines from tick_analysis logs (or the binary tick journal)
+and feeds them to SmartApiWebSocketManager.handle_tick with the original
+inter-arrival timing, scaled by --speed. No SmartAPI login is needed.
+Start mock_backend.py first to measure forwarding end to end.
+
+Usage:
+    python replay_ticks.py logs/tick_analysis_20250101.log --speed 10
+    python replay_ticks.py --journal logs/journal --speed max
+    python replay_ticks.py --backend http://localhost:3000 --json replay.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the forwarding pipeline")
+    parser.add_argument("logs", nargs="*", help="tick_analysis log files (default: logs/tick_analysis_*.log)")
+    parser.add_argument("--journal", help="replay from this binary tick journal directory instead")
+    parser.add_argument("--from-ns", type=int, help="journal: first receive_ns to replay")
+    parser.add_argument("--to-ns", type=int, help="journal: last receive_ns to replay")
+    parser.add_argument("--speed", default="1", help="timing multiplier (1, 10, ...) or 'max'")
+    parser.add_argument("--limit", type=int, help="stop after this many ticks")
+    parser.add_argument("--backend", help="override BACKEND_BASE_URL (e.g. the mock backend)")
+    parser.add_argument("--json", dest="json_path", help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        os.environ["BACKEND_BASE_URL"] = args.backend
+
+    from app.config import config
+    from app.services.replay import TickReplayer, load_journal_ticks, load_log_ticks
+
+    if args.backend:
+        config.BACKEND_BASE_URL = args.backend
+
+    if args.journal:
+        source = load_journal_ticks(args.journal, args.from_ns, args.to_ns)
+    else:
+        log_paths = args.logs or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "logs", "tick_analysis_*.log")))
+        if not log_paths:
+            print("❌ No tick_analysis logs found and no --journal given")
+            return 1
+        source = load_log_ticks(log_paths)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    print(f"▶️  Replaying ticks at {'max' if speed is None else f'{speed:g}x'} speed -> {config.get_backend_candle_url()}")
+
+    report = TickReplayer(source, speed=speed, limit=args.limit).run()
+
+    print("📊 REPLAY REPORT")
+    print(json.dumps(report, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
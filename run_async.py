@@ -0,0 +1,16 @@
+# run_async.py - asyncio runtime (aiohttp clients, ASGI app served by uvicorn)
+import uvicorn
+
+from app.config import config
+from app.aio import create_app
+
+app = create_app()
+
+if __name__ == "__main__":
+    print(f"🚀 SmartAPI Worker (asyncio) starting with configuration:")
+    print(f"   Environment: {config.ENV}")
+    print(f"   Worker: http://{config.WORKER_HOST}:{config.WORKER_PORT}")
+    print(f"   Backend: {config.BACKEND_BASE_URL}")
+    print(f"   Webhook: {config.BACKEND_WEBHOOK_URL}")
+
+    uvicorn.run(app, host=config.WORKER_HOST, port=config.WORKER_PORT)
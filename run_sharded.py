@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Launch the worker as N sharded processes on consecutive ports.
+
+Each shard is a normal run.py process with SHARD_COUNT/SHARD_INDEX set and
+WORKER_PORT = base port + index. Any shard accepts /api requests and proxies
+them to the owner of the websocket_uuid; /api/status aggregates all shards.
+Crashed shards are restarted.
+
+Usage:
+    python run_sharded.py --shards 4
+    python run_sharded.py --shards 4 --base-port 5002
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def spawn(index, shard_count, base_port):
+    env = dict(os.environ, SHARD_COUNT=str(shard_count), SHARD_INDEX=str(index),
+               WORKER_PORT=str(base_port + index))
+    return subprocess.Popen([sys.executable, os.path.join(HERE, "run.py")], env=env, cwd=HERE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SmartAPI worker as N sharded processes")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 2, help="number of worker processes")
+    parser.add_argument("--base-port", type=int, default=int(os.getenv("WORKER_PORT", 5000)),
+                        help="port of shard 0; shard i listens on base + i")
+    args = parser.parse_args(argv)
+
+    if args.shards < 2:
+        parser.error("--shards must be at least 2 (use run.py for a single process)")
+
+    procs = {i: spawn(i, args.shards, args.base_port) for i in range(args.shards)}
+    print(f"🚀 Started {args.shards} shards on ports {args.base_port}-{args.base_port + args.shards - 1}")
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    restarts = {i: 0 for i in procs}
+    while not stopping:
+        time.sleep(1)
+        for index, proc in list(procs.items()):
+            code = proc.poll()
+            if code is None or stopping:
+                continue
+            restarts[index] += 1
+            delay = min(30, 2 ** min(restarts[index], 5))
+            print(f"⚠️ Shard {index} exited with {code}; restarting in {delay}s")
+            time.sleep(delay)
+            procs[index] = spawn(index, args.shards, args.base_port)
+
+    print("🛑 Stopping shards")
+    for proc in procs.values():
+        proc.terminate()
+    for proc in procs.values():
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
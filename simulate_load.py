@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Generate simulated market load against the forwarding pipeline.
+
+Runs the vectorized MarketSimulator in this process and feeds every tick
+to a login-free SmartApiWebSocketManager.handle_tick (tick store, metrics,
+conflation/candle engine, batched forwarder). No SmartAPI login is needed.
+Start mock_backend.py first to measure forwarding end to end. To load the
+Socket.IO fan-out of a running worker, use POST /api/simulate/start instead.
+
+Usage:
+    python simulate_load.py --tokens 5000 --rate 2 --seconds 30
+    python simulate_load.py --tokens 2000 --profile market_open --backend http://localhost:3000
+    python simulate_load.py --tokens 10000 --rate 20 --sink none --json sim.json
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated multi-token load for the forwarding pipeline")
+    parser.add_argument("--tokens", type=int, default=1000, help="number of simulated tokens")
+    parser.add_argument("--rate", type=float, help="mean ticks per second per token (SIM_TICK_RATE)")
+    parser.add_argument("--volatility-bps", type=float, help="stdev of one tick's move in bps (SIM_VOLATILITY_BPS)")
+    parser.add_argument("--profile", choices=["flat", "market_open", "bursts"], help="burst profile (SIM_PROFILE)")
+    parser.add_argument("--step-ms", type=int, help="scheduler step (SIM_STEP_MS)")
+    parser.add_argument("--seconds", type=float, default=10, help="how long to run")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    parser.add_argument("--sink", choices=["forward", "none"], default="forward",
+                        help="'none' only measures the generator")
+    parser.add_argument("--backend", help="override BACKEND_BASE_URL (e.g. the mock backend)")
+    parser.add_argument("--json", dest="json_path", help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        os.environ["BACKEND_BASE_URL"] = args.backend
+
+    from app.config import config
+    from app.services.market_simulator import MarketSimulator, forward_sink
+
+    if args.backend:
+        config.BACKEND_BASE_URL = args.backend
+
+    manager = None
+    sinks = []
+    if args.sink == "forward":
+        sink, manager = forward_sink("simulator")
+        sinks.append(sink)
+
+    simulator = MarketSimulator(tick_rate=args.rate, volatility_bps=args.volatility_bps, profile=args.profile,
+                                step_ms=args.step_ms, seed=args.seed, sinks=sinks)
+    simulator.add_tokens([str(config.SIM_FIRST_TOKEN + i) for i in range(args.tokens)])
+    target = f"-> {config.get_backend_candle_url()}" if manager else "(no sink)"
+    print(f"▶️  Simulating {args.tokens} tokens for {args.seconds:g}s {target}")
+
+    simulator.run(duration=args.seconds)
+    report = {"simulator": simulator.stats()}
+    if manager:
+        manager.stop()
+        report["forwarding"] = manager.metrics.summary()
+
+    print("📊 SIMULATION REPORT")
+    print(json.dumps(report, indent=2, default=str))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"💾 Report written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
 from flask import request
+from app.config import config
+from app.services.client_batching import ClientTickBuffer, ENCODING_BINARY, ENCODING_JSON, encode_binary, to_client
+from app.services.tick_record import Tick
+from app.services.tick_store import get_tick_store
+from app.services.status_feed import status_feed
 from app.services.tracker import start_tracking, stop_tracking
 import time
 
@@ -8,11 +13,36 @@ socketio = SocketIO(cors_allowed_origins="*")  # Will be initialized later
 # Maps: sid => set(symboltokens)
 subscriptions = {}
 
-# Track how many clients are watching a symbol
-watching_count = {}  # symboltoken => int
+# Inverted index: symboltoken => set(sids); each token also has a Socket.IO room
+token_watchers = {}
+
+# Opt-in batched clients: sid => ClientTickBuffer, symboltoken => set(batched sids)
+client_buffers = {}
+batched_watchers = {}
+_flusher_running = False
+
+STATUS_ROOM = "status"
+
+def _token_room(symboltoken):
+    return f"token:{symboltoken}"
+
+def _emit_status(delta):
+    socketio.emit("status", delta, room=STATUS_ROOM)
 
 def init_socketio(app):
     socketio.init_app(app)
+    status_feed.add_listener(_emit_status)
+
+    @socketio.on("status_subscribe")
+    def on_status_subscribe(data=None):
+        # Current records (or the delta since the client's version), then every change as it happens
+        join_room(STATUS_ROOM)
+        since = status_feed.parse_since((data or {}).get("since"))  # anything else: full resync
+        socketio.emit("status", status_feed.delta(since), room=request.sid)
+
+    @socketio.on("status_unsubscribe")
+    def on_status_unsubscribe(data=None):
+        leave_room(STATUS_ROOM)
 
     @socketio.on("connect")
     def on_connect():
@@ -21,9 +51,40 @@ def init_socketio(app):
     @socketio.on("disconnect")
     def on_disconnect():
         if request.sid in subscriptions:
+            # Rooms are left automatically on disconnect; only the index needs cleaning
             for symboltoken in subscriptions[request.sid]:
-                _decrement_watching(symboltoken)
+                _remove_watcher(request.sid, symboltoken, leave=False)
             subscriptions.pop(request.sid, None)
+        client_buffers.pop(request.sid, None)
+
+    @socketio.on("configure")
+    def on_configure(data):
+        # {"mode": "batch"|"stream", "interval_ms": 100, "encoding": "json"|"binary"}
+        data = data or {}
+        sid = request.sid
+        if data.get("mode", "batch") == "stream":
+            if client_buffers.pop(sid, None) is not None:
+                for symboltoken in subscriptions.get(sid, ()):
+                    _discard_batched(sid, symboltoken)
+                    join_room(_token_room(symboltoken), sid=sid, namespace="/")
+            socketio.emit("configured", {"mode": "stream"}, room=sid)
+            return
+
+        interval_ms = max(config.CLIENT_BATCH_MIN_INTERVAL_MS,
+                          int(data.get("interval_ms") or config.CLIENT_BATCH_INTERVAL_MS))
+        encoding = ENCODING_BINARY if data.get("encoding") == ENCODING_BINARY else ENCODING_JSON
+        buffer = client_buffers.get(sid)
+        if buffer is not None:
+            # Already batched: keep the pending ticks (e.g. a queued subscribe snapshot)
+            buffer.reconfigure(interval_ms, encoding)
+        else:
+            client_buffers[sid] = ClientTickBuffer(sid, interval_ms, encoding)
+            for symboltoken in subscriptions.get(sid, ()):
+                leave_room(_token_room(symboltoken), sid=sid, namespace="/")
+                batched_watchers.setdefault(symboltoken, set()).add(sid)
+        _ensure_flusher()
+        print(f"[SOCKET] SID {sid} batching every {interval_ms}ms ({encoding})")
+        socketio.emit("configured", {"mode": "batch", "interval_ms": interval_ms, "encoding": encoding}, room=sid)
 
     @socketio.on("subscribe")
     def on_subscribe(data):
@@ -35,7 +96,7 @@ def init_socketio(app):
         print(f"[SOCKET] SID {request.sid} subscribing to {symboltoken}, previous: {previous_tokens}")
         for prev in previous_tokens:
             if prev != symboltoken:
-                _decrement_watching(prev)
+                _remove_watcher(request.sid, prev)
                 subscriptions[request.sid].discard(prev)
                 # Do NOT disconnect backend/frontend socket, just close SmartAPI socket
                 stop_tracking(prev)
@@ -48,10 +109,20 @@ def init_socketio(app):
         subscriptions.setdefault(request.sid, set()).add(symboltoken)
         print(f"[SOCKET] SID {request.sid} subscriptions after subscribe: {subscriptions[request.sid]}")
 
-        if watching_count.get(symboltoken, 0) == 0:
+        # Snapshot: the latest known tick right away instead of waiting for the next one
+        latest = get_tick_store().latest(symboltoken) if config.TICK_STORE_ENABLED else None
+        if latest is not None:
+            buffer = client_buffers.get(request.sid)
+            if buffer is not None:
+                # Batched clients get it in their next `ticks` batch, in their encoding
+                buffer.put(symboltoken, latest)
+            else:
+                socketio.emit("tick", to_client(latest), room=request.sid)
+
+        if not token_watchers.get(symboltoken):
             start_tracking(symboltoken=symboltoken, exchangeType=exchangeType, interval_min=interval)
 
-        watching_count[symboltoken] = watching_count.get(symboltoken, 0) + 1
+        _add_watcher(request.sid, symboltoken)
 
     @socketio.on("unsubscribe")
     def on_unsubscribe(data):
@@ -61,19 +132,79 @@ def init_socketio(app):
             print(f"[SOCKET] SID {request.sid} unsubscribed from {symboltoken}")
             print(f"[SOCKET] SID {request.sid} subscriptions after unsubscribe: {subscriptions[request.sid]}")
             # Only close SmartAPI socket, not backend/frontend socket
-            _decrement_watching(symboltoken)
+            _remove_watcher(request.sid, symboltoken)
+
+def _add_watcher(sid, symboltoken):
+    token_watchers.setdefault(symboltoken, set()).add(sid)
+    if sid in client_buffers:
+        batched_watchers.setdefault(symboltoken, set()).add(sid)
+    else:
+        join_room(_token_room(symboltoken), sid=sid, namespace="/")
+
+def _discard_batched(sid, symboltoken):
+    batched = batched_watchers.get(symboltoken)
+    if batched is not None:
+        batched.discard(sid)
+        if not batched:
+            batched_watchers.pop(symboltoken, None)
 
-def _decrement_watching(symboltoken):
-    if symboltoken in watching_count:
-        watching_count[symboltoken] -= 1
-        if watching_count[symboltoken] <= 0:
-            stop_tracking(symboltoken)
-            watching_count.pop(symboltoken)
+def _remove_watcher(sid, symboltoken, leave=True):
+    watchers = token_watchers.get(symboltoken)
+    if watchers is None:
+        return
+    watchers.discard(sid)
+    _discard_batched(sid, symboltoken)
+    if leave:
+        leave_room(_token_room(symboltoken), sid=sid, namespace="/")
+    if not watchers:
+        token_watchers.pop(symboltoken, None)
+        stop_tracking(symboltoken)
 
 # At module level, after socketio = ...
 def emit_tick_to_clients(tick):
-    # Broadcast tick to all clients subscribed to this symboltoken
-    symboltoken = tick.get("symboltoken")
-    for sid, tokens in subscriptions.items():
-        if symboltoken in tokens:
-            socketio.emit("tick", tick, room=sid)
+    # Broadcast tick to all clients subscribed to this symboltoken: O(1) lookup, one emit per token room
+    # tick is a Tick record (serialized here, once per room) or a ready {"symboltoken", "ltp", ...} dict
+    symboltoken = tick.token if type(tick) is Tick else tick.get("symboltoken")
+    watchers = token_watchers.get(symboltoken)
+    if not watchers:
+        return
+    batched = batched_watchers.get(symboltoken)
+    if batched:
+        # Batched clients only keep the latest tick per token until their next flush
+        for sid in batched:
+            client_buffers[sid].put(symboltoken, tick)
+        if len(batched) == len(watchers):
+            return
+    socketio.emit("tick", to_client(tick), room=_token_room(symboltoken))
+
+def flush_client_batches(now=None):
+    """Emit one `ticks` event to every batched client whose interval has elapsed"""
+    now = now or time.monotonic()
+    for sid, buffer in list(client_buffers.items()):
+        entries = buffer.take(now)
+        if not entries:
+            continue
+        if buffer.encoding == ENCODING_BINARY:
+            payload, leftovers = encode_binary(entries)
+            socketio.emit("ticks", payload, room=sid)
+            if leftovers:
+                # Ticks that do not fit the packed record; a separate event keeps `ticks` always bytes
+                socketio.emit("ticks_json", [to_client(tick) for tick in leftovers], room=sid)
+        else:
+            socketio.emit("ticks", [to_client(tick) for _, tick, _ in entries], room=sid)
+
+def _ensure_flusher():
+    global _flusher_running
+    if not _flusher_running:
+        _flusher_running = True
+        socketio.start_background_task(_flush_loop)
+
+def _flush_loop():
+    global _flusher_running
+    try:
+        while client_buffers:
+            flush_client_batches()
+            next_due = min((b.next_flush for b in list(client_buffers.values())), default=0)
+            socketio.sleep(max(0.005, next_due - time.monotonic()))
+    finally:
+        _flusher_running = False
@@ -0,0 +1,64 @@
+"""Replays must not write into the recordings they read (python -m unittest discover tests)"""
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.config import config
+from app.services import websocket_manager
+from app.services.replay import TickReplayer, load_journal_ticks
+from app.services.tick_journal import TickJournal, TickJournalReader
+from app.services.tick_record import Tick
+
+
+class NullForwarder:
+    """Stands in for the HTTP forwarder so the test needs no backend"""
+    dropped = conflated = batches_sent = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def depth(self):
+        return 0
+
+    def enqueue(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ReplayJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir, True)
+        self.journal = TickJournal(journal_dir=self.journal_dir, segment_mb=1, sync_interval=60)
+        self.addCleanup(setattr, self.journal, "_running", False)
+        base_ns = time.time_ns()
+        for i in range(20):
+            self.journal.append("live", Tick("26000", 100 + i, i, 0, 2, 1, time.time()), base_ns + i)
+        self.journal.sync()
+
+    def test_journal_replay_leaves_the_source_journal_unchanged(self):
+        patches = [
+            mock.patch.object(config, "JOURNAL_ENABLED", True),
+            mock.patch.object(config, "CONFLATION_ENABLED", False),
+            mock.patch.object(config, "CANDLE_ENGINE_ENABLED", False),
+            mock.patch.object(websocket_manager, "get_journal", lambda: self.journal),
+            mock.patch.object(websocket_manager.SmartApiWebSocketManager, "forwarder_class", NullForwarder),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        report = TickReplayer(load_journal_ticks(self.journal_dir), speed=None).run()
+        self.journal.sync()
+
+        self.assertEqual(report["ticks"], 20)
+        self.assertEqual(self.journal.records_written, 20)
+        self.assertEqual(len(list(TickJournalReader(self.journal_dir).iter_records())), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
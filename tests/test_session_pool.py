@@ -0,0 +1,64 @@
+"""SessionPool reuse rules (python -m unittest discover tests)"""
+import unittest
+from unittest import mock
+
+from app.services import session_manager
+from app.services.session_manager import SessionPool
+
+GOOD = {"api_key": "key", "client_code": "C123", "password": "1111", "totp_secret": "JBSWY3DPEHPK3PXP"}
+BAD = dict(GOOD, password="9999")
+
+
+class FakeSmartConnect:
+    """generateSession succeeds only for GOOD's password; every session gets a new jwt"""
+    sessions = 0
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def generateSession(self, client_code, password, totp):
+        if password != GOOD["password"]:
+            return {"status": False, "message": "Invalid password", "data": None}
+        FakeSmartConnect.sessions += 1
+        return {"status": True, "data": {"jwtToken": f"Bearer jwt-{FakeSmartConnect.sessions}",
+                                         "refreshToken": f"refresh-{FakeSmartConnect.sessions}"}}
+
+    def getfeedToken(self):
+        return "feed"
+
+    def generateToken(self, refresh_token):
+        return {"data": {"jwtToken": "jwt-refreshed", "feedToken": "feed-2", "refreshToken": "refresh-rotated"}}
+
+
+class SessionPoolTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(session_manager, "SmartConnect", FakeSmartConnect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = SessionPool()
+        self.pool._ensure_refresher = lambda: None
+
+    def test_same_credentials_reuse_the_session(self):
+        auth = self.pool.get(GOOD)
+        self.assertIs(self.pool.get(dict(GOOD)), auth)
+        self.assertEqual(self.pool.logins, 1)
+
+    def test_mismatched_credentials_do_not_get_the_cached_session(self):
+        auth = self.pool.get(GOOD)
+        with self.assertRaises(Exception):
+            self.pool.get(BAD)
+        self.assertIsNone(self.pool.peek(BAD))
+        # The pooled entry and its credentials are untouched by the failed attempt
+        self.assertIs(self.pool.peek(GOOD), auth)
+        self.assertEqual(self.pool._sessions["C123"].credentials, GOOD)
+
+    def test_refresh_stores_the_rotated_refresh_token(self):
+        self.pool.get(GOOD)
+        entry = self.pool._sessions["C123"]
+        self.pool._refresh(entry)
+        self.assertEqual(entry.refresh_token, "refresh-rotated")
+        self.assertEqual(entry.auth["jwt_token"], "Bearer jwt-refreshed")
+
+
+if __name__ == "__main__":
+    unittest.main()
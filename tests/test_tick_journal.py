@@ -0,0 +1,54 @@
+"""TickJournal restart recovery (python -m unittest discover tests)"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from app.services.tick_journal import RECORD_SIZE, TickJournal, TickJournalReader
+from app.services.tick_record import Tick
+
+
+def _tick(ltp):
+    return Tick("26000", ltp, ltp, 0, 2, 1, time.time())
+
+
+class TickJournalRestartTest(unittest.TestCase):
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir, True)
+
+    def _journal(self):
+        journal = TickJournal(journal_dir=self.journal_dir, segment_mb=1, sync_interval=60)
+        self.addCleanup(setattr, journal, "_running", False)
+        return journal
+
+    def test_segment_left_open_by_a_crash_is_recovered(self):
+        base_ns = time.time_ns()
+        crashed = self._journal()
+        for i in range(10):
+            crashed.append("ws", _tick(100 + i), base_ns + i)
+        crashed.sync()  # killed here: no close()
+
+        restarted = self._journal()
+        for i in range(3):
+            restarted.append("ws", _tick(200 + i), base_ns + 100 + i)
+        restarted.close()
+
+        day = TickJournal._day_of(base_ns)
+        segments = TickJournalReader(self.journal_dir).index(day)["segments"]
+        self.assertEqual([s["file"] for s in segments], ["segment_000001.bin", "segment_000002.bin"])
+        recovered = segments[0]
+        self.assertTrue(recovered["closed"])
+        self.assertEqual(recovered["records"], 10)
+        self.assertEqual(recovered["last_ns"], base_ns + 9)
+        path = os.path.join(self.journal_dir, day, recovered["file"])
+        self.assertEqual(os.path.getsize(path), 10 * RECORD_SIZE)
+
+        records = list(TickJournalReader(self.journal_dir).iter_records())
+        self.assertEqual(len(records), 13)
+        self.assertEqual([r[1] for r in records], list(range(100, 110)) + [200, 201, 202])
+
+
+if __name__ == "__main__":
+    unittest.main()